@@ -2,9 +2,28 @@
 Day-1: 
 Learnt about hashing and the difference between Encryption/Decryption and hashing.
 Short program to create a SHA-256 hash of the data using the hashlib library in python.
+
+Later extended into a reusable module and command line tool for fingerprinting large files and block files. Files are hashed
+in fixed-size chunks or through mmap so they are never loaded into memory whole, many files can be hashed in parallel across
+a worker pool, and throughput is reported in MB/s. Running it with no arguments still asks for a string to hash.
+
+Usage:
+    python sha256.py                                  # hash a string typed at the prompt
+    python sha256.py FILE [FILE ...] [--workers 4]    # hash files
+    python sha256.py FILE --mmap                      # hash through mmap instead of chunked reads
+    python sha256.py --benchmark --max-size 4G        # benchmark from 1 KB up to 4 GB
 '''
 
+import argparse
 import hashlib
+import mmap
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 1 MiB reads keep memory use fixed while still being large enough to be fast
+DEFAULT_CHUNK_SIZE = 1024 * 1024
 
 def hash_data(data):
     # Encode the data to bytes, as required by hashlib 
@@ -15,8 +34,164 @@ def hash_data(data):
     
     return sha256_hash
 
-# Takes input from user and hashes it.
-data = input("Enter string to Hash.\n")
-hashed_data = hash_data(data)
-print(f"Original Data: {data}")
-print(f"Hashed Data: {hashed_data}")
+# Hashes a file by reading it in fixed-size chunks into one reused buffer
+def hash_file(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    sha256 = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            sha256.update(view[:read])
+    return sha256.hexdigest()
+
+# Hashes a file through mmap, letting the OS page it in without copying it into Python
+def hash_file_mmap(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        # mmap cannot map empty files
+        if os.fstat(f.fileno()).st_size == 0:
+            return sha256.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            for offset in range(0, len(mapped), chunk_size):
+                sha256.update(view[offset:offset + chunk_size])
+            view.release()
+    return sha256.hexdigest()
+
+# Hashes many files at once. hashlib releases the GIL while hashing large buffers,
+# so a thread pool keeps several cores busy without copying data between processes.
+# Returns a list of (path, hash, size in bytes, seconds) in the order of the paths given.
+# Files that cannot be read are reported and left out.
+def hash_files(paths, workers=None, use_mmap=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    hasher = hash_file_mmap if use_mmap else hash_file
+
+    def hash_one(path):
+        start = time.perf_counter()
+        try:
+            digest = hasher(path, chunk_size)
+            size = os.path.getsize(path)
+        except OSError as error:
+            print(f"Could not hash {path}: {error.strerror or error}")
+            return None
+        return path, digest, size, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return [result for result in pool.map(hash_one, paths) if result is not None]
+
+# Throughput in MB/s (1 MB = 10^6 bytes)
+def throughput(size, seconds):
+    return size / seconds / 1e6 if seconds > 0 else float('inf')
+
+# Parses sizes like 1K, 10M, 4G, with or without a trailing B (1KB, 4GB, 512B). Units are powers of 1024.
+def parse_size(text):
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper()
+    if len(text) > 1 and text.endswith('B'):
+        text = text[:-1]
+    if not text:
+        raise ValueError("size is empty")
+    if text[-1] in units:
+        size = int(float(text[:-1]) * units[text[-1]])
+    else:
+        size = int(text)
+    if size <= 0:
+        raise ValueError(f"size must be at least 1 byte, got {size}")
+    return size
+
+def format_size(size):
+    for unit, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if size >= factor:
+            return f"{size / factor:.4g} {unit}"
+    return f"{size} B"
+
+# Writes a file of random-looking data in chunks, so building a multi-GB file also stays in fixed memory
+def write_test_file(path, size, chunk_size=DEFAULT_CHUNK_SIZE):
+    block = os.urandom(chunk_size)
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:min(chunk_size, remaining)])
+            remaining -= chunk_size
+
+# Benchmarks chunked and mmap hashing from 1 KB up to max_size, then parallel hashing of several files
+def benchmark(max_size, workers=None, directory=None):
+    sizes = [1024]
+    while sizes[-1] * 32 <= max_size:
+        sizes.append(sizes[-1] * 32)
+    if sizes[-1] != max_size:
+        sizes.append(max_size)
+
+    with tempfile.TemporaryDirectory(dir=directory) as workdir:
+        print(f"{'Size':>10} {'chunked MB/s':>14} {'mmap MB/s':>12}")
+        for size in sizes:
+            path = os.path.join(workdir, f"bench-{size}")
+            write_test_file(path, size)
+            # Small files are hashed many times so the timing means something
+            repeats = max(1, (64 * 1024 * 1024) // size)
+            results = []
+            for hasher in (hash_file, hash_file_mmap):
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    hasher(path)
+                results.append(throughput(size * repeats, time.perf_counter() - start))
+            print(f"{format_size(size):>10} {results[0]:>14.1f} {results[1]:>12.1f}")
+            os.remove(path)
+
+        # Several mid-sized files, one worker against a pool
+        file_size = min(max_size, 64 * 1024 * 1024)
+        paths = []
+        for i in range(8):
+            path = os.path.join(workdir, f"parallel-{i}")
+            write_test_file(path, file_size)
+            paths.append(path)
+        for pool_size in sorted({1, workers or os.cpu_count()}):
+            start = time.perf_counter()
+            hash_files(paths, workers=pool_size)
+            elapsed = time.perf_counter() - start
+            print(f"8 files of {format_size(file_size)} with {pool_size} worker(s): {throughput(file_size * 8, elapsed):.1f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SHA-256 of a string, of files, or a hashing benchmark.")
+    parser.add_argument("files", nargs="*", help="files to hash")
+    parser.add_argument("--mmap", action="store_true", help="hash through mmap instead of chunked reads")
+    parser.add_argument("--chunk-size", type=parse_size, default=DEFAULT_CHUNK_SIZE, help="bytes hashed per step (default 1M)")
+    parser.add_argument("--workers", type=int, default=None, help="files hashed in parallel (default: number of CPUs)")
+    parser.add_argument("--benchmark", action="store_true", help="benchmark hashing from 1 KB up to --max-size")
+    parser.add_argument("--max-size", type=parse_size, default=parse_size("1G"), help="largest benchmark file (default 1G)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.max_size, args.workers)
+    elif args.files:
+        start = time.perf_counter()
+        results = hash_files(args.files, args.workers, args.mmap, args.chunk_size)
+        elapsed = time.perf_counter() - start
+        for path, digest, size, seconds in results:
+            print(f"{digest}  {path}  ({format_size(size)}, {throughput(size, seconds):.1f} MB/s)")
+        total = sum(size for _, _, size, _ in results)
+        print(f"Hashed {len(results)} file(s), {format_size(total)} in {elapsed:.2f} s: {throughput(total, elapsed):.1f} MB/s")
+        if len(results) < len(args.files):
+            raise SystemExit(1)
+    else:
+        # Takes input from user and hashes it.
+        data = input("Enter string to Hash.\n")
+        hashed_data = hash_data(data)
+        print(f"Original Data: {data}")
+        print(f"Hashed Data: {hashed_data}")
+
+'''
+Sample benchmark output (python sha256.py --benchmark --max-size 4G, on a single-core machine):
+
+      Size   chunked MB/s    mmap MB/s
+      1 KB           26.3         40.0
+     32 KB          475.4        595.5
+      1 MB         1000.1        973.9
+     32 MB          909.5       1128.9
+      1 GB          974.3       1145.5
+      4 GB          972.8       1130.6
+8 files of 64 MB with 1 worker(s): 871.0 MB/s
+'''
@@ -0,0 +1,500 @@
+'''
+Day-12:
+Learnt about compact block relay. When a block is mined, the peers receiving it already hold most of its transactions in their
+own transaction pools, so sending the full transactions list again is mostly wasted bandwidth.
+Implemented a compact block message that carries only the block header and short salted transaction ids. The receiver rebuilds
+the block from its own pool and asks the sender only for the transactions it is missing.
+Also measured bytes on the wire and block propagation time against relaying the full block.
+'''
+
+import hashlib
+import json
+import os
+import random
+import time
+import rsa
+
+# Number of bytes kept from the salted hash of a transaction id
+SHORT_ID_LENGTH = 6
+
+# Transaction class with fees, now with a transaction id
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    # The transaction id commits to the signed data and the signature itself
+    def txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        return {
+            "sender": key_to_list(self.sender_public_key),
+            "receiver": key_to_list(self.receiver),
+            "amount": self.amount,
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+
+    @staticmethod
+    def from_dict(data):
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        return Transaction(key_from_list(data["sender"]), key_from_list(data["receiver"]),
+                           data["amount"], data["fee"], signature)
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+# Public keys travel as [n, e] so they can be put in JSON messages
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Block class remains the same as Day-11
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.index = index
+        self.transactions = transactions  # List of transactions
+        self.timestamp = time.time()
+        self.previous_hash = previous_hash
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        self.difficulty = difficulty
+        self.nonce = 0
+        self.hash = self.calculate_hash()
+
+    def calculate_hash(self):
+        transactions_str = ''.join(str(tx) for tx in self.transactions)
+        hash_data = f"{self.index}{self.timestamp}{transactions_str}{self.previous_hash}{self.nonce}{self.miner_address}{self.reward}"
+        return hashlib.sha256(hash_data.encode()).hexdigest()
+
+    def mine_block(self):
+        target = '0' * self.difficulty
+        while self.hash[:self.difficulty] != target:
+            self.nonce += 1
+            self.hash = self.calculate_hash()
+
+    # Header fields are everything in the block except the transactions
+    def header(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "miner_address": key_to_list(self.miner_address),
+            "reward": self.reward,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+        }
+
+    @staticmethod
+    def from_header(header, transactions):
+        block = Block.__new__(Block)
+        block.index = header["index"]
+        block.transactions = transactions
+        block.timestamp = header["timestamp"]
+        block.previous_hash = header["previous_hash"]
+        block.miner_address = key_from_list(header["miner_address"])
+        block.reward = header["reward"]
+        block.difficulty = header["difficulty"]
+        block.nonce = header["nonce"]
+        block.hash = header["hash"]
+        return block
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {self.transactions}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Blockchain class with mining reward mechanism, now able to accept blocks mined by a peer
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_block=None):
+        self.chain = [genesis_block or self.create_genesis_block()]
+        self.transaction_pool = []
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+
+    def create_genesis_block(self):
+        return Block(0, [], "0", miner_address=None, reward=0, difficulty=2)
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def add_block(self, new_block):
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+
+    # Peers do not mine a received block again, they only check it and append it.
+    # The difficulty and the reward are worked out locally rather than taken from the peer.
+    def receive_block(self, block):
+        if block.previous_hash != self.get_latest_block().hash:
+            print(f"Block {block.index} is not properly linked to the previous block!")
+            return False
+        if block.difficulty != self.expected_difficulty(block):
+            print(f"Block {block.index} has difficulty {block.difficulty}, expected {self.expected_difficulty(block)}!")
+            return False
+        if block.hash != block.calculate_hash() or block.hash[:block.difficulty] != '0' * block.difficulty:
+            print(f"Block {block.index} has an invalid proof of work!")
+            return False
+        if not self.reward_is_valid(block):
+            print(f"Block {block.index} has an invalid reward!")
+            return False
+        self.chain.append(block)
+
+        # Drop the transactions that are now confirmed from the pool
+        included = {tx.txid() for tx in block.transactions}
+        self.transaction_pool = [tx for tx in self.transaction_pool if tx.txid() not in included]
+        return True
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = self.expected_difficulty(new_block)
+
+    # Difficulty a block on top of the latest one must have, given its timestamp
+    def expected_difficulty(self, block):
+        latest_block = self.get_latest_block()
+        time_difference = block.timestamp - latest_block.timestamp
+
+        if time_difference < self.block_time_target:
+            return latest_block.difficulty + 1
+        elif time_difference > self.block_time_target:
+            return max(1, latest_block.difficulty - 1)
+        else:
+            return latest_block.difficulty
+
+    # The reward transaction comes last and pays the mining reward plus the fees of the others
+    def reward_is_valid(self, block):
+        if not block.transactions or block.reward != self.mining_reward:
+            return False
+        *transactions, reward_transaction = block.transactions
+        if reward_transaction.sender_public_key is not None or any(tx.sender_public_key is None for tx in transactions):
+            return False
+        return reward_transaction.amount == self.mining_reward + sum(tx.fee for tx in transactions)
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    def mine_pending_transactions(self, miner_address):
+        if len(self.transaction_pool) > 0:
+            total_fees = sum(tx.fee for tx in self.transaction_pool)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+            self.transaction_pool.append(reward_transaction)
+
+            new_block = Block(len(self.chain), self.transaction_pool, self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            self.add_block(new_block)
+            self.transaction_pool = []
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if current_block.hash != current_block.calculate_hash():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Short id of a transaction, salted per block so ids cannot be precomputed to collide
+def short_id(salt, txid):
+    return hashlib.sha256(salt + txid).digest()[:SHORT_ID_LENGTH]
+
+
+# Compact block message: the header, short ids for every transaction and the
+# transactions the peer cannot have yet (the reward transaction) sent in full
+class CompactBlock:
+    def __init__(self, header, nonce, short_ids, prefilled):
+        self.header = header
+        self.nonce = nonce  # Random salt chosen by the sender
+        self.short_ids = short_ids
+        self.prefilled = prefilled  # List of (position, transaction)
+
+    @staticmethod
+    def from_block(block):
+        nonce = os.urandom(8)
+        salt = hashlib.sha256(block.hash.encode() + nonce).digest()
+        short_ids = []
+        prefilled = []
+        for position, tx in enumerate(block.transactions):
+            if tx.sender_public_key is None:
+                # Reward transactions only exist inside this block
+                prefilled.append((position, tx))
+            else:
+                short_ids.append(short_id(salt, tx.txid()))
+        return CompactBlock(block.header(), nonce, short_ids, prefilled)
+
+    def salt(self):
+        return hashlib.sha256(self.header["hash"].encode() + self.nonce).digest()
+
+    def serialize(self):
+        return json.dumps({
+            "header": self.header,
+            "nonce": self.nonce.hex(),
+            "short_ids": [sid.hex() for sid in self.short_ids],
+            "prefilled": [[position, tx.to_dict()] for position, tx in self.prefilled],
+        }).encode()
+
+    @staticmethod
+    def deserialize(data):
+        message = json.loads(data)
+        return CompactBlock(
+            message["header"],
+            bytes.fromhex(message["nonce"]),
+            [bytes.fromhex(sid) for sid in message["short_ids"]],
+            [(position, Transaction.from_dict(tx)) for position, tx in message["prefilled"]],
+        )
+
+
+# Full block message, used as the baseline
+def serialize_full_block(block):
+    return json.dumps({
+        "header": block.header(),
+        "transactions": [tx.to_dict() for tx in block.transactions],
+    }).encode()
+
+
+def deserialize_full_block(data):
+    message = json.loads(data)
+    return Block.from_header(message["header"], [Transaction.from_dict(tx) for tx in message["transactions"]])
+
+
+# Request and response used to fetch the transactions a peer could not find in its pool
+def serialize_get_block_txn(block_hash, positions):
+    return json.dumps({"block_hash": block_hash, "positions": positions}).encode()
+
+
+def serialize_block_txn(block, positions):
+    return json.dumps({
+        "block_hash": block.hash,
+        "transactions": [block.transactions[position].to_dict() for position in positions],
+    }).encode()
+
+
+# A node that relays and receives blocks over a simulated link
+class Node:
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+
+    # Rebuild a block from a compact block using the local pool.
+    # Returns the list of transactions (None where missing) and the missing positions, or (None, None) if the
+    # short ids and prefilled positions do not add up to one transaction per position.
+    def reconstruct(self, compact):
+        salt = compact.salt()
+        by_short_id = {}
+        for tx in self.blockchain.transaction_pool:
+            sid = short_id(salt, tx.txid())
+            # Two pool transactions with the same short id cannot be told apart, so fetch it instead
+            by_short_id[sid] = None if sid in by_short_id else tx
+
+        total = len(compact.short_ids) + len(compact.prefilled)
+        transactions = [None] * total
+        for position, tx in compact.prefilled:
+            if not 0 <= position < total or transactions[position] is not None:
+                print(f"Compact block has a bad prefilled position {position}!")
+                return None, None
+            transactions[position] = tx
+
+        short_ids = iter(compact.short_ids)
+        missing = []
+        for position in range(total):
+            if transactions[position] is not None:
+                continue
+            tx = by_short_id.get(next(short_ids))
+            if tx is None:
+                missing.append(position)
+            transactions[position] = tx
+        return transactions, missing
+
+    # Returns the rebuilt block, or None if the response does not have exactly one transaction per missing position
+    def fill_missing(self, compact, transactions, block_txn_message):
+        message = json.loads(block_txn_message)
+        missing = [position for position, tx in enumerate(transactions) if tx is None]
+        if len(message["transactions"]) != len(missing):
+            print(f"Got {len(message['transactions'])} transactions for {len(missing)} missing positions!")
+            return None
+        for position, tx in zip(missing, message["transactions"]):
+            transactions[position] = Transaction.from_dict(tx)
+        return Block.from_header(compact.header, transactions)
+
+
+# Simulated network link between two nodes
+class Link:
+    def __init__(self, bandwidth_bits_per_second=1_000_000, latency_seconds=0.05):
+        self.bandwidth = bandwidth_bits_per_second
+        self.latency = latency_seconds
+
+    def transfer_time(self, message):
+        return self.latency + len(message) * 8 / self.bandwidth
+
+
+# Relay a block as a full block and return (bytes on the wire, propagation time)
+def relay_full(block, receiver, link):
+    start = time.perf_counter()
+    message = serialize_full_block(block)
+    received = deserialize_full_block(message)
+    # The receiver has to check every signature it did not see before
+    known = {tx.txid() for tx in receiver.blockchain.transaction_pool}
+    signatures_ok = all(tx.verify_transaction() for tx in received.transactions
+                        if tx.sender_public_key is not None and tx.txid() not in known)
+    if not signatures_ok:
+        print(f"Block {received.index} has a transaction with an invalid signature!")
+    accepted = signatures_ok and receiver.blockchain.receive_block(received)
+    cpu_time = time.perf_counter() - start
+    return accepted, len(message), cpu_time + link.transfer_time(message)
+
+
+# Relay a block as a compact block and return (bytes on the wire, propagation time)
+def relay_compact(block, receiver, link):
+    start = time.perf_counter()
+    message = CompactBlock.from_block(block).serialize()
+    compact = CompactBlock.deserialize(message)
+    transactions, missing = receiver.reconstruct(compact)
+    wire_bytes = len(message)
+    network_time = link.transfer_time(message)
+
+    if transactions is None:
+        received = None
+    elif missing:
+        # One extra round trip to fetch what the pool did not have
+        request = serialize_get_block_txn(compact.header["hash"], missing)
+        response = serialize_block_txn(block, missing)
+        wire_bytes += len(request) + len(response)
+        network_time += link.transfer_time(request) + link.transfer_time(response)
+        received = receiver.fill_missing(compact, transactions, response)
+    else:
+        received = Block.from_header(compact.header, transactions)
+
+    # Transactions from the pool were checked when they came in, the ones that came with the block were not
+    if received is not None:
+        unchecked = missing + [position for position, tx in compact.prefilled if tx.sender_public_key is not None]
+        if not all(received.transactions[position].verify_transaction() for position in unchecked):
+            print(f"Block {received.index} has a transaction with an invalid signature!")
+            received = None
+
+    accepted = received is not None and receiver.blockchain.receive_block(received)
+    cpu_time = time.perf_counter() - start
+    return accepted, wire_bytes, cpu_time + network_time
+
+
+if __name__ == "__main__":
+    random.seed(12)
+    wallets = [Wallet() for _ in range(10)]
+    miner_wallet = Wallet()
+    link = Link()
+
+    for pool_overlap in (1.0, 0.9):
+        # Two peers sharing the same genesis block
+        miner_chain = Blockchain()
+        full_peer = Node(Blockchain(genesis_block=miner_chain.chain[0]))
+        compact_peer = Node(Blockchain(genesis_block=miner_chain.chain[0]))
+
+        # Both peers heard about most of the transactions before the block was mined
+        for _ in range(200):
+            sender, receiver = random.sample(wallets, 2)
+            tx = sender.create_transaction(receiver.public_key, random.randint(1, 100), fee=random.randint(1, 5))
+            miner_chain.add_transaction_to_pool(tx)
+            if random.random() < pool_overlap:
+                full_peer.blockchain.add_transaction_to_pool(tx)
+                compact_peer.blockchain.add_transaction_to_pool(tx)
+
+        block = miner_chain.mine_pending_transactions(miner_wallet.public_key)
+
+        full_ok, full_bytes, full_time = relay_full(block, full_peer, link)
+        compact_ok, compact_bytes, compact_time = relay_compact(block, compact_peer, link)
+
+        print(f"Pool overlap: {pool_overlap:.0%}, block with {len(block.transactions)} transactions")
+        print(f"Full block relay:    {full_bytes:>8} bytes, {full_time * 1000:8.1f} ms, accepted: {full_ok}")
+        print(f"Compact block relay: {compact_bytes:>8} bytes, {compact_time * 1000:8.1f} ms, accepted: {compact_ok}")
+        print(f"Bytes saved: {1 - compact_bytes / full_bytes:.1%}")
+        print(f"Rebuilt block hash matches: {compact_peer.blockchain.get_latest_block().hash == block.hash}")
+        print("-" * 30)
+
+    # A peer that skips mining by claiming difficulty 0, and one that pays itself more than the reward
+    peer_chain = compact_peer.blockchain
+    lazy = Block(len(peer_chain.chain), [Transaction(None, miner_wallet.public_key, 50)], peer_chain.get_latest_block().hash,
+                 miner_wallet.public_key, 50, difficulty=0)
+    print("Block claiming difficulty 0 accepted:", peer_chain.receive_block(lazy))
+    greedy = Block(len(peer_chain.chain), [Transaction(None, miner_wallet.public_key, 1000)], peer_chain.get_latest_block().hash,
+                   miner_wallet.public_key, 50)
+    greedy.difficulty = peer_chain.expected_difficulty(greedy)
+    greedy.mine_block()
+    print("Block paying a reward of 1000 accepted:", peer_chain.receive_block(greedy))
+
+'''
+Sample Output:
+
+Pool overlap: 100%, block with 201 transactions
+Full block relay:      105328 bytes,    898.2 ms, accepted: True
+Compact block relay:     3951 bytes,     85.2 ms, accepted: True
+Bytes saved: 96.2%
+Rebuilt block hash matches: True
+------------------------------
+Pool overlap: 90%, block with 201 transactions
+Full block relay:      105322 bytes,    898.9 ms, accepted: True
+Compact block relay:    14699 bytes,    271.4 ms, accepted: True
+Bytes saved: 86.0%
+Rebuilt block hash matches: True
+------------------------------
+Block 2 has difficulty 0, expected 4!
+Block claiming difficulty 0 accepted: False
+Block 2 has an invalid reward!
+Block paying a reward of 1000 accepted: False
+'''
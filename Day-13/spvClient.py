@@ -0,0 +1,391 @@
+'''
+Day-13:
+Learnt about Simplified Payment Verification (SPV) and Merkle trees. A wallet only needs to know that its own transactions
+made it into the chain, so it does not have to keep every block with all of its transactions.
+Moved the transactions out of the block hash and into a Merkle root, so the header alone commits to them.
+Implemented a light client that stores only block headers, checks their proof of work and linkage, and verifies that a
+transaction is in a block using a Merkle branch served by a full node.
+'''
+
+import hashlib
+import sys
+import time
+import rsa
+
+# Transaction class remains the same as Day-12
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+# Merkle branch for the transaction at `position`: a list of (sibling hash, sibling is on the left)
+def merkle_proof(txids, position):
+    proof = []
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        sibling = position ^ 1
+        proof.append((level[sibling], sibling < position))
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+        position //= 2
+    return proof
+
+
+# Walk a Merkle branch from a transaction id up to the root
+def verify_merkle_proof(txid, proof, root):
+    current = txid
+    for sibling, sibling_is_left in proof:
+        current = hash_pair(sibling, current) if sibling_is_left else hash_pair(current, sibling)
+    return current.hex() == root
+
+
+# Header hash covers the Merkle root instead of the transactions themselves.
+# The miner address and reward are committed through the reward transaction in the Merkle tree.
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block class now commits to its transactions through a Merkle root
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.index = index
+        self.transactions = transactions  # List of transactions
+        self.timestamp = time.time()
+        self.previous_hash = previous_hash
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        self.difficulty = difficulty
+        self.nonce = 0
+        self.merkle_root = merkle_root([tx.txid() for tx in transactions])
+        self.hash = self.calculate_hash()
+
+    def calculate_hash(self):
+        return calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root, self.difficulty, self.nonce)
+
+    def mine_block(self):
+        target = '0' * self.difficulty
+        while self.hash[:self.difficulty] != target:
+            self.nonce += 1
+            self.hash = self.calculate_hash()
+
+    def get_header(self):
+        return BlockHeader(self.index, self.timestamp, self.previous_hash, self.merkle_root, self.difficulty, self.nonce, self.hash)
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {self.transactions}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Block header without the transactions, this is all a light client keeps
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "hash")
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce, hash):
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+        self.hash = hash
+
+    def calculate_hash(self):
+        return calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root, self.difficulty, self.nonce)
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Blockchain class (the full node) now serves headers and Merkle proofs
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50):
+        self.chain = [self.create_genesis_block()]
+        self.transaction_pool = []
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+
+    def create_genesis_block(self):
+        return Block(0, [], "0", miner_address=None, reward=0, difficulty=2)
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def add_block(self, new_block):
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        # Difficulty is part of the header hash, so the hash from __init__ is stale now
+        new_block.hash = new_block.calculate_hash()
+        new_block.mine_block()
+        self.chain.append(new_block)
+
+    def adjust_difficulty(self, new_block):
+        latest_block = self.get_latest_block()
+        time_difference = new_block.timestamp - latest_block.timestamp
+
+        if time_difference < self.block_time_target:
+            new_block.difficulty = latest_block.difficulty + 1
+        elif time_difference > self.block_time_target:
+            new_block.difficulty = max(1, latest_block.difficulty - 1)
+        else:
+            new_block.difficulty = latest_block.difficulty
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    def mine_pending_transactions(self, miner_address):
+        if len(self.transaction_pool) > 0:
+            total_fees = sum(tx.fee for tx in self.transaction_pool)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+            self.transaction_pool.append(reward_transaction)
+
+            new_block = Block(len(self.chain), self.transaction_pool, self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            self.add_block(new_block)
+            self.transaction_pool = []
+        else:
+            print("No transactions to mine!")
+
+    # Headers from a given height onwards, for light clients to sync
+    def get_headers(self, start_height):
+        return [block.get_header() for block in self.chain[start_height:]]
+
+    # Find a transaction and return (block hash, Merkle branch), or None if it is not in the chain
+    def get_merkle_proof(self, txid):
+        for block in reversed(self.chain):
+            txids = [tx.txid() for tx in block.transactions]
+            if txid in txids:
+                return block.hash, merkle_proof(txids, txids.index(txid))
+        return None
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if current_block.merkle_root != merkle_root([tx.txid() for tx in current_block.transactions]):
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.hash != current_block.calculate_hash():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Light client that keeps only headers
+class LightClient:
+    def __init__(self, genesis_header, block_time_target=5):
+        self.headers = [genesis_header]
+        self.height_by_hash = {genesis_header.hash: 0}
+        self.block_time_target = block_time_target  # Must match the full nodes, it decides each header's difficulty
+
+    def get_latest_header(self):
+        return self.headers[-1]
+
+    # Download and check new headers from a full node
+    def sync(self, full_node):
+        for header in full_node.get_headers(len(self.headers)):
+            if not self.add_header(header):
+                return False
+        return True
+
+    def add_header(self, header):
+        latest_header = self.get_latest_header()
+
+        if header.previous_hash != latest_header.hash or header.index != latest_header.index + 1:
+            print(f"Header {header.index} is not properly linked to the previous header!")
+            return False
+
+        if header.hash != header.calculate_hash():
+            print(f"Header {header.index} has been tampered!")
+            return False
+
+        # Same rule as Blockchain.adjust_difficulty, so a header cannot pick an easier difficulty for itself
+        time_difference = header.timestamp - latest_header.timestamp
+        if time_difference < self.block_time_target:
+            expected_difficulty = latest_header.difficulty + 1
+        elif time_difference > self.block_time_target:
+            expected_difficulty = max(1, latest_header.difficulty - 1)
+        else:
+            expected_difficulty = latest_header.difficulty
+        if header.difficulty != expected_difficulty:
+            print(f"Header {header.index} has difficulty {header.difficulty}, expected {expected_difficulty}!")
+            return False
+
+        if header.hash[:header.difficulty] != '0' * header.difficulty:
+            print(f"Header {header.index} does not meet its proof of work!")
+            return False
+
+        self.headers.append(header)
+        self.height_by_hash[header.hash] = header.index
+        return True
+
+    # Check that a transaction is in a block we hold the header for, using a branch from a full node
+    def verify_transaction_inclusion(self, transaction, full_node):
+        txid = transaction.txid()
+        answer = full_node.get_merkle_proof(txid)
+        if answer is None:
+            return False
+        block_hash, proof = answer
+
+        height = self.height_by_hash.get(block_hash)
+        if height is None:
+            print("Proof is for a block this client has not seen!")
+            return False
+
+        return verify_merkle_proof(txid, proof, self.headers[height].merkle_root)
+
+    def confirmations(self, block_hash):
+        return len(self.headers) - self.height_by_hash[block_hash]
+
+
+# Rough memory footprint of an object graph, following attributes, slots and containers
+def deep_sizeof(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    if hasattr(type(obj), "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, slot), seen) for slot in type(obj).__slots__ if hasattr(obj, slot))
+    return size
+
+
+if __name__ == "__main__":
+    # Short block time so difficulty stays low while we build a longer chain
+    blockchain = Blockchain(block_time_target=0.05)
+
+    alice_wallet = Wallet()
+    bob_wallet = Wallet()
+    miner_wallet = Wallet()
+
+    # Mine 30 blocks with 50 transactions each
+    for _ in range(30):
+        for i in range(25):
+            blockchain.add_transaction_to_pool(alice_wallet.create_transaction(bob_wallet.public_key, 10 + i, fee=1))
+            blockchain.add_transaction_to_pool(bob_wallet.create_transaction(alice_wallet.public_key, 5 + i, fee=2))
+        blockchain.mine_pending_transactions(miner_wallet.public_key)
+
+    # Alice pays Bob and wants to know it was confirmed
+    payment = alice_wallet.create_transaction(bob_wallet.public_key, 42, fee=3)
+    blockchain.add_transaction_to_pool(payment)
+    blockchain.mine_pending_transactions(miner_wallet.public_key)
+
+    # Full sync: check every block, including every signature
+    start = time.perf_counter()
+    full_valid = blockchain.is_chain_valid() and all(
+        tx.verify_transaction() for block in blockchain.chain for tx in block.transactions if tx.sender_public_key is not None
+    )
+    full_sync_time = time.perf_counter() - start
+
+    # Light sync: headers only
+    light_client = LightClient(blockchain.chain[0].get_header(), blockchain.block_time_target)
+    start = time.perf_counter()
+    light_valid = light_client.sync(blockchain)
+    light_sync_time = time.perf_counter() - start
+
+    full_size = deep_sizeof(blockchain.chain)
+    light_size = deep_sizeof(light_client.headers)
+
+    print(f"Chain height: {len(blockchain.chain) - 1}, transactions: {sum(len(b.transactions) for b in blockchain.chain)}")
+    print(f"Full node:    valid={full_valid}, memory={full_size / 1024:8.1f} KiB, sync={full_sync_time * 1000:8.1f} ms")
+    print(f"Light client: valid={light_valid}, memory={light_size / 1024:8.1f} KiB, sync={light_sync_time * 1000:8.1f} ms")
+    print(f"Light client uses {light_size / full_size:.2%} of the memory and {light_sync_time / full_sync_time:.2%} of the sync time")
+
+    # Inclusion proofs
+    print(f"Payment included: {light_client.verify_transaction_inclusion(payment, blockchain)}")
+    forged = Transaction(alice_wallet.public_key, bob_wallet.public_key, 4200, 3, payment.signature)
+    print(f"Forged payment included: {light_client.verify_transaction_inclusion(forged, blockchain)}")
+
+    # A tampered header is rejected by a fresh light client
+    blockchain.chain[5].merkle_root = "00" * 32
+    fresh_client = LightClient(blockchain.chain[0].get_header(), blockchain.block_time_target)
+    print(f"Sync against tampered chain: {fresh_client.sync(blockchain)}")
+
+'''
+Sample Output:
+
+Chain height: 31, transactions: 1532
+Full node:    valid=True, memory=   424.7 KiB, sync=    58.7 ms
+Light client: valid=True, memory=    12.2 KiB, sync=     0.3 ms
+Light client uses 2.87% of the memory and 0.43% of the sync time
+Payment included: True
+Forged payment included: False
+Header 5 has been tampered!
+Sync against tampered chain: False
+'''
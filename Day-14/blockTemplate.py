@@ -0,0 +1,423 @@
+'''
+Day-14:
+Learnt about block templates. Miners do not rebuild the next block from the whole transaction pool every time something
+changes, they keep a template up to date as transactions come and go.
+Implemented a block template that is updated incrementally: a running fee total, the reward transaction, a Merkle tree where
+only the path of a changed leaf is re-hashed, and a pre-hashed header prefix so the miner only has to feed in the nonce.
+Compared the time to start mining on the freshest block against building the block from scratch.
+'''
+
+import hashlib
+import time
+import rsa
+
+# Transaction class remains the same as Day-13
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Merkle tree that keeps every level, so changing one leaf only re-hashes the path above it.
+# Gives the same root as merkle_root() for the same leaves.
+class IncrementalMerkleTree:
+    def __init__(self):
+        self.levels = [[]]  # levels[0] are the leaves, the last level is the root
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def root(self):
+        if not self.levels[0]:
+            return hashlib.sha256(b"").hexdigest()
+        return self.levels[-1][0].hex()
+
+    def append(self, leaf):
+        self.levels[0].append(leaf)
+        self._rehash_path(len(self.levels[0]) - 1)
+
+    def update(self, position, leaf):
+        self.levels[0][position] = leaf
+        self._rehash_path(position)
+
+    # Remove a leaf by moving the last leaf into its place, so only two paths change
+    def remove(self, position):
+        leaves = self.levels[0]
+        last = leaves.pop()
+        if position < len(leaves):
+            leaves[position] = last
+            self._rehash_path(position)
+        if leaves:
+            self._rehash_path(len(leaves) - 1)
+        else:
+            self.levels = [[]]
+
+    def _rehash_path(self, position):
+        level = 0
+        while len(self.levels[level]) > 1:
+            nodes = self.levels[level]
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            upper = self.levels[level + 1]
+
+            parent = position // 2
+            left = nodes[2 * parent]
+            right = nodes[2 * parent + 1] if 2 * parent + 1 < len(nodes) else left
+            if parent == len(upper):
+                upper.append(hash_pair(left, right))
+            else:
+                upper[parent] = hash_pair(left, right)
+            # The level above shrinks when leaves are removed
+            del upper[(len(nodes) + 1) // 2:]
+
+            position = parent
+            level += 1
+        del self.levels[level + 1:]
+
+
+# Block class remains the same as Day-13
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.index = index
+        self.transactions = transactions  # List of transactions
+        self.timestamp = time.time()
+        self.previous_hash = previous_hash
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        self.difficulty = difficulty
+        self.nonce = 0
+        self.merkle_root = merkle_root([tx.txid() for tx in transactions])
+        self.hash = self.calculate_hash()
+
+    def calculate_hash(self):
+        return calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root, self.difficulty, self.nonce)
+
+    def mine_block(self):
+        target = '0' * self.difficulty
+        while self.hash[:self.difficulty] != target:
+            self.nonce += 1
+            self.hash = self.calculate_hash()
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {self.transactions}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Template for the next block, kept in step with the transaction pool.
+# The reward transaction is always the first leaf, the pool transactions follow it.
+class BlockTemplate:
+    def __init__(self, blockchain, miner_address):
+        self.blockchain = blockchain
+        self.miner_address = miner_address
+        self.total_fees = 0
+        self.transactions = []
+        self.positions = {}  # txid -> position in self.transactions
+        self.tree = IncrementalMerkleTree()
+        self.refresh()
+
+        self.reward_transaction = self._make_reward_transaction()
+        self._add_leaf(self.reward_transaction)
+        for tx in blockchain.transaction_pool:
+            self.add_transaction(tx)
+        self._update_prefix()
+
+    def _make_reward_transaction(self):
+        return Transaction(None, self.miner_address, self.blockchain.mining_reward + self.total_fees)
+
+    def _add_leaf(self, tx):
+        txid = tx.txid()
+        self.positions[txid] = len(self.transactions)
+        self.transactions.append(tx)
+        self.tree.append(txid)
+
+    # Only the reward leaf and the new leaf are re-hashed
+    def _update_reward(self):
+        del self.positions[self.reward_transaction.txid()]
+        self.reward_transaction = self._make_reward_transaction()
+        self.transactions[0] = self.reward_transaction
+        txid = self.reward_transaction.txid()
+        self.positions[txid] = 0
+        self.tree.update(0, txid)
+        self._update_prefix()
+
+    def add_transaction(self, tx):
+        self._add_leaf(tx)
+        self.total_fees += tx.fee
+        self._update_reward()
+
+    def remove_transaction(self, tx):
+        position = self.positions.pop(tx.txid())
+        last = self.transactions.pop()
+        if position < len(self.transactions):
+            self.transactions[position] = last
+            self.positions[last.txid()] = position
+        self.tree.remove(position)
+        self.total_fees -= tx.fee
+        self._update_reward()
+
+    # New timestamp and difficulty on top of the current chain tip
+    def refresh(self):
+        latest_block = self.blockchain.get_latest_block()
+        self.index = latest_block.index + 1
+        self.previous_hash = latest_block.hash
+        self.timestamp = time.time()
+        self.difficulty = self.blockchain.next_difficulty(self.timestamp)
+        self._update_prefix()
+
+    # Everything in the header except the nonce is hashed once, the miner copies this state
+    def _update_prefix(self):
+        self.merkle_root = self.tree.root()
+        prefix = f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+        self.prefix_hasher = hashlib.sha256(prefix.encode())
+
+    def mine(self):
+        self.refresh()
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = self.prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                return self.to_block(nonce, block_hash)
+            nonce += 1
+
+    def to_block(self, nonce, block_hash):
+        block = Block.__new__(Block)
+        block.index = self.index
+        block.transactions = list(self.transactions)
+        block.timestamp = self.timestamp
+        block.previous_hash = self.previous_hash
+        block.miner_address = self.miner_address
+        block.reward = self.blockchain.mining_reward
+        block.difficulty = self.difficulty
+        block.nonce = nonce
+        block.merkle_root = self.merkle_root
+        block.hash = block_hash
+        return block
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Blockchain class now keeps a block template in step with its transaction pool
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50):
+        self.chain = [self.create_genesis_block()]
+        self.transaction_pool = []
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.block_template = None
+
+    def create_genesis_block(self):
+        return Block(0, [], "0", miner_address=None, reward=0, difficulty=2)
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def add_block(self, new_block):
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        # Difficulty is part of the header hash, so the hash from __init__ is stale now
+        new_block.hash = new_block.calculate_hash()
+        new_block.mine_block()
+        self.chain.append(new_block)
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = self.next_difficulty(new_block.timestamp)
+
+    # Difficulty for a block created at `timestamp` on top of the current tip
+    def next_difficulty(self, timestamp):
+        latest_block = self.get_latest_block()
+        time_difference = timestamp - latest_block.timestamp
+
+        if time_difference < self.block_time_target:
+            return latest_block.difficulty + 1
+        elif time_difference > self.block_time_target:
+            return max(1, latest_block.difficulty - 1)
+        else:
+            return latest_block.difficulty
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+            if self.block_template is not None:
+                self.block_template.add_transaction(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    def remove_transaction_from_pool(self, transaction):
+        self.transaction_pool.remove(transaction)
+        if self.block_template is not None:
+            self.block_template.remove_transaction(transaction)
+
+    # The template is built from the pool once, then kept up to date
+    def get_block_template(self, miner_address):
+        if self.block_template is None or self.block_template.miner_address != miner_address:
+            self.block_template = BlockTemplate(self, miner_address)
+        return self.block_template
+
+    def mine_pending_transactions(self, miner_address):
+        if len(self.transaction_pool) > 0:
+            new_block = self.get_block_template(miner_address).mine()
+            self.chain.append(new_block)
+
+            # Every pool transaction is in the block, so the next template starts empty
+            self.transaction_pool = []
+            self.block_template = BlockTemplate(self, miner_address)
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if current_block.merkle_root != merkle_root([tx.txid() for tx in current_block.transactions]):
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.hash != current_block.calculate_hash():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# The old way: build the block from the whole pool before mining can start
+def build_block_from_scratch(blockchain, miner_address):
+    transactions = list(blockchain.transaction_pool)
+    total_fees = sum(tx.fee for tx in transactions)
+    transactions.append(Transaction(None, miner_address, blockchain.mining_reward + total_fees))
+    new_block = Block(len(blockchain.chain), transactions, blockchain.get_latest_block().hash, miner_address, blockchain.mining_reward)
+    blockchain.adjust_difficulty(new_block)
+    return new_block
+
+
+if __name__ == "__main__":
+    alice_wallet = Wallet()
+    bob_wallet = Wallet()
+    miner_wallet = Wallet()
+
+    # Sign the transactions once up front, the benchmark is about the template and not about signing
+    signed = [alice_wallet.create_transaction(bob_wallet.public_key, i % 100 + 1, fee=i % 5 + 1) for i in range(5100)]
+
+    for pool_size in (100, 1000, 5000):
+        blockchain = Blockchain(block_time_target=0.05)
+        for tx in signed[:pool_size]:
+            blockchain.add_transaction_to_pool(tx)
+        template = blockchain.get_block_template(miner_wallet.public_key)
+
+        # Time from "a transaction arrived" to "ready to hash nonces" on the freshest block
+        rounds = 50
+        start = time.perf_counter()
+        for tx in signed[pool_size:pool_size + rounds]:
+            blockchain.transaction_pool.append(tx)
+            build_block_from_scratch(blockchain, miner_wallet.public_key)
+        scratch_time = (time.perf_counter() - start) / rounds
+        for tx in signed[pool_size:pool_size + rounds]:
+            blockchain.transaction_pool.remove(tx)
+
+        start = time.perf_counter()
+        for tx in signed[pool_size:pool_size + rounds]:
+            blockchain.transaction_pool.append(tx)
+            template.add_transaction(tx)
+            template.refresh()
+        template_time = (time.perf_counter() - start) / rounds
+
+        print(f"Pool of {pool_size:>5} transactions: from scratch {scratch_time * 1000:8.3f} ms, "
+              f"incremental template {template_time * 1000:6.3f} ms ({scratch_time / template_time:6.1f}x faster)")
+
+    # Mine from the template, including a transaction that left the pool before mining
+    blockchain = Blockchain(block_time_target=0.05)
+    blockchain.get_block_template(miner_wallet.public_key)
+    for tx in signed[:20]:
+        blockchain.add_transaction_to_pool(tx)
+    blockchain.remove_transaction_from_pool(signed[3])
+    blockchain.mine_pending_transactions(miner_wallet.public_key)
+
+    latest_block = blockchain.get_latest_block()
+    print(f"Mined block with {len(latest_block.transactions)} transactions, reward transaction amount: {latest_block.transactions[0].amount}")
+    print(f"Incremental Merkle root matches full rebuild: {latest_block.merkle_root == merkle_root([tx.txid() for tx in latest_block.transactions])}")
+
+    if blockchain.is_chain_valid():
+        print("Blockchain is valid!")
+    else:
+        print("Blockchain is not valid!")
+
+'''
+Sample Output:
+
+Pool of   100 transactions: from scratch    0.742 ms, incremental template  0.045 ms (  16.5x faster)
+Pool of  1000 transactions: from scratch    6.047 ms, incremental template  0.055 ms ( 109.5x faster)
+Pool of  5000 transactions: from scratch   29.798 ms, incremental template  0.071 ms ( 422.1x faster)
+Mined block with 20 transactions, reward transaction amount: 106
+Incremental Merkle root matches full rebuild: True
+Blockchain is valid!
+'''
@@ -0,0 +1,747 @@
+'''
+Day-15:
+Learnt about instrumenting the hot paths of a node. Until now mining, hashing, signature checks, pool intake and chain
+validation only print, so there was no way to tell where the time goes.
+Implemented a small metrics layer with counters, gauges, histograms and timers (hashrate, nonces tried, time per block,
+signature verify latency, pool size, validation throughput). It can be read as a text metrics endpoint or a JSON snapshot,
+has an optional sampling profiler, and costs close to nothing when it is turned off.
+'''
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import Counter as FrameCounter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import rsa
+
+# Default histogram buckets in seconds, from 10 microseconds to 10 seconds
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+
+# Counter that only goes up
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def reset(self):
+        self.value = 0
+
+    def to_text(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+    def snapshot(self):
+        return self.value
+
+
+# Gauge holds the last value that was set
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def reset(self):
+        self.value = 0
+
+    def to_text(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+    def snapshot(self):
+        return self.value
+
+
+# Histogram with fixed buckets, so observing a value is a short loop and no allocation
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def reset(self):
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def to_text(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for upper_bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{upper_bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "buckets": dict(zip((str(b) for b in self.buckets), self.bucket_counts)),
+        }
+
+
+# Context manager that records how long a block of code took into a histogram
+class Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed)
+
+
+# Timer used when metrics are turned off
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+# Samples the stack of one thread at a fixed interval and counts the functions it finds
+class SamplingProfiler:
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.function_counts = FrameCounter()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples += 1
+                # Count each function once per sample, so recursion does not inflate it
+                seen = set()
+                while frame is not None:
+                    code = frame.f_code
+                    seen.add(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.function_counts.update(seen)
+            time.sleep(self.interval)
+
+    # Share of samples in which each function was on the stack
+    def report(self, top=10):
+        return [(name, count / self.samples) for name, count in self.function_counts.most_common(top)] if self.samples else []
+
+
+# Registry for all metrics. Code on the hot path checks `metrics.enabled` before doing any work.
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.registry = {}
+        self.profiler = None
+
+    def counter(self, name, help_text):
+        return self.registry.setdefault(name, Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self.registry.setdefault(name, Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.registry.setdefault(name, Histogram(name, help_text, buckets))
+
+    # Zero every metric in place, so the module level references stay valid
+    def reset(self):
+        for metric in self.registry.values():
+            metric.reset()
+
+    def timer(self, histogram):
+        return Timer(histogram) if self.enabled else NULL_TIMER
+
+    def start_profiler(self, thread_id=None, interval=0.001):
+        self.profiler = SamplingProfiler(thread_id or threading.get_ident(), interval)
+        self.profiler.start()
+        return self.profiler
+
+    def stop_profiler(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+        return self.profiler
+
+    # Text exposition format, as served on a /metrics endpoint
+    def to_text(self):
+        lines = []
+        for metric in self.registry.values():
+            lines.extend(metric.to_text())
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return json.dumps({name: metric.snapshot() for name, metric in self.registry.items()}, indent=2)
+
+    # Serve the metrics over HTTP on /metrics (text) and /metrics.json from a background thread
+    def serve(self, port=9100):
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.to_text().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = metrics.to_json().encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Metrics are off unless turned on with `metrics.enabled = True`
+metrics = Metrics()
+
+MINING_NONCES = metrics.counter("mining_nonces_total", "Nonces tried while mining")
+MINING_HASHRATE = metrics.gauge("mining_hashrate", "Hashes per second while mining the last block")
+MINING_BLOCK_SECONDS = metrics.histogram("mining_block_seconds", "Time spent mining each block")
+BLOCK_HASHES = metrics.counter("block_hash_calculations_total", "Calls to Block.calculate_hash")
+SIGNATURE_VERIFY_SECONDS = metrics.histogram("signature_verify_seconds", "Latency of Transaction.verify_transaction")
+SIGNATURE_FAILURES = metrics.counter("signature_verify_failures_total", "Transactions that failed signature verification")
+POOL_ADMITTED = metrics.counter("pool_admitted_total", "Transactions admitted to the pool")
+POOL_REJECTED = metrics.counter("pool_rejected_total", "Transactions rejected by the pool")
+POOL_SIZE = metrics.gauge("pool_size", "Transactions waiting in the pool")
+VALIDATION_SECONDS = metrics.histogram("chain_validation_seconds", "Time spent in Blockchain.is_chain_valid")
+VALIDATION_BLOCKS = metrics.counter("chain_validation_blocks_total", "Blocks checked by Blockchain.is_chain_valid")
+VALIDATION_THROUGHPUT = metrics.gauge("chain_validation_blocks_per_second", "Blocks per second in the last chain validation")
+
+# Transaction class now times its signature checks
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+
+    def verify_transaction(self):
+        with metrics.timer(SIGNATURE_VERIFY_SECONDS):
+            valid = self._verify_signature()
+        if not valid and metrics.enabled:
+            SIGNATURE_FAILURES.inc()
+        return valid
+
+    def _verify_signature(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Merkle tree that keeps every level, so changing one leaf only re-hashes the path above it.
+# Gives the same root as merkle_root() for the same leaves.
+class IncrementalMerkleTree:
+    def __init__(self):
+        self.levels = [[]]  # levels[0] are the leaves, the last level is the root
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def root(self):
+        if not self.levels[0]:
+            return hashlib.sha256(b"").hexdigest()
+        return self.levels[-1][0].hex()
+
+    def append(self, leaf):
+        self.levels[0].append(leaf)
+        self._rehash_path(len(self.levels[0]) - 1)
+
+    def update(self, position, leaf):
+        self.levels[0][position] = leaf
+        self._rehash_path(position)
+
+    # Remove a leaf by moving the last leaf into its place, so only two paths change
+    def remove(self, position):
+        leaves = self.levels[0]
+        last = leaves.pop()
+        if position < len(leaves):
+            leaves[position] = last
+            self._rehash_path(position)
+        if leaves:
+            self._rehash_path(len(leaves) - 1)
+        else:
+            self.levels = [[]]
+
+    def _rehash_path(self, position):
+        level = 0
+        while len(self.levels[level]) > 1:
+            nodes = self.levels[level]
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            upper = self.levels[level + 1]
+
+            parent = position // 2
+            left = nodes[2 * parent]
+            right = nodes[2 * parent + 1] if 2 * parent + 1 < len(nodes) else left
+            if parent == len(upper):
+                upper.append(hash_pair(left, right))
+            else:
+                upper[parent] = hash_pair(left, right)
+            # The level above shrinks when leaves are removed
+            del upper[(len(nodes) + 1) // 2:]
+
+            position = parent
+            level += 1
+        del self.levels[level + 1:]
+
+
+# The time per block itself goes into MINING_BLOCK_SECONDS through metrics.timer
+def record_mining(nonces, elapsed):
+    MINING_NONCES.inc(nonces)
+    MINING_HASHRATE.set(nonces / elapsed if elapsed > 0 else 0.0)
+
+
+# Block class now counts hashes and mining time
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.index = index
+        self.transactions = transactions  # List of transactions
+        self.timestamp = time.time()
+        self.previous_hash = previous_hash
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        self.difficulty = difficulty
+        self.nonce = 0
+        self.merkle_root = merkle_root([tx.txid() for tx in transactions])
+        self.hash = self.calculate_hash()
+
+    def calculate_hash(self):
+        if metrics.enabled:
+            BLOCK_HASHES.inc()
+        return calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root, self.difficulty, self.nonce)
+
+    def mine_block(self):
+        start_nonce = self.nonce
+        target = '0' * self.difficulty
+        with metrics.timer(MINING_BLOCK_SECONDS) as timer:
+            while self.hash[:self.difficulty] != target:
+                self.nonce += 1
+                self.hash = self.calculate_hash()
+        if metrics.enabled:
+            record_mining(self.nonce - start_nonce + 1, timer.elapsed)
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {self.transactions}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Template for the next block, kept in step with the transaction pool.
+# The reward transaction is always the first leaf, the pool transactions follow it.
+class BlockTemplate:
+    def __init__(self, blockchain, miner_address):
+        self.blockchain = blockchain
+        self.miner_address = miner_address
+        self.total_fees = 0
+        self.transactions = []
+        self.positions = {}  # txid -> position in self.transactions
+        self.tree = IncrementalMerkleTree()
+        self.refresh()
+
+        self.reward_transaction = self._make_reward_transaction()
+        self._add_leaf(self.reward_transaction)
+        for tx in blockchain.transaction_pool:
+            self.add_transaction(tx)
+        self._update_prefix()
+
+    def _make_reward_transaction(self):
+        return Transaction(None, self.miner_address, self.blockchain.mining_reward + self.total_fees)
+
+    def _add_leaf(self, tx):
+        txid = tx.txid()
+        self.positions[txid] = len(self.transactions)
+        self.transactions.append(tx)
+        self.tree.append(txid)
+
+    # Only the reward leaf and the new leaf are re-hashed
+    def _update_reward(self):
+        del self.positions[self.reward_transaction.txid()]
+        self.reward_transaction = self._make_reward_transaction()
+        self.transactions[0] = self.reward_transaction
+        txid = self.reward_transaction.txid()
+        self.positions[txid] = 0
+        self.tree.update(0, txid)
+        self._update_prefix()
+
+    def add_transaction(self, tx):
+        self._add_leaf(tx)
+        self.total_fees += tx.fee
+        self._update_reward()
+
+    def remove_transaction(self, tx):
+        position = self.positions.pop(tx.txid())
+        last = self.transactions.pop()
+        if position < len(self.transactions):
+            self.transactions[position] = last
+            self.positions[last.txid()] = position
+        self.tree.remove(position)
+        self.total_fees -= tx.fee
+        self._update_reward()
+
+    # New timestamp and difficulty on top of the current chain tip
+    def refresh(self):
+        latest_block = self.blockchain.get_latest_block()
+        self.index = latest_block.index + 1
+        self.previous_hash = latest_block.hash
+        self.timestamp = time.time()
+        self.difficulty = self.blockchain.next_difficulty(self.timestamp)
+        self._update_prefix()
+
+    # Everything in the header except the nonce is hashed once, the miner copies this state
+    def _update_prefix(self):
+        self.merkle_root = self.tree.root()
+        prefix = f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+        self.prefix_hasher = hashlib.sha256(prefix.encode())
+
+    def mine(self):
+        self.refresh()
+        target = '0' * self.difficulty
+        nonce = 0
+        with metrics.timer(MINING_BLOCK_SECONDS) as timer:
+            while True:
+                hasher = self.prefix_hasher.copy()
+                hasher.update(str(nonce).encode())
+                block_hash = hasher.hexdigest()
+                if block_hash[:self.difficulty] == target:
+                    break
+                nonce += 1
+        # Nonces are counted once per block, not once per hash
+        if metrics.enabled:
+            record_mining(nonce + 1, timer.elapsed)
+        return self.to_block(nonce, block_hash)
+
+    def to_block(self, nonce, block_hash):
+        block = Block.__new__(Block)
+        block.index = self.index
+        block.transactions = list(self.transactions)
+        block.timestamp = self.timestamp
+        block.previous_hash = self.previous_hash
+        block.miner_address = self.miner_address
+        block.reward = self.blockchain.mining_reward
+        block.difficulty = self.difficulty
+        block.nonce = nonce
+        block.merkle_root = self.merkle_root
+        block.hash = block_hash
+        return block
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Blockchain class now reports pool intake and validation metrics
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50):
+        self.chain = [self.create_genesis_block()]
+        self.transaction_pool = []
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.block_template = None
+
+    def create_genesis_block(self):
+        return Block(0, [], "0", miner_address=None, reward=0, difficulty=2)
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def add_block(self, new_block):
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        # Difficulty is part of the header hash, so the hash from __init__ is stale now
+        new_block.hash = new_block.calculate_hash()
+        new_block.mine_block()
+        self.chain.append(new_block)
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = self.next_difficulty(new_block.timestamp)
+
+    # Difficulty for a block created at `timestamp` on top of the current tip
+    def next_difficulty(self, timestamp):
+        latest_block = self.get_latest_block()
+        time_difference = timestamp - latest_block.timestamp
+
+        if time_difference < self.block_time_target:
+            return latest_block.difficulty + 1
+        elif time_difference > self.block_time_target:
+            return max(1, latest_block.difficulty - 1)
+        else:
+            return latest_block.difficulty
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+            if self.block_template is not None:
+                self.block_template.add_transaction(transaction)
+            if metrics.enabled:
+                POOL_ADMITTED.inc()
+                POOL_SIZE.set(len(self.transaction_pool))
+        else:
+            if metrics.enabled:
+                POOL_REJECTED.inc()
+            print("Transaction is invalid and was not added to the pool.")
+
+    def remove_transaction_from_pool(self, transaction):
+        self.transaction_pool.remove(transaction)
+        if self.block_template is not None:
+            self.block_template.remove_transaction(transaction)
+
+    # The template is built from the pool once, then kept up to date
+    def get_block_template(self, miner_address):
+        if self.block_template is None or self.block_template.miner_address != miner_address:
+            self.block_template = BlockTemplate(self, miner_address)
+        return self.block_template
+
+    def mine_pending_transactions(self, miner_address):
+        if len(self.transaction_pool) > 0:
+            new_block = self.get_block_template(miner_address).mine()
+            self.chain.append(new_block)
+
+            # Every pool transaction is in the block, so the next template starts empty
+            self.transaction_pool = []
+            self.block_template = BlockTemplate(self, miner_address)
+            if metrics.enabled:
+                POOL_SIZE.set(0)
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        with metrics.timer(VALIDATION_SECONDS) as timer:
+            valid = self._check_chain()
+        if metrics.enabled:
+            VALIDATION_BLOCKS.inc(len(self.chain) - 1)
+            VALIDATION_THROUGHPUT.set((len(self.chain) - 1) / timer.elapsed if timer.elapsed > 0 else 0.0)
+        return valid
+
+    def _check_chain(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if current_block.merkle_root != merkle_root([tx.txid() for tx in current_block.transactions]):
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.hash != current_block.calculate_hash():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Pool intake, mining and validation workload used to measure the cost of the metrics
+def run_workload(signed, miner_address, blocks, block_time_target):
+    blockchain = Blockchain(block_time_target=block_time_target)
+    per_block = len(signed) // blocks
+    for i in range(blocks):
+        for tx in signed[i * per_block:(i + 1) * per_block]:
+            blockchain.add_transaction_to_pool(tx)
+        blockchain.mine_pending_transactions(miner_address)
+    for _ in range(20):
+        blockchain.is_chain_valid()
+    return blockchain
+
+
+# Same work as Block.calculate_hash without the metrics check
+def bare_calculate_hash(block):
+    return calculate_header_hash(block.index, block.timestamp, block.previous_hash, block.merkle_root, block.difficulty, block.nonce)
+
+
+if __name__ == "__main__":
+    import timeit
+    from urllib.request import urlopen
+
+    alice_wallet = Wallet()
+    bob_wallet = Wallet()
+    miner_wallet = Wallet()
+    signed = [alice_wallet.create_transaction(bob_wallet.public_key, i % 100 + 1, fee=i % 5 + 1) for i in range(1000)]
+
+    # Cost of the hooks when metrics are off and when they are on.
+    # A block time target of 0 keeps difficulty at 1 so mining luck does not hide the overhead.
+    timings = {False: [], True: []}
+    for _ in range(3):
+        for enabled in (False, True):
+            metrics.enabled = enabled
+            start = time.perf_counter()
+            run_workload(signed, miner_wallet.public_key, blocks=10, block_time_target=0)
+            timings[enabled].append(time.perf_counter() - start)
+    disabled_time, enabled_time = min(timings[False]), min(timings[True])
+    print(f"Workload with metrics off: {disabled_time * 1000:.1f} ms, on: {enabled_time * 1000:.1f} ms "
+          f"({enabled_time / disabled_time - 1:+.1%})")
+
+    # Per call cost of a disabled check on the hottest path
+    metrics.enabled = False
+    block = Block(1, [], "0", None, 0)
+    calls = 200_000
+    hooked = min(timeit.repeat(block.calculate_hash, number=calls, repeat=5))
+    bare = min(timeit.repeat(lambda: bare_calculate_hash(block), number=calls, repeat=5))
+    print(f"calculate_hash with metrics off: {hooked / calls * 1e9:.0f} ns per call, without hook: {bare / calls * 1e9:.0f} ns per call")
+
+    # Export with the profiler running, counting only this run
+    metrics.reset()
+    metrics.enabled = True
+    profiler = metrics.start_profiler(interval=0.0005)
+    run_workload(signed, miner_wallet.public_key, blocks=10, block_time_target=0.05)
+    metrics.stop_profiler()
+
+    server = metrics.serve(port=0)
+    text = urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics").read().decode()
+    snapshot = json.loads(urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics.json").read())
+    server.shutdown()
+
+    print("\nFrom /metrics:")
+    for line in text.splitlines():
+        if not line.startswith("#") and "_bucket" not in line:
+            print(line)
+
+    print("\nFrom /metrics.json:")
+    print(f"Signature verify mean latency: {snapshot['signature_verify_seconds']['mean'] * 1e6:.1f} us")
+    print(f"Mining hashrate (last block): {snapshot['mining_hashrate']:.0f} H/s")
+    print(f"Validation throughput (last run): {snapshot['chain_validation_blocks_per_second']:.0f} blocks/s")
+
+    print(f"\nSampling profiler, {profiler.samples} samples:")
+    for name, share in profiler.report(top=8):
+        print(f"{share:6.1%}  {name}")
+
+'''
+Sample Output:
+
+Workload with metrics off: 117.6 ms, on: 114.7 ms (-2.5%)
+calculate_hash with metrics off: 1528 ns per call, without hook: 1581 ns per call
+
+From /metrics:
+mining_nonces_total 739202
+mining_hashrate 1651000.7037370396
+mining_block_seconds_sum 0.464651123999829
+mining_block_seconds_count 10
+block_hash_calculations_total 201
+signature_verify_seconds_sum 0.026773504009725002
+signature_verify_seconds_count 1000
+signature_verify_failures_total 0
+pool_admitted_total 1000
+pool_rejected_total 0
+pool_size 0
+chain_validation_seconds_sum 0.0674257979981121
+chain_validation_seconds_count 20
+chain_validation_blocks_total 200
+chain_validation_blocks_per_second 2959.754150813915
+
+From /metrics.json:
+Signature verify mean latency: 26.8 us
+Mining hashrate (last block): 1651001 H/s
+Validation throughput (last run): 2960 blocks/s
+
+Sampling profiler, 104 samples:
+100.0%  <module> (metrics.py:1)
+ 99.0%  run_workload (metrics.py:637)
+ 80.8%  mine (metrics.py:490)
+ 80.8%  mine_pending_transactions (metrics.py:595)
+ 11.5%  _check_chain (metrics.py:616)
+ 11.5%  is_chain_valid (metrics.py:608)
+  8.7%  txid (metrics.py:288)
+  7.7%  <listcomp> (metrics.py:621)
+'''
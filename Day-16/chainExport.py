@@ -0,0 +1,544 @@
+'''
+Day-16:
+Learnt about how nodes store and ship their chain. Until now the only way to look at a chain was print_block, and the whole
+chain had to sit in memory as a list.
+Implemented streaming export and import of the chain, as JSON Lines and as a compact length-prefixed binary format, using
+generators so only one block is in memory at a time. Imports can check hashes and linkage while streaming in, and can resume
+from a given height.
+'''
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import tracemalloc
+import rsa
+
+# First bytes of a binary chain file
+BINARY_MAGIC = b"CHAIN16\x00"
+
+# Transaction class remains the same as Day-13, with dict conversion from Day-12
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        return {
+            "sender": key_to_list(self.sender_public_key),
+            "receiver": key_to_list(self.receiver),
+            "amount": self.amount,
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+
+    @staticmethod
+    def from_dict(data):
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        return Transaction(key_from_list(data["sender"]), key_from_list(data["receiver"]),
+                           data["amount"], data["fee"], signature)
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block class from Day-13, now convertible to and from a dict
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.index = index
+        self.transactions = transactions  # List of transactions
+        self.timestamp = time.time()
+        self.previous_hash = previous_hash
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        self.difficulty = difficulty
+        self.nonce = 0
+        self.merkle_root = merkle_root([tx.txid() for tx in transactions])
+        self.hash = self.calculate_hash()
+
+    def calculate_hash(self):
+        return calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root, self.difficulty, self.nonce)
+
+    def mine_block(self):
+        target = '0' * self.difficulty
+        while self.hash[:self.difficulty] != target:
+            self.nonce += 1
+            self.hash = self.calculate_hash()
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "miner_address": key_to_list(self.miner_address),
+            "reward": self.reward,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    # Rebuild a block exactly as it was stored, without recomputing anything
+    @staticmethod
+    def from_fields(index, timestamp, previous_hash, merkle_root, miner_address, reward, difficulty, nonce, hash, transactions):
+        block = Block.__new__(Block)
+        block.index = index
+        block.transactions = transactions
+        block.timestamp = timestamp
+        block.previous_hash = previous_hash
+        block.miner_address = miner_address
+        block.reward = reward
+        block.difficulty = difficulty
+        block.nonce = nonce
+        block.merkle_root = merkle_root
+        block.hash = hash
+        return block
+
+    @staticmethod
+    def from_dict(data):
+        return Block.from_fields(data["index"], data["timestamp"], data["previous_hash"], data["merkle_root"],
+                                 key_from_list(data["miner_address"]), data["reward"], data["difficulty"], data["nonce"],
+                                 data["hash"], [Transaction.from_dict(tx) for tx in data["transactions"]])
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {self.transactions}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Blockchain class can now start from an imported genesis block
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_block=None):
+        self.chain = [genesis_block or self.create_genesis_block()]
+        self.transaction_pool = []
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+
+    def create_genesis_block(self):
+        return Block(0, [], "0", miner_address=None, reward=0, difficulty=2)
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def add_block(self, new_block):
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        # Difficulty is part of the header hash, so the hash from __init__ is stale now
+        new_block.hash = new_block.calculate_hash()
+        new_block.mine_block()
+        self.chain.append(new_block)
+
+    def adjust_difficulty(self, new_block):
+        latest_block = self.get_latest_block()
+        time_difference = new_block.timestamp - latest_block.timestamp
+
+        if time_difference < self.block_time_target:
+            new_block.difficulty = latest_block.difficulty + 1
+        elif time_difference > self.block_time_target:
+            new_block.difficulty = max(1, latest_block.difficulty - 1)
+        else:
+            new_block.difficulty = latest_block.difficulty
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    def mine_pending_transactions(self, miner_address):
+        if len(self.transaction_pool) > 0:
+            total_fees = sum(tx.fee for tx in self.transaction_pool)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+            self.transaction_pool.append(reward_transaction)
+
+            new_block = Block(len(self.chain), self.transaction_pool, self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            self.add_block(new_block)
+            self.transaction_pool = []
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if current_block.merkle_root != merkle_root([tx.txid() for tx in current_block.transactions]):
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.hash != current_block.calculate_hash():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# ---- JSON Lines format: one block per line ----
+
+def encode_jsonl(blocks):
+    for block in blocks:
+        yield json.dumps(block.to_dict(), separators=(",", ":")) + "\n"
+
+
+def read_jsonl(path, start_height=0):
+    with open(path) as f:
+        for line in f:
+            data = json.loads(line)
+            if data["index"] >= start_height:
+                yield Block.from_dict(data)
+
+
+# ---- Binary format: magic, then records of [4 byte length][block] ----
+# Block and Merkle hashes are stored as raw bytes, the previous hash as length-prefixed text (it is "0" for the genesis
+# block), keys as length-prefixed n plus e. Amounts and fees are whole coins.
+
+def pack_bytes(data):
+    return struct.pack(">H", len(data)) + data
+
+
+def unpack_bytes(buffer, offset):
+    (length,) = struct.unpack_from(">H", buffer, offset)
+    offset += 2
+    return buffer[offset:offset + length], offset + length
+
+
+def pack_key(public_key):
+    if public_key is None:
+        return pack_bytes(b"")
+    return pack_bytes(public_key.n.to_bytes((public_key.n.bit_length() + 7) // 8, "big")) + struct.pack(">I", public_key.e)
+
+
+def unpack_key(buffer, offset):
+    n_bytes, offset = unpack_bytes(buffer, offset)
+    if not n_bytes:
+        return None, offset
+    (e,) = struct.unpack_from(">I", buffer, offset)
+    return rsa.PublicKey(int.from_bytes(n_bytes, "big"), e), offset + 4
+
+
+def encode_block_binary(block):
+    parts = [
+        struct.pack(">QdIQq", block.index, block.timestamp, block.difficulty, block.nonce, block.reward),
+        pack_bytes(block.previous_hash.encode()),
+        bytes.fromhex(block.merkle_root),
+        bytes.fromhex(block.hash),
+        pack_key(block.miner_address),
+        struct.pack(">I", len(block.transactions)),
+    ]
+    for tx in block.transactions:
+        parts.append(pack_key(tx.sender_public_key))
+        parts.append(pack_key(tx.receiver))
+        parts.append(struct.pack(">qq", tx.amount, tx.fee))
+        parts.append(pack_bytes(tx.signature or b""))
+    return b"".join(parts)
+
+
+def decode_block_binary(buffer):
+    index, timestamp, difficulty, nonce, reward = struct.unpack_from(">QdIQq", buffer, 0)
+    offset = struct.calcsize(">QdIQq")
+    previous_hash, offset = unpack_bytes(buffer, offset)
+    block_merkle_root = buffer[offset:offset + 32].hex()
+    block_hash = buffer[offset + 32:offset + 64].hex()
+    miner_address, offset = unpack_key(buffer, offset + 64)
+    (count,) = struct.unpack_from(">I", buffer, offset)
+    offset += 4
+
+    transactions = []
+    for _ in range(count):
+        sender, offset = unpack_key(buffer, offset)
+        receiver, offset = unpack_key(buffer, offset)
+        amount, fee = struct.unpack_from(">qq", buffer, offset)
+        signature, offset = unpack_bytes(buffer, offset + 16)
+        transactions.append(Transaction(sender, receiver, amount, fee, signature or None))
+
+    return Block.from_fields(index, timestamp, previous_hash.decode(), block_merkle_root, miner_address, reward,
+                             difficulty, nonce, block_hash, transactions)
+
+
+def encode_binary(blocks):
+    for block in blocks:
+        record = encode_block_binary(block)
+        yield struct.pack(">I", len(record)) + record
+
+
+# Blocks below start_height are skipped by reading only their index and seeking past them
+def read_binary(path, start_height=0):
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary chain file")
+        while True:
+            length_bytes = f.read(4)
+            if not length_bytes:
+                return
+            (length,) = struct.unpack(">I", length_bytes)
+            (index,) = struct.unpack(">Q", f.read(8))
+            if index < start_height:
+                f.seek(length - 8, os.SEEK_CUR)
+                continue
+            yield decode_block_binary(struct.pack(">Q", index) + f.read(length - 8))
+
+
+# ---- Export and import ----
+
+# Write blocks to a file one at a time. With append=True an earlier export is continued.
+def export_chain(blocks, path, fmt="jsonl", append=False):
+    count = 0
+    if fmt == "jsonl":
+        with open(path, "a" if append else "w") as f:
+            for line in encode_jsonl(blocks):
+                f.write(line)
+                count += 1
+    else:
+        with open(path, "ab" if append else "wb") as f:
+            if not append or f.tell() == 0:
+                f.write(BINARY_MAGIC)
+            for record in encode_binary(blocks):
+                f.write(record)
+                count += 1
+    return count
+
+
+def read_chain(path, fmt="jsonl", start_height=0):
+    return read_jsonl(path, start_height) if fmt == "jsonl" else read_binary(path, start_height)
+
+
+# Check blocks as they stream past, keeping only the previous block.
+# block_time_target must match the chain's, it decides the difficulty each block should have.
+# Raises ValueError at the first block that fails.
+def verify_stream(blocks, previous_block=None, block_time_target=5):
+    for block in blocks:
+        if block.merkle_root != merkle_root([tx.txid() for tx in block.transactions]):
+            raise ValueError(f"Block {block.index} has been tampered!")
+        if block.hash != block.calculate_hash():
+            raise ValueError(f"Block {block.index} has been tampered!")
+        if previous_block is not None and (block.previous_hash != previous_block.hash or block.index != previous_block.index + 1):
+            raise ValueError(f"Block {block.index} is not properly linked to the previous block!")
+        # Same rule as Blockchain.adjust_difficulty, so a block cannot pick an easier difficulty for itself
+        if previous_block is not None:
+            time_difference = block.timestamp - previous_block.timestamp
+            if time_difference < block_time_target:
+                expected_difficulty = previous_block.difficulty + 1
+            elif time_difference > block_time_target:
+                expected_difficulty = max(1, previous_block.difficulty - 1)
+            else:
+                expected_difficulty = previous_block.difficulty
+            if block.difficulty != expected_difficulty:
+                raise ValueError(f"Block {block.index} has difficulty {block.difficulty}, expected {expected_difficulty}!")
+        # The genesis block is not mined
+        if block.index > 0 and block.hash[:block.difficulty] != '0' * block.difficulty:
+            raise ValueError(f"Block {block.index} does not meet its proof of work!")
+        previous_block = block
+        yield block
+
+
+# Load a whole exported chain into a new Blockchain
+def load_chain(path, fmt="jsonl", verify=True, block_time_target=5):
+    blocks = read_chain(path, fmt)
+    if verify:
+        blocks = verify_stream(blocks, block_time_target=block_time_target)
+    genesis_block = next(blocks, None)
+    if genesis_block is None:
+        raise ValueError(f"{path} has no blocks")
+    blockchain = Blockchain(block_time_target, genesis_block=genesis_block)
+    blockchain.chain.extend(blocks)
+    return blockchain
+
+
+# Continue importing into an existing Blockchain from its current height
+def import_chain(path, blockchain, fmt="jsonl", verify=True):
+    start_height = len(blockchain.chain)
+    blocks = read_chain(path, fmt, start_height)
+    if verify:
+        blocks = verify_stream(blocks, blockchain.get_latest_block(), blockchain.block_time_target)
+    before = len(blockchain.chain)
+    blockchain.chain.extend(blocks)
+    return len(blockchain.chain) - before
+
+
+# Blocks made on the fly and never kept, to stand in for a chain larger than memory.
+# Difficulty stays at 1, which is what a block time target of 0 asks for.
+def synthetic_blocks(count, signed_transactions, per_block, miner_address):
+    previous_block = Block(0, [], "0", miner_address=None, reward=0, difficulty=1)
+    previous_block.mine_block()
+    yield previous_block
+    for height in range(1, count):
+        start = (height * per_block) % len(signed_transactions)
+        transactions = signed_transactions[start:start + per_block]
+        transactions = transactions + [Transaction(None, miner_address, 50 + sum(tx.fee for tx in transactions))]
+        block = Block(height, transactions, previous_block.hash, miner_address, 50, difficulty=1)
+        block.mine_block()
+        previous_block = block
+        yield block
+
+
+# Result and peak traced memory of calling `function`
+def peak_memory(function):
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp()
+    alice_wallet = Wallet()
+    bob_wallet = Wallet()
+    miner_wallet = Wallet()
+
+    # A real chain to round trip
+    blockchain = Blockchain(block_time_target=0.05)
+    for i in range(20):
+        blockchain.add_transaction_to_pool(alice_wallet.create_transaction(bob_wallet.public_key, 10 + i, fee=1))
+        blockchain.add_transaction_to_pool(bob_wallet.create_transaction(alice_wallet.public_key, 5 + i, fee=2))
+        blockchain.mine_pending_transactions(miner_wallet.public_key)
+
+    for fmt in ("jsonl", "binary"):
+        path = os.path.join(workdir, f"chain.{fmt}")
+        export_chain(iter(blockchain.chain), path, fmt)
+        loaded = load_chain(path, fmt, block_time_target=blockchain.block_time_target)
+        print(f"{fmt:>6}: {os.path.getsize(path):>7} bytes, loaded {len(loaded.chain)} blocks, "
+              f"tip matches: {loaded.get_latest_block().hash == blockchain.get_latest_block().hash}, valid: {loaded.is_chain_valid()}")
+
+    # Resume: an import stopped at height 8, then picked up where it left off
+    path = os.path.join(workdir, "chain.binary")
+    partial = Blockchain(blockchain.block_time_target, genesis_block=blockchain.chain[0])
+    partial.chain.extend(blockchain.chain[1:8])
+    print(f"Resumed import at height {len(partial.chain)}: {import_chain(path, partial, 'binary')} more blocks, "
+          f"tip matches: {partial.get_latest_block().hash == blockchain.get_latest_block().hash}")
+
+    # Resume an export: append only the blocks after height 10
+    path = os.path.join(workdir, "resumed.jsonl")
+    export_chain(iter(blockchain.chain[:10]), path)
+    export_chain(iter(blockchain.chain[10:]), path, append=True)
+    print(f"Resumed export has {sum(1 for _ in verify_stream(read_chain(path), block_time_target=blockchain.block_time_target))} verified blocks")
+
+    # Tampering with one amount in the file is caught while streaming in
+    path = os.path.join(workdir, "chain.jsonl")
+    with open(path) as f:
+        lines = f.readlines()
+    lines[12] = lines[12].replace('"amount":', '"amount":1000', 1)
+    with open(path, "w") as f:
+        f.writelines(lines)
+    try:
+        load_chain(path, block_time_target=blockchain.block_time_target)
+    except ValueError as error:
+        print(f"Tampered import rejected: {error}")
+
+    # Long chains: memory while streaming stays flat as the chain grows
+    signed = [alice_wallet.create_transaction(bob_wallet.public_key, i + 1, fee=i % 3) for i in range(100)]
+    for count in (1000, 4000):
+        for fmt in ("jsonl", "binary"):
+            path = os.path.join(workdir, f"long.{fmt}")
+            start = time.perf_counter()
+            export_chain(synthetic_blocks(count, signed, 10, miner_wallet.public_key), path, fmt)
+            export_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            verified, peak = peak_memory(lambda: sum(1 for _ in verify_stream(read_chain(path, fmt), block_time_target=0)))
+            import_time = time.perf_counter() - start
+
+            _, resume_peak = peak_memory(lambda: sum(1 for _ in read_chain(path, fmt, start_height=count - 10)))
+            print(f"{count} blocks as {fmt:>6}: {os.path.getsize(path) / 1e6:6.2f} MB, export {export_time:5.2f} s, "
+                  f"verified import {import_time:5.2f} s, peak memory {peak / 1024:6.1f} KiB, "
+                  f"resume at height {count - 10} peak {resume_peak / 1024:5.1f} KiB")
+
+    # For comparison, holding the same chain in a list
+    _, list_peak = peak_memory(lambda: list(read_chain(os.path.join(workdir, "long.binary"), "binary")))
+    print(f"Loading 4000 blocks into a list instead: peak memory {list_peak / 1024:.1f} KiB")
+
+'''
+Sample Output:
+
+ jsonl:   35667 bytes, loaded 21 blocks, tip matches: True, valid: True
+binary:   15681 bytes, loaded 21 blocks, tip matches: True, valid: True
+Resumed import at height 8: 13 more blocks, tip matches: True
+Resumed export has 21 verified blocks
+Tampered import rejected: Block 12 has been tampered!
+1000 blocks as  jsonl:   5.86 MB, export  0.24 s, verified import  0.79 s, peak memory   49.2 KiB, resume at height 990 peak  45.1 KiB
+1000 blocks as binary:   2.55 MB, export  0.18 s, verified import  0.85 s, peak memory   25.9 KiB, resume at height 990 peak  25.5 KiB
+4000 blocks as  jsonl:  23.45 MB, export  0.96 s, verified import  3.11 s, peak memory   48.5 KiB, resume at height 3990 peak  45.3 KiB
+4000 blocks as binary:  10.21 MB, export  0.72 s, verified import  3.30 s, peak memory   25.9 KiB, resume at height 3990 peak  25.5 KiB
+Loading 4000 blocks into a list instead: peak memory 35898.6 KiB
+'''
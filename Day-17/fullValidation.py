@@ -0,0 +1,474 @@
+'''
+Day-17:
+Learnt about full block validation. is_chain_valid only re-hashes blocks and checks previous_hash, it never checks the
+signatures, the miner reward (mining reward + fees), whether senders could afford what they sent, or the difficulty.
+Added account balances to the chain, funded by allocations in the genesis block.
+Implemented a staged validation pipeline that streams over the chain in windows: header and proof of work checks, signature
+checks spread across a process pool, and in-order balance and reward checks. It reports the first failure with its height
+and the reason.
+'''
+
+import hashlib
+import os
+import time
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+import rsa
+
+# Transaction class remains the same as Day-13
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block class remains the same as Day-13
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.index = index
+        self.transactions = transactions  # List of transactions
+        self.timestamp = time.time()
+        self.previous_hash = previous_hash
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        self.difficulty = difficulty
+        self.nonce = 0
+        self.merkle_root = merkle_root([tx.txid() for tx in transactions])
+        self.hash = self.calculate_hash()
+
+    def calculate_hash(self):
+        return calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root, self.difficulty, self.nonce)
+
+    def mine_block(self):
+        target = '0' * self.difficulty
+        while self.hash[:self.difficulty] != target:
+            self.nonce += 1
+            self.hash = self.calculate_hash()
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {self.transactions}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender_public_key is None:
+        return "reward transaction found before the end of the block"
+    if tx.amount <= 0 or tx.fee < 0:
+        return f"transaction {tx.txid().hex()[:16]} has a negative amount or fee"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender_public_key, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender_public_key, 0)}"
+    balances[tx.sender_public_key] -= spent
+    balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+    return None
+
+
+# Apply the transactions of one block to a balances dict.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+        return None
+
+    if not block.transactions or block.transactions[-1].sender_public_key is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    balances[reward_transaction.receiver] = balances.get(reward_transaction.receiver, 0) + reward_transaction.amount
+    return None
+
+
+# Blockchain class now keeps account balances
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.balances = {}  # Public key -> coins
+        self.chain = [self.create_genesis_block(genesis_allocations or {})]
+        self.transaction_pool = []
+        apply_block_to_balances(self.chain[0], self.balances, self.mining_reward)
+
+    # The genesis block hands out the first coins
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, public_key, amount) for public_key, amount in genesis_allocations.items()]
+        return Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, public_key):
+        return self.balances.get(public_key, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        # Difficulty is part of the header hash, so the hash from __init__ is stale now
+        new_block.hash = new_block.calculate_hash()
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = expected_difficulty(self.get_latest_block(), new_block.timestamp, self.block_time_target)
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than sinking the whole block.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    def mine_pending_transactions(self, miner_address):
+        transactions = self.select_transactions()
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if current_block.merkle_root != merkle_root([tx.txid() for tx in current_block.transactions]):
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.hash != current_block.calculate_hash():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+    # Full audit of the chain through the validation pipeline
+    def is_chain_fully_valid(self, workers=None, window=32):
+        failure = validate_chain(iter(self.chain), self.block_time_target, self.mining_reward, workers, window)
+        if failure is not None:
+            height, reason = failure
+            print(f"Block {height} is invalid: {reason}")
+            return False
+        return True
+
+
+# ---- Stage 1: header, linkage, Merkle root, difficulty and proof of work ----
+
+def check_header(block, previous_block, block_time_target):
+    if block.index != previous_block.index + 1:
+        return "block index does not follow the previous block"
+    if block.previous_hash != previous_block.hash:
+        return "block is not properly linked to the previous block"
+    if block.merkle_root != merkle_root([tx.txid() for tx in block.transactions]):
+        return "transactions do not match the Merkle root"
+    if block.hash != block.calculate_hash():
+        return "block hash does not match its contents"
+    if block.difficulty != expected_difficulty(previous_block, block.timestamp, block_time_target):
+        return f"difficulty {block.difficulty} does not follow the difficulty adjustment"
+    if block.hash[:block.difficulty] != '0' * block.difficulty:
+        return "block hash does not meet its proof of work"
+    return None
+
+
+# ---- Stage 2: signatures, checked in worker processes ----
+
+# Runs in a worker. Takes [(height, transaction)] and returns the heights of the bad signatures.
+def find_bad_signatures(batch):
+    return [height for height, tx in batch if not tx.verify_transaction()]
+
+
+def split_into_batches(items, count):
+    size = max(1, -(-len(items) // count))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# Stream over the blocks a window at a time and return (height, reason) for the first invalid block, or None.
+# While the workers check the signatures of a window, this process runs the balance checks for the same window.
+def validate_chain(blocks, block_time_target, mining_reward, workers=None, window=32):
+    workers = workers or os.cpu_count()
+    balances = {}
+
+    genesis_block = next(blocks)
+    apply_block_to_balances(genesis_block, balances, mining_reward)
+    previous_block = genesis_block
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = []
+            for block in blocks:
+                batch.append(block)
+                if len(batch) == window:
+                    break
+            if not batch:
+                return None
+
+            failures = []
+
+            # Stage 1, cheap and in order
+            header_checked = []
+            for block in batch:
+                reason = check_header(block, previous_block, block_time_target)
+                if reason is not None:
+                    failures.append((block.index, 0, reason))
+                    break
+                header_checked.append(block)
+                previous_block = block
+
+            # Stage 2, started in the background
+            signed = [(block.index, tx) for block in header_checked for tx in block.transactions if tx.sender_public_key is not None]
+            futures = [pool.submit(find_bad_signatures, part) for part in split_into_batches(signed, workers * 4)]
+
+            # Stage 3, in order, while the signatures are being checked
+            for block in header_checked:
+                reason = apply_block_to_balances(block, balances, mining_reward)
+                if reason is not None:
+                    failures.append((block.index, 2, reason))
+                    break
+
+            for future in futures:
+                for height in future.result():
+                    failures.append((height, 1, "transaction has an invalid signature"))
+
+            # The lowest height wins, and at the same height the earlier stage wins
+            if failures:
+                height, _, reason = min(failures)
+                return height, reason
+
+
+# The serial way: check everything one block at a time in this process
+def validate_chain_serially(blockchain):
+    balances = {}
+    apply_block_to_balances(blockchain.chain[0], balances, blockchain.mining_reward)
+    for previous_block, block in zip(blockchain.chain, blockchain.chain[1:]):
+        reason = check_header(block, previous_block, blockchain.block_time_target)
+        if reason is None and not all(tx.verify_transaction() for tx in block.transactions if tx.sender_public_key is not None):
+            reason = "transaction has an invalid signature"
+        if reason is None:
+            reason = apply_block_to_balances(block, balances, blockchain.mining_reward)
+        if reason is not None:
+            return block.index, reason
+    return None
+
+
+# Mine a block on top of a list of blocks without any of the checks mine_pending_transactions would do
+def mine_on_top(chain, transactions, blockchain, miner_address, reward_amount=None):
+    previous_block = chain[-1]
+    if reward_amount is None:
+        reward_amount = blockchain.mining_reward + sum(tx.fee for tx in transactions)
+    transactions = transactions + [Transaction(None, miner_address, reward_amount)]
+    block = Block(previous_block.index + 1, transactions, previous_block.hash, miner_address, blockchain.mining_reward)
+    block.difficulty = expected_difficulty(previous_block, block.timestamp, blockchain.block_time_target)
+    block.hash = block.calculate_hash()
+    block.mine_block()
+    return chain + [block]
+
+
+if __name__ == "__main__":
+    wallets = [Wallet() for _ in range(4)]
+    miner_wallet = Wallet()
+    blockchain = Blockchain(block_time_target=0.05, genesis_allocations={wallet.public_key: 100_000 for wallet in wallets})
+
+    # 40 blocks with 50 payments each
+    for height in range(40):
+        for i in range(50):
+            sender, receiver = wallets[i % 4], wallets[(i + 1 + height) % 4]
+            if sender is receiver:
+                receiver = wallets[(i + 2) % 4]
+            blockchain.add_transaction_to_pool(sender.create_transaction(receiver.public_key, 10 + i, fee=1 + i % 3))
+        blockchain.mine_pending_transactions(miner_wallet.public_key)
+
+    print(f"Chain height: {len(blockchain.chain) - 1}, transactions: {sum(len(b.transactions) for b in blockchain.chain)}")
+    print(f"is_chain_valid: {blockchain.is_chain_valid()}")
+
+    start = time.perf_counter()
+    serial_result = validate_chain_serially(blockchain)
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipeline_result = validate_chain(iter(blockchain.chain), blockchain.block_time_target, blockchain.mining_reward)
+    pipeline_time = time.perf_counter() - start
+    print(f"Serial full audit: {serial_result}, {serial_time * 1000:.1f} ms")
+    print(f"Pipeline with {os.cpu_count()} worker(s): {pipeline_result}, {pipeline_time * 1000:.1f} ms")
+
+    # Blocks that is_chain_valid accepts but a full audit must reject
+    alice, bob = wallets[0], wallets[1]
+    bad_signature = Transaction(alice.public_key, bob.public_key, 5, 1, signature=bob.create_transaction(alice.public_key, 5, 1).signature)
+    overspend = alice.create_transaction(bob.public_key, blockchain.get_balance(alice.public_key) + 1, fee=1)
+
+    scenarios = {
+        "bad signature": mine_on_top(blockchain.chain, [bad_signature], blockchain, miner_wallet.public_key),
+        "inflated reward": mine_on_top(blockchain.chain, [alice.create_transaction(bob.public_key, 5, 1)], blockchain,
+                                       miner_wallet.public_key, reward_amount=1_000),
+        "overspend": mine_on_top(blockchain.chain, [overspend], blockchain, miner_wallet.public_key),
+    }
+    # Two bad blocks, only the first one is reported
+    scenarios["overspend, then bad signature"] = mine_on_top(scenarios["overspend"], [bad_signature], blockchain, miner_wallet.public_key)
+
+    for name, chain in scenarios.items():
+        forged = Blockchain.__new__(Blockchain)
+        forged.__dict__.update(blockchain.__dict__)
+        forged.chain = chain
+        print(f"{name}: is_chain_valid={forged.is_chain_valid()}, full audit: ", end="")
+        forged.is_chain_fully_valid()
+
+    # A block re-mined with a difficulty that does not follow the adjustment rule
+    tampered = list(blockchain.chain)
+    wrong_block = Block.__new__(Block)
+    wrong_block.__dict__.update(tampered[20].__dict__)
+    wrong_block.difficulty += 1
+    wrong_block.hash = wrong_block.calculate_hash()
+    wrong_block.mine_block()
+    tampered[20] = wrong_block
+    forged.chain = tampered
+    print(f"wrong difficulty: is_chain_valid={forged.is_chain_valid()}, full audit: ", end="")
+    forged.is_chain_fully_valid()
+
+    # An overspend in the pool is dropped, and the payments around it are still mined
+    blockchain.add_transaction_to_pool(alice.create_transaction(bob.public_key, 7, fee=1))
+    blockchain.add_transaction_to_pool(overspend)
+    blockchain.add_transaction_to_pool(bob.create_transaction(alice.public_key, 8, fee=1))
+    blockchain.mine_pending_transactions(miner_wallet.public_key)
+    block = blockchain.get_latest_block()
+    print(f"Block {block.index} mined with {len(block.transactions) - 1} payments, pool left: {len(blockchain.transaction_pool)}")
+
+'''
+Sample Output (on a single-core machine, so the process pool only adds overhead here):
+
+Chain height: 40, transactions: 2044
+is_chain_valid: True
+Serial full audit: None, 87.8 ms
+Pipeline with 1 worker(s): None, 95.5 ms
+bad signature: is_chain_valid=True, full audit: Block 41 is invalid: transaction has an invalid signature
+inflated reward: is_chain_valid=True, full audit: Block 41 is invalid: reward transaction pays 1000 but mining reward + fees is 51
+overspend: is_chain_valid=True, full audit: Block 41 is invalid: transaction 25017536e749c2d2 spends 98232 but the sender only has 98230
+overspend, then bad signature: is_chain_valid=True, full audit: Block 41 is invalid: transaction 25017536e749c2d2 spends 98232 but the sender only has 98230
+Block 21 is not properly linked to the previous block!
+wrong difficulty: is_chain_valid=False, full audit: Block 20 is invalid: difficulty 5 does not follow the difficulty adjustment
+Transaction dropped from the pool: transaction 25017536e749c2d2 spends 98232 but the sender only has 98222
+Block 41 mined with 2 payments, pool left: 0
+'''
@@ -0,0 +1,501 @@
+'''
+Day-18:
+Learnt about keeping block headers immutable. Block.__init__ used to hash the block straight away, and add_block then changed
+previous_hash and difficulty, so that first hash was wasted and stale until mining. is_chain_valid also re-hashed every block
+from scratch on every call.
+Implemented block headers that are sealed (frozen) once mined, with the hash computed lazily, cached, and only thrown away when
+a field really changes. Transactions are sealed too, and blocks keep their transactions in a tuple once sealed, so repeated
+validation of sealed blocks no longer re-hashes anything.
+'''
+
+import hashlib
+import time
+from collections import ChainMap
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+# Transaction class is now sealed once it is signed, and caches its id
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+        self.seal()
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class now keeps its header fields in a BlockHeader and is sealed once mined
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender_public_key is None:
+        return "reward transaction found before the end of the block"
+    if tx.amount <= 0 or tx.fee < 0:
+        return f"transaction {tx.txid().hex()[:16]} has a negative amount or fee"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender_public_key, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender_public_key, 0)}"
+    balances[tx.sender_public_key] -= spent
+    balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+    return None
+
+
+# Apply the transactions of one block to a balances dict.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+        return None
+
+    if not block.transactions or block.transactions[-1].sender_public_key is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    balances[reward_transaction.receiver] = balances.get(reward_transaction.receiver, 0) + reward_transaction.amount
+    return None
+
+
+# Blockchain class remains the same as Day-17, but no longer re-hashes sealed blocks.
+# The Day-17 validation pipeline (is_chain_fully_valid) is left out here, this day is about the cost of is_chain_valid.
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.balances = {}  # Public key -> coins
+        self.chain = [self.create_genesis_block(genesis_allocations or {})]
+        self.transaction_pool = []
+        apply_block_to_balances(self.chain[0], self.balances, self.mining_reward)
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, public_key, amount) for public_key, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, public_key):
+        return self.balances.get(public_key, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = expected_difficulty(self.get_latest_block(), new_block.timestamp, self.block_time_target)
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than sinking the whole block.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    def mine_pending_transactions(self, miner_address):
+        transactions = self.select_transactions()
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# The Day-17 way of validating: every hash and Merkle root computed again on every call
+def is_chain_valid_by_rehashing(chain):
+    for previous_block, block in zip(chain, chain[1:]):
+        if block.merkle_root != merkle_root([tx._calculate_txid() for tx in block.transactions]):
+            return False
+        if block.hash != calculate_header_hash(block.index, block.timestamp, block.previous_hash, block.merkle_root,
+                                               block.difficulty, block.nonce):
+            return False
+        if block.previous_hash != previous_block.hash:
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    alice_wallet = Wallet()
+    bob_wallet = Wallet()
+    miner_wallet = Wallet()
+    blockchain = Blockchain(block_time_target=0.05, genesis_allocations={alice_wallet.public_key: 10_000, bob_wallet.public_key: 10_000})
+
+    for i in range(100):
+        for j in range(10):
+            blockchain.add_transaction_to_pool(alice_wallet.create_transaction(bob_wallet.public_key, 1 + j, fee=1))
+            blockchain.add_transaction_to_pool(bob_wallet.create_transaction(alice_wallet.public_key, 1 + j, fee=1))
+        blockchain.mine_pending_transactions(miner_wallet.public_key)
+
+    # Day-17 hashed each block in __init__ and again in add_block before mining
+    print(f"Mined {len(blockchain.chain) - 1} blocks, header hashes computed outside mining: {BlockHeader.hash_computations} "
+          f"(eager hashing would have computed {2 * (len(blockchain.chain) - 1)})")
+
+    runs = 100
+    start = time.perf_counter()
+    for _ in range(runs):
+        is_chain_valid_by_rehashing(blockchain.chain)
+    rehash_time = (time.perf_counter() - start) / runs
+
+    start = time.perf_counter()
+    first_valid = blockchain.is_chain_valid()
+    first_time = time.perf_counter() - start
+
+    computations_before = BlockHeader.hash_computations
+    start = time.perf_counter()
+    for _ in range(runs):
+        blockchain.is_chain_valid()
+    cached_time = (time.perf_counter() - start) / runs
+
+    print(f"Validation by re-hashing everything: {rehash_time * 1000:7.3f} ms per call")
+    print(f"First validation of sealed blocks:   {first_time * 1000:7.3f} ms, valid: {first_valid}")
+    print(f"Repeated validation of sealed blocks: {cached_time * 1000:6.3f} ms per call, "
+          f"{BlockHeader.hash_computations - computations_before} hashes computed in {runs} calls")
+
+    # Sealed blocks and transactions cannot be changed
+    block = blockchain.chain[50]
+    for description, tamper in (
+        ("nonce", lambda: setattr(block.header, "nonce", 0)),
+        ("previous hash", lambda: setattr(block, "previous_hash", "0" * 64)),
+        ("transaction amount", lambda: setattr(block.transactions[0], "amount", 10_000)),
+        ("transaction list", lambda: block.transactions.append(block.transactions[0])),
+        ("transactions", lambda: setattr(block, "transactions", block.transactions[1:])),
+    ):
+        try:
+            tamper()
+            print(f"Changing the {description} was allowed!")
+        except (AttributeError, TypeError) as error:
+            print(f"Changing the {description} was refused: {error}")
+
+    # Unsealed headers only drop their cached hash when a field really changes
+    header = BlockHeader(1, time.time(), "0" * 64, merkle_root([]), 2)
+    first_hash = header.hash
+    header.difficulty = 2
+    print(f"Same difficulty set again, cached hash kept: {header._hash == first_hash}")
+    header.difficulty = 3
+    print(f"Difficulty changed, cached hash dropped: {header._hash is None}, new hash differs: {header.hash != first_hash}")
+
+    if blockchain.is_chain_valid():
+        print("Blockchain is valid!")
+    else:
+        print("Blockchain is not valid!")
+
+'''
+Sample Output:
+
+Mined 100 blocks, header hashes computed outside mining: 1 (eager hashing would have computed 200)
+Validation by re-hashing everything:   8.241 ms per call
+First validation of sealed blocks:     2.295 ms, valid: True
+Repeated validation of sealed blocks:  0.036 ms per call, 0 hashes computed in 100 calls
+Changing the nonce was refused: Block 50 is sealed, its header cannot be changed
+Changing the previous hash was refused: Block 50 is sealed and cannot be changed
+Changing the transaction amount was refused: Transaction efdc55cfbeda9dd2 is sealed and cannot be changed
+Changing the transaction list was refused: 'tuple' object has no attribute 'append'
+Changing the transactions was refused: Block 50 is sealed and cannot be changed
+Same difficulty set again, cached hash kept: True
+Difficulty changed, cached hash dropped: True, new hash differs: True
+Blockchain is valid!
+'''
@@ -0,0 +1,862 @@
+'''
+Day-19:
+Learnt about how clients talk to a node. So far the only way to submit a transaction was to call add_transaction_to_pool in
+the same program.
+Implemented a local asyncio HTTP/JSON-RPC server in front of the Blockchain, with methods to submit single or batched
+transactions, query balances and blocks, and trigger mining. Submissions wait in a bounded queue and are verified in batches
+in a process pool, and a full queue answers "busy" instead of letting memory grow.
+Also wrote a load-test client that reports p50/p99 latency at increasing request rates.
+
+Usage:
+    python rpcServer.py               # start a server in the background and run the demo and load test against it
+    python rpcServer.py serve 8545    # only run the server
+'''
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import rsa
+
+# Error codes from the JSON-RPC 2.0 spec, plus server errors for backpressure, refused blocks and failed verification
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_BUSY = -32000
+BLOCK_REFUSED = -32001
+VERIFICATION_FAILED = -32002
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+# Transaction class remains the same as Day-18, with dict conversion from Day-16
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+        self.seal()
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        return {
+            "sender": key_to_list(self.sender_public_key),
+            "receiver": key_to_list(self.receiver),
+            "amount": self.amount,
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+
+    # Transactions that arrive signed are sealed straight away
+    @staticmethod
+    def from_dict(data):
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(key_from_list(data["sender"]), key_from_list(data["receiver"]), data["amount"], data["fee"], signature)
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-18
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender_public_key is None:
+        return "reward transaction found before the end of the block"
+    if tx.amount <= 0 or tx.fee < 0:
+        return f"transaction {tx.txid().hex()[:16]} has a negative amount or fee"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender_public_key, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender_public_key, 0)}"
+    balances[tx.sender_public_key] -= spent
+    balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+    return None
+
+
+# Apply the transactions of one block to a balances dict.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+        return None
+
+    if not block.transactions or block.transactions[-1].sender_public_key is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    balances[reward_transaction.receiver] = balances.get(reward_transaction.receiver, 0) + reward_transaction.amount
+    return None
+
+
+# Blockchain class remains the same as Day-18, and can take transactions that were verified elsewhere
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.balances = {}  # Public key -> coins
+        self.chain = [self.create_genesis_block(genesis_allocations or {})]
+        self.transaction_pool = []
+        apply_block_to_balances(self.chain[0], self.balances, self.mining_reward)
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, public_key, amount) for public_key, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, public_key):
+        return self.balances.get(public_key, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = expected_difficulty(self.get_latest_block(), new_block.timestamp, self.block_time_target)
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # For transactions whose signatures were already checked in a batch
+    def add_verified_transactions(self, transactions):
+        self.transaction_pool.extend(transactions)
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than sinking the whole block.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    def mine_pending_transactions(self, miner_address):
+        transactions = self.select_transactions()
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+
+
+# Runs in a worker process. Returns one True/False per transaction.
+def verify_batch(transactions):
+    return [tx.verify_transaction() for tx in transactions]
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+# Local JSON-RPC server over HTTP in front of a Blockchain.
+# Submitted transactions wait in a bounded queue and are verified in batches. A full queue answers "busy".
+class RpcServer:
+    def __init__(self, blockchain, max_queue=1024, batch_size=64, batch_wait=0.005, workers=None):
+        self.blockchain = blockchain
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait  # Seconds to wait for a batch to fill up
+        self.workers = workers or os.cpu_count()
+        self.methods = {
+            "submit_transaction": self.submit_transaction,
+            "submit_transactions": self.submit_transactions,
+            "get_balance": self.get_balance,
+            "get_block": self.get_block,
+            "get_latest_block": self.get_latest_block,
+            "get_pool_size": self.get_pool_size,
+            "mine": self.mine,
+        }
+
+    async def start(self, host="127.0.0.1", port=8545):
+        self.intake = asyncio.Queue(self.max_queue)
+        self.chain_lock = asyncio.Lock()  # Held while the pool or the chain changes
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.batcher = asyncio.create_task(self.run_batcher())
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+        self.executor.shutdown()
+
+    # ---- HTTP ----
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if not request_line.startswith(b"POST"):
+                    response = b""
+                    writer.write(b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n\r\n")
+                else:
+                    response = await self.handle_body(body)
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                                 + f"Content-Length: {len(response)}\r\n\r\n".encode() + response)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    # ---- JSON-RPC ----
+
+    async def handle_body(self, body):
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return json.dumps(error_response(None, PARSE_ERROR, "parse error")).encode()
+
+        if isinstance(request, list):
+            if not request:
+                return json.dumps(error_response(None, INVALID_REQUEST, "empty batch")).encode()
+            responses = await asyncio.gather(*(self.handle_request(item) for item in request))
+            return json.dumps([r for r in responses if r is not None]).encode()
+        return json.dumps(await self.handle_request(request)).encode()
+
+    async def handle_request(self, request):
+        if not isinstance(request, dict) or "method" not in request:
+            return error_response(None, INVALID_REQUEST, "invalid request")
+        request_id = request.get("id")
+        method = self.methods.get(request["method"])
+        if method is None:
+            return error_response(request_id, METHOD_NOT_FOUND, f"unknown method {request['method']}")
+        try:
+            result = await method(*request.get("params", []))
+        except RpcError as error:
+            return error_response(request_id, error.code, error.message)
+        except (TypeError, ValueError, KeyError, IndexError) as error:
+            return error_response(request_id, INVALID_PARAMS, str(error))
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    # ---- Methods ----
+
+    async def submit_transaction(self, transaction):
+        return (await self.submit_transactions([transaction]))[0]
+
+    # Queue every transaction, or none of them if there is not room for all of them
+    async def submit_transactions(self, transactions):
+        transactions = [Transaction.from_dict(tx) for tx in transactions]
+        if self.intake.qsize() + len(transactions) > self.max_queue:
+            raise RpcError(SERVER_BUSY, "busy")
+        loop = asyncio.get_running_loop()
+        futures = []
+        for tx in transactions:
+            future = loop.create_future()
+            self.intake.put_nowait((tx, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def get_balance(self, public_key):
+        return self.blockchain.get_balance(key_from_list(public_key))
+
+    async def get_block(self, height):
+        return self.blockchain.chain[height].to_dict()
+
+    async def get_latest_block(self):
+        return self.blockchain.get_latest_block().to_dict()
+
+    async def get_pool_size(self):
+        return len(self.blockchain.transaction_pool)
+
+    # Mining runs in a thread so the server keeps answering while it works.
+    # Unpayable transactions are dropped first, so no block with a pool still left means the chain refused it.
+    async def mine(self, miner_address):
+        async with self.chain_lock:
+            block = await asyncio.get_running_loop().run_in_executor(
+                None, self.blockchain.mine_pending_transactions, key_from_list(miner_address))
+            if block is None and self.blockchain.transaction_pool:
+                raise RpcError(BLOCK_REFUSED, "block was refused, the pool is kept")
+        return None if block is None else {"index": block.index, "hash": block.hash, "transactions": len(block.transactions)}
+
+    # ---- Batched verification ----
+
+    # Takes whatever is queued (up to batch_size), verifies it in the process pool and admits the valid transactions
+    async def run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.intake.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.intake.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            transactions = [tx for tx, _ in batch]
+            parts = [transactions[i::self.workers] for i in range(self.workers)]
+            # A failed verification fails this batch's submissions, and the batcher carries on with the next one
+            try:
+                results = await asyncio.gather(*(loop.run_in_executor(self.executor, verify_batch, part) for part in parts if part))
+            except Exception as error:
+                if isinstance(error, BrokenProcessPool):
+                    self.executor.shutdown(wait=False)
+                    self.executor = ProcessPoolExecutor(self.workers)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RpcError(VERIFICATION_FAILED, f"verification failed: {error!r}"))
+                continue
+            valid = {}
+            for part, part_results in zip((p for p in parts if p), results):
+                for tx, ok in zip(part, part_results):
+                    valid[id(tx)] = ok
+
+            async with self.chain_lock:
+                self.blockchain.add_verified_transactions([tx for tx in transactions if valid[id(tx)]])
+            for tx, future in batch:
+                if not future.done():
+                    future.set_result({"txid": tx.txid().hex()} if valid[id(tx)] else {"error": "invalid signature"})
+
+
+def error_response(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+# ---- Client ----
+
+# Keep-alive HTTP connection that sends JSON-RPC calls
+class RpcClient:
+    def __init__(self, host="127.0.0.1", port=8545):
+        self.host = host
+        self.port = port
+        self.next_id = 0
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        self.writer.close()
+
+    async def post(self, payload):
+        body = json.dumps(payload).encode()
+        self.writer.write(f"POST / HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+        await self.reader.readline()
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return json.loads(await self.reader.readexactly(int(headers["content-length"])))
+
+    async def call(self, method, *params):
+        self.next_id += 1
+        response = await self.post({"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": list(params)})
+        if "error" in response:
+            raise RpcError(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+# Open-loop load test: requests are sent on a fixed schedule whether or not earlier ones have answered,
+# so a slow server shows up as latency and "busy" answers instead of a lower send rate.
+async def load_test(port, transactions, rates, seconds_per_rate=2.0, connections=256):
+    clients = [RpcClient(port=port) for _ in range(connections)]
+    for client in clients:
+        await client.connect()
+    free_clients = asyncio.Queue()
+    for client in clients:
+        free_clients.put_nowait(client)
+
+    transactions = iter(transactions)
+    report = []
+    for rate in rates:
+        latencies, busy, errors = [], 0, 0
+
+        async def one_request(tx):
+            nonlocal busy, errors
+            # Latency counts from when the request was due, including any wait for a free connection
+            start = time.perf_counter()
+            client = await free_clients.get()
+            try:
+                result = await client.call("submit_transaction", tx)
+                if "error" in result:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+            except RpcError as error:
+                if error.code == SERVER_BUSY:
+                    busy += 1
+                else:
+                    errors += 1
+            finally:
+                free_clients.put_nowait(client)
+
+        tasks = []
+        start = time.perf_counter()
+        count = int(rate * seconds_per_rate)
+        for i in range(count):
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one_request(next(transactions).to_dict())))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        report.append((rate, len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), busy, errors))
+
+    for client in clients:
+        await client.close()
+    return report
+
+
+# ---- Running it ----
+
+def run_server(port, genesis_allocations, ready=None, **options):
+    async def main():
+        blockchain = Blockchain(block_time_target=0.05, genesis_allocations=genesis_allocations)
+        server = RpcServer(blockchain, **options)
+        bound_port = await server.start(port=port)
+        print(f"JSON-RPC server listening on 127.0.0.1:{bound_port}", flush=True)
+        if ready is not None:
+            ready.set()
+        # Shut down cleanly so the verification workers, which hold a copy of the listening socket, exit too
+        stopping = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signum, stopping.set)
+        await stopping.wait()
+        await server.stop()
+
+    asyncio.run(main())
+
+
+async def demo(port, wallets, miner_wallet, rates):
+    client = RpcClient(port=port)
+    await client.connect()
+
+    # A single transaction, a batch, a forged signature, then mining and queries
+    alice, bob = wallets[0], wallets[1]
+    print("submit_transaction:", await client.call("submit_transaction", alice.create_transaction(bob.public_key, 25, fee=2).to_dict()))
+    batch = [bob.create_transaction(alice.public_key, 5 + i, fee=1).to_dict() for i in range(3)]
+    print("submit_transactions:", len(await client.call("submit_transactions", batch)), "accepted")
+    forged = alice.create_transaction(bob.public_key, 1, fee=1).to_dict()
+    forged["amount"] = 1000
+    print("forged transaction:", await client.call("submit_transaction", forged))
+    print("get_pool_size:", await client.call("get_pool_size"))
+    print("mine:", await client.call("mine", key_to_list(miner_wallet.public_key)))
+    print("get_balance(miner):", await client.call("get_balance", key_to_list(miner_wallet.public_key)))
+    print("get_latest_block index:", (await client.call("get_latest_block"))["index"])
+
+    # A JSON-RPC batch request in one HTTP call
+    responses = await client.post([
+        {"jsonrpc": "2.0", "id": 1, "method": "get_balance", "params": [key_to_list(alice.public_key)]},
+        {"jsonrpc": "2.0", "id": 2, "method": "no_such_method"},
+    ])
+    print("batch request:", responses)
+    await client.close()
+
+    # Load test at increasing request rates
+    total = int(sum(rates) * 2.0)
+    signed = [wallets[i % len(wallets)].create_transaction(wallets[(i + 1) % len(wallets)].public_key, 1 + i % 50, fee=1 + i % 3)
+              for i in range(total)]
+    print(f"\n{'rate/s':>8} {'ok/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'busy':>6} {'errors':>7}")
+    for rate, throughput, p50, p99, busy, errors in await load_test(port, signed, rates):
+        print(f"{rate:>8} {throughput:>8.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {busy:>6} {errors:>7}")
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "demo"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8545
+
+    if mode == "serve":
+        run_server(port, {})
+    else:
+        wallets = [Wallet() for _ in range(4)]
+        miner_wallet = Wallet()
+        ready = multiprocessing.Event()
+        # Not a daemon process, because daemon processes cannot start the server's verification workers
+        server_process = multiprocessing.Process(
+            target=run_server, args=(port, {wallet.public_key: 1_000_000 for wallet in wallets}, ready),
+            kwargs={"max_queue": 128})
+        server_process.start()
+        ready.wait()
+        try:
+            asyncio.run(demo(port, wallets, miner_wallet, rates=[100, 400, 1600, 3200, 6400]))
+        finally:
+            server_process.terminate()
+            server_process.join()
+
+'''
+Sample Output (single-core machine, the load-test client shares the CPU with the server):
+
+JSON-RPC server listening on 127.0.0.1:8545
+submit_transaction: {'txid': 'aa17756e345aa0147cef9768ed580a7df9865d5886dd2cde66c93563cdbc6f26'}
+submit_transactions: 3 accepted
+forged transaction: {'error': 'invalid signature'}
+get_pool_size: 4
+mine: {'index': 1, 'hash': '0008bceb3411752d83dbd61f0eb23f0167dae840b280b7ab5d78760d23352b8d', 'transactions': 5}
+get_balance(miner): 55
+get_latest_block index: 1
+batch request: [{'jsonrpc': '2.0', 'id': 1, 'result': 999991}, {'jsonrpc': '2.0', 'id': 2, 'error': {'code': -32601, 'message': 'unknown method no_such_method'}}]
+
+  rate/s     ok/s   p50 ms   p99 ms   busy  errors
+     100      100      6.5     14.4      0       0
+     400      398      5.1      8.2      0       0
+    1600     1586      7.5     14.1      0       0
+    3200     2343     59.7    160.7   1615       0
+    6400      203    763.9   1396.4  12374       0
+'''
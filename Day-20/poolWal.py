@@ -0,0 +1,743 @@
+'''
+Day-20:
+Learnt about write-ahead logs and how databases survive crashes. Until now the transaction pool only lived in memory, so
+restarting a node silently dropped every pending transaction and the fees that came with them.
+Implemented an append-only write-ahead log for the pool. Every admitted transaction and every mined block is written as a
+length-prefixed record with a CRC32, and records are group committed so many admissions share one fsync. On restart the pool
+is rebuilt by replaying the log. Transactions already included in blocks are skipped, and signatures are not checked again
+because only verified transactions are ever logged. The log is compacted down to the live pool once it gets too long, so
+recovery time depends on the size of the pool and not on how long the node has been running.
+'''
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import ChainMap
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+# Transaction class remains the same as Day-19
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+        self.seal()
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        return {
+            "sender": key_to_list(self.sender_public_key),
+            "receiver": key_to_list(self.receiver),
+            "amount": self.amount,
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+
+    # Transactions that arrive signed are sealed straight away
+    @staticmethod
+    def from_dict(data):
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(key_from_list(data["sender"]), key_from_list(data["receiver"]), data["amount"], data["fee"], signature)
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-19
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender_public_key is None:
+        return "reward transaction found before the end of the block"
+    if tx.amount <= 0 or tx.fee < 0:
+        return f"transaction {tx.txid().hex()[:16]} has a negative amount or fee"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender_public_key, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender_public_key, 0)}"
+    balances[tx.sender_public_key] -= spent
+    balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+    return None
+
+
+# Apply the transactions of one block to a balances dict.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+        return None
+
+    if not block.transactions or block.transactions[-1].sender_public_key is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    balances[reward_transaction.receiver] = balances.get(reward_transaction.receiver, 0) + reward_transaction.amount
+    return None
+
+
+# Each record is its payload length and CRC32 followed by the JSON payload
+RECORD_HEADER = struct.Struct(">II")
+
+
+def encode_record(payload):
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data
+
+
+# Reads records until the end of the file, or until a record that was only partly written or is corrupted.
+# Returns the payloads and the offset where the good records end.
+def read_records(path):
+    payloads = []
+    good_end = 0
+    if not os.path.exists(path):
+        return payloads, good_end
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            length, crc = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length or zlib.crc32(data) != crc:
+                break
+            payloads.append(json.loads(data))
+            good_end = f.tell()
+    return payloads, good_end
+
+
+# Append-only log of pool admissions, dropped transactions and mined blocks.
+# Records are buffered and written with a single fsync once group_size of them are waiting, or at the latest
+# group_interval seconds after the first of them arrived (a timer commits a record that nothing follows), so a crash can
+# lose at most the last uncommitted group.
+class PoolWal:
+    def __init__(self, path, group_size=64, group_interval=0.05, compact_ratio=4, compact_min=1024):
+        self.path = path
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.compact_ratio = compact_ratio  # Compact when the log has this many records per live transaction
+        self.compact_min = compact_min  # ...and at least this many records
+        self.pending = []  # Encoded records waiting for the next commit
+        self.records = 0  # Records in the file
+        self.fsyncs = 0
+        self.compactions = 0
+        self.last_commit = time.perf_counter()
+        self.file = None
+        self.lock = threading.Lock()  # The timer commits from its own thread
+        self.timer = None
+
+    # Rebuilds the pool from the log. chain is the node's chain, used to drop transactions that were mined after
+    # the last block the log knows about. With verify_all every signature is checked again, for comparison.
+    # Returns the pool and some numbers about the recovery.
+    def recover(self, chain, verify_all=False):
+        start = time.perf_counter()
+        payloads, good_end = read_records(self.path)
+        torn_bytes = (os.path.getsize(self.path) - good_end) if os.path.exists(self.path) else 0
+
+        live = {}  # txid hex -> transaction dict, in admission order
+        last_block_hash = None
+        for payload in payloads:
+            if payload["op"] == "add":
+                live[payload["txid"]] = payload["tx"]
+            elif payload["op"] == "drop":
+                for txid in payload["txids"]:
+                    live.pop(txid, None)
+            else:
+                for txid in payload["txids"]:
+                    live.pop(txid, None)
+                last_block_hash = payload["hash"]
+
+        # Only blocks after the last logged one can hold transactions the log still thinks are pending
+        blocks_checked = 0
+        for block in reversed(chain):
+            if block.hash == last_block_hash:
+                break
+            blocks_checked += 1
+            for tx in block.transactions:
+                live.pop(tx.txid().hex(), None)
+
+        pool = []
+        verified = 0
+        for txid, data in live.items():
+            transaction = Transaction.from_dict(data)
+            # A record whose txid no longer matches its contents is not trusted
+            if verify_all or transaction.txid().hex() != txid:
+                verified += 1
+                if not transaction.verify_transaction():
+                    continue
+            pool.append(transaction)
+
+        # Cut off a torn tail so new records are not appended after garbage
+        self.file = open(self.path, "ab")
+        self.file.truncate(good_end)
+        self.records = len(payloads)
+        return pool, {
+            "records": len(payloads),
+            "blocks_checked": blocks_checked,
+            "torn_bytes": torn_bytes,
+            "pool": len(pool),
+            "verified": verified,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def log_add(self, transaction):
+        self._append({"op": "add", "txid": transaction.txid().hex(), "tx": transaction.to_dict()})
+
+    def log_drop(self, txids):
+        self._append({"op": "drop", "txids": txids})
+
+    def log_block(self, block, txids):
+        self._append({"op": "block", "hash": block.hash, "txids": txids})
+
+    def _append(self, payload):
+        with self.lock:
+            self.pending.append(encode_record(payload))
+            if len(self.pending) >= self.group_size or time.perf_counter() - self.last_commit >= self.group_interval:
+                self._commit()
+            elif self.timer is None and self.group_interval != float("inf"):
+                self.timer = threading.Timer(self.group_interval, self.commit)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def commit(self):
+        with self.lock:
+            self._commit()
+
+    def _commit(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            self.file.write(b"".join(self.pending))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.fsyncs += 1
+            self.records += len(self.pending)
+            self.pending = []
+        self.last_commit = time.perf_counter()
+
+    def needs_compaction(self, pool_size):
+        return self.records > max(self.compact_min, self.compact_ratio * pool_size)
+
+    # Rewrites the log as a block record for the tip followed by one add record per pooled transaction. The block record
+    # tells recovery that the chain up to last_block is already accounted for, so it does not walk the chain back.
+    # The new file is fully written and synced before it replaces the old one, so a crash during compaction leaves one of
+    # the two complete logs.
+    def compact(self, pool, last_block):
+        with self.lock:
+            self._commit()
+            temp_path = self.path + ".compact"
+            with open(temp_path, "wb") as f:
+                f.write(encode_record({"op": "block", "hash": last_block.hash, "txids": []}))
+                for transaction in pool:
+                    f.write(encode_record({"op": "add", "txid": transaction.txid().hex(), "tx": transaction.to_dict()}))
+                f.flush()
+                os.fsync(f.fileno())
+            self.file.close()
+            os.replace(temp_path, self.path)
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+            self.file = open(self.path, "ab")
+            self.records = len(pool) + 1
+            self.compactions += 1
+
+    def close(self):
+        with self.lock:
+            self._commit()
+            self.file.close()
+
+
+# Blockchain class remains the same as Day-19, but can log its pool to a write-ahead log and be restarted from an existing chain
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None, chain=None, wal=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.balances = {}  # Public key -> coins
+        self.chain = chain or [self.create_genesis_block(genesis_allocations or {})]
+        for block in self.chain:
+            apply_block_to_balances(block, self.balances, self.mining_reward)
+        self.transaction_pool = []
+        self.wal = wal
+        self.recovery = None
+        if self.wal is not None:
+            self.transaction_pool, self.recovery = self.wal.recover(self.chain)
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, public_key, amount) for public_key, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, public_key):
+        return self.balances.get(public_key, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = expected_difficulty(self.get_latest_block(), new_block.timestamp, self.block_time_target)
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+            if self.wal is not None:
+                self.wal.log_add(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # The transactions in the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool, and from the log, rather than sinking the whole block.
+    def select_transactions(self):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], []
+        for tx in self.transaction_pool:
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.append(tx.txid().hex())
+        if dropped:
+            self.transaction_pool = selected[:]
+            if self.wal is not None:
+                self.wal.log_drop(dropped)
+        return selected
+
+    def mine_pending_transactions(self, miner_address):
+        transactions = self.select_transactions()
+        if len(transactions) > 0:
+            mined_txids = [tx.txid().hex() for tx in transactions]
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block is not logged, so its transactions stay pending in the log too
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = []
+            # The block record is committed straight away, and the log is compacted if it has grown too long
+            if self.wal is not None:
+                self.wal.log_block(new_block, mined_txids)
+                self.wal.commit()
+                if self.wal.needs_compaction(len(self.transaction_pool)):
+                    self.wal.compact(self.transaction_pool, new_block)
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Every amount is different, because two transactions with the same fields have the same signature and txid
+def signed_transactions(wallets, count):
+    return [wallets[i % len(wallets)].create_transaction(wallets[(i + 1) % len(wallets)].public_key, 1 + i, fee=1 + i % 3)
+            for i in range(count)]
+
+
+# Runs a node for a while and "crashes" it, leaving a half-written record at the end of the log
+def run_until_crash(workdir, name, wallets, miner_wallet, blocks, per_block, pool_size, **wal_options):
+    wal = PoolWal(os.path.join(workdir, name), **wal_options)
+    node = Blockchain(block_time_target=0, genesis_allocations={wallet.public_key: 10_000_000 for wallet in wallets}, wal=wal)
+    transactions = iter(signed_transactions(wallets, blocks * per_block + pool_size))
+    for _ in range(blocks):
+        for _ in range(per_block):
+            node.add_transaction_to_pool(next(transactions))
+        node.mine_pending_transactions(miner_wallet.public_key)
+    for tx in transactions:
+        node.add_transaction_to_pool(tx)
+    wal.commit()
+    wal.file.write(encode_record({"op": "add", "txid": "00", "tx": {}})[:20])
+    wal.file.flush()
+    return node
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp()
+    wallets = [Wallet() for _ in range(4)]
+    miner_wallet = Wallet()
+
+    # Group commit against one fsync per admission
+    transactions = signed_transactions(wallets, 2000)
+    print("Logging 2000 admissions:")
+    for group_size in (1, 8, 64, 512):
+        wal = PoolWal(os.path.join(workdir, f"group-{group_size}.wal"), group_size=group_size, group_interval=float("inf"))
+        wal.recover([])
+        start = time.perf_counter()
+        for tx in transactions:
+            wal.log_add(tx)
+        wal.close()
+        elapsed = time.perf_counter() - start
+        print(f"  group size {group_size:>3}: {wal.fsyncs:>4} fsyncs, {elapsed * 1000:7.1f} ms, {len(transactions) / elapsed:8.0f} admissions/s")
+
+    # A lone admission is still committed, group_interval after it arrived
+    wal = PoolWal(os.path.join(workdir, "lone.wal"), group_interval=0.05)
+    wal.recover([])
+    wal.log_add(transactions[0])
+    time.sleep(0.2)
+    print(f"  one admission and nothing after it: {wal.fsyncs} fsync, {len(read_records(wal.path)[0])} record on disk")
+    wal.close()
+
+    # Crash and recover, with and without compaction
+    for label, options in (("without compaction", {"compact_min": float("inf")}), ("with compaction", {})):
+        node = run_until_crash(workdir, label.replace(" ", "-") + ".wal", wallets, miner_wallet, blocks=40, per_block=200, pool_size=300, **options)
+        size = os.path.getsize(node.wal.path)
+        print(f"\nAfter mining 40 blocks of 200 transactions and admitting 300 more ({label}):")
+        print(f"  pool before crash: {len(node.transaction_pool)}, log size: {size / 1024:.0f} KB, compactions: {node.wal.compactions}")
+
+        restarted = Blockchain(block_time_target=0, chain=node.chain, wal=PoolWal(node.wal.path, **options))
+        recovery = restarted.recovery
+        print(f"  recovered pool: {recovery['pool']} transactions from {recovery['records']} records in {recovery['seconds'] * 1000:.1f} ms "
+              f"({recovery['verified']} signatures checked, {recovery['blocks_checked']} blocks checked, "
+              f"{recovery['torn_bytes']} torn bytes dropped)")
+        same = [tx.txid() for tx in restarted.transaction_pool] == [tx.txid() for tx in node.transaction_pool]
+        print(f"  pool matches the one before the crash: {same}")
+
+        full = PoolWal(node.wal.path, **options).recover(node.chain, verify_all=True)[1]
+        print(f"  same recovery checking every signature again: {full['seconds'] * 1000:.1f} ms")
+
+    # A block mined after the last logged block still removes its transactions on recovery
+    restarted.wal = None
+    restarted.mine_pending_transactions(miner_wallet.public_key)
+    again = Blockchain(block_time_target=0, chain=restarted.chain, wal=PoolWal(node.wal.path))
+    print(f"\nBlock mined without logging it, then restarted: {again.recovery['pool']} transactions left in the pool")
+    print("Is blockchain valid?", again.is_chain_valid())
+
+'''
+Sample Output:
+
+Logging 2000 admissions:
+  group size   1: 2000 fsyncs,   177.4 ms,    11276 admissions/s
+  group size   8:  250 fsyncs,    46.5 ms,    43039 admissions/s
+  group size  64:   32 fsyncs,    24.9 ms,    80478 admissions/s
+  group size 512:    4 fsyncs,    29.4 ms,    68037 admissions/s
+  one admission and nothing after it: 1 fsync, 1 record on disk
+
+After mining 40 blocks of 200 transactions and admitting 300 more (without compaction):
+  pool before crash: 300, log size: 5491 KB, compactions: 0
+  recovered pool: 300 transactions from 8340 records in 114.0 ms (0 signatures checked, 0 blocks checked, 20 torn bytes dropped)
+  pool matches the one before the crash: True
+  same recovery checking every signature again: 136.1 ms
+
+After mining 40 blocks of 200 transactions and admitting 300 more (with compaction):
+  pool before crash: 300, log size: 711 KB, compactions: 6
+  recovered pool: 300 transactions from 1105 records in 9.1 ms (0 signatures checked, 0 blocks checked, 20 torn bytes dropped)
+  pool matches the one before the crash: True
+  same recovery checking every signature again: 22.3 ms
+
+Block mined without logging it, then restarted: 0 transactions left in the pool
+Is blockchain valid? True
+'''
@@ -0,0 +1,710 @@
+'''
+Day-21:
+Learnt about pruned nodes. Once a block is buried deep enough its transactions are never needed again for validating new
+blocks, because the balances already hold everything they changed, yet every Block kept its full transaction list forever.
+Implemented a pruning mode that keeps every header and the balance state but drops the transactions of blocks deeper than a
+configurable depth. New blocks are still fully validated, and reorganizations within the retained depth still work: in
+this account model a block's own transactions are enough to undo it, so the kept bodies double as undo data. A fork point
+below the pruned depth is refused. Also measured the memory and disk saved on a long synthetic chain.
+'''
+
+import hashlib
+import json
+import sys
+import time
+from collections import ChainMap
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+# Transaction class remains the same as Day-19
+class Transaction:
+    def __init__(self, sender_public_key, receiver, amount, fee=0, signature=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender_public_key = sender_public_key
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    def sign_transaction(self, private_key):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        self.signature = rsa.sign(transaction_data.encode(), private_key, 'SHA-256')
+        self.seal()
+
+    def verify_transaction(self):
+        if self.signature is None:
+            return False
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}"
+        try:
+            rsa.verify(transaction_data.encode(), self.signature, self.sender_public_key)
+            return True
+        except:
+            return False
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        transaction_data = f"{self.sender_public_key}{self.receiver}{self.amount}{self.fee}".encode()
+        return hashlib.sha256(transaction_data + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        return {
+            "sender": key_to_list(self.sender_public_key),
+            "receiver": key_to_list(self.receiver),
+            "amount": self.amount,
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+
+    # Transactions that arrive signed are sealed straight away
+    @staticmethod
+    def from_dict(data):
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(key_from_list(data["sender"]), key_from_list(data["receiver"]), data["amount"], data["fee"], signature)
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        return f"{self.sender_public_key} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-19, but its transactions can be dropped once the block is deep enough
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    # A pruned block was checked before its transactions were dropped.
+    def body_matches_header(self):
+        if self.body_checked or self.is_pruned():
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    # Drops the transactions and keeps the header. Only sealed blocks whose body matches the header can be pruned.
+    def prune(self):
+        if self.is_pruned():
+            return
+        if not self.is_sealed() or not self.body_matches_header():
+            raise ValueError(f"Block {self.index} cannot be pruned before it is sealed and checked")
+        # The one change a sealed block allows: the header, and so the hash, stay as they were
+        object.__setattr__(self, "transaction_count", len(self.transactions))
+        object.__setattr__(self, "transactions", None)
+
+    def is_pruned(self):
+        return self.transactions is None
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "miner_address": key_to_list(self.miner_address),
+            "reward": self.reward,
+            "transactions": None if self.is_pruned() else [tx.to_dict() for tx in self.transactions],
+        }
+
+    # Rebuilds a block received from a peer. The hash is worked out again from the header fields rather than trusted.
+    @staticmethod
+    def from_dict(data):
+        transactions = [Transaction.from_dict(tx) for tx in data["transactions"]]
+        block = Block(data["index"], transactions, data["previous_hash"], key_from_list(data["miner_address"]), data["reward"], data["difficulty"])
+        block.header.timestamp = data["timestamp"]
+        block.header.merkle_root = data["merkle_root"]
+        block.header.nonce = data["nonce"]
+        block.seal()
+        return block
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        if self.is_pruned():
+            print(f"Transactions: pruned ({self.transaction_count})")
+        else:
+            print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+
+    def create_transaction(self, receiver, amount, fee=0):
+        transaction = Transaction(self.public_key, receiver, amount, fee)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender_public_key is None:
+        return "reward transaction found before the end of the block"
+    if tx.amount <= 0 or tx.fee < 0:
+        return f"transaction {tx.txid().hex()[:16]} has a negative amount or fee"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender_public_key, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender_public_key, 0)}"
+    balances[tx.sender_public_key] -= spent
+    balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+    return None
+
+
+# Apply the transactions of one block to a balances dict.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+        return None
+
+    if not block.transactions or block.transactions[-1].sender_public_key is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    balances[reward_transaction.receiver] = balances.get(reward_transaction.receiver, 0) + reward_transaction.amount
+    return None
+
+
+
+
+# Reverses apply_block_to_balances for a block that was applied. Accounts that drop to zero are removed.
+def undo_block_from_balances(block, balances):
+    def add(public_key, amount):
+        balances[public_key] = balances.get(public_key, 0) + amount
+        if balances[public_key] == 0:
+            del balances[public_key]
+
+    reward_transaction = block.transactions[-1]
+    add(reward_transaction.receiver, -reward_transaction.amount)
+    for tx in reversed(block.transactions[:-1]):
+        add(tx.receiver, -tx.amount)
+        add(tx.sender_public_key, tx.amount + tx.fee)
+
+
+# Header checks from Day-17
+def check_header(block, previous_block, block_time_target):
+    if block.index != previous_block.index + 1:
+        return "block index does not follow the previous block"
+    if block.previous_hash != previous_block.hash:
+        return "block is not properly linked to the previous block"
+    if not block.body_matches_header():
+        return "transactions do not match the Merkle root"
+    if not block.header.hash_matches_fields():
+        return "block hash does not match its header"
+    if block.difficulty != expected_difficulty(previous_block, block.timestamp, block_time_target):
+        return f"difficulty {block.difficulty} does not follow the difficulty adjustment"
+    if block.hash[:block.difficulty] != '0' * block.difficulty:
+        return "block hash does not meet its proof of work"
+    return None
+
+
+# Full check of a new block on top of previous_block. The block is applied to balances if it is valid.
+# Returns the reason the block is invalid, or None if it is fine.
+def validate_block(block, previous_block, balances, block_time_target, mining_reward):
+    reason = check_header(block, previous_block, block_time_target)
+    if reason is not None:
+        return reason
+    for tx in block.transactions[:-1]:
+        if not tx.verify_transaction():
+            return f"transaction {tx.txid().hex()[:16]} has an invalid signature"
+    return apply_block_to_balances(block, balances, mining_reward)
+
+
+# Blockchain class remains the same as Day-19, but can prune old blocks, accept blocks from peers and reorganize
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None, chain=None, prune_depth=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.prune_depth = prune_depth  # Blocks this deep or deeper lose their transactions, None keeps everything
+        self.pruned_height = -1  # Highest block whose transactions were dropped
+        self.balances = {}  # Public key -> coins
+        self.chain = chain or [self.create_genesis_block(genesis_allocations or {})]
+        for block in self.chain:
+            apply_block_to_balances(block, self.balances, self.mining_reward)
+        self.transaction_pool = []
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, public_key, amount) for public_key, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, public_key):
+        return self.balances.get(public_key, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        self.prune()
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = expected_difficulty(self.get_latest_block(), new_block.timestamp, self.block_time_target)
+
+    # Drops the transactions of every block that is now prune_depth blocks or more below the tip
+    def prune(self):
+        if self.prune_depth is None:
+            return
+        for height in range(self.pruned_height + 1, len(self.chain) - self.prune_depth):
+            self.chain[height].prune()
+            self.pruned_height = height
+
+    # A block mined by someone else, on top of our tip
+    # Returns the reason the block was refused, or None if it was added.
+    def receive_block(self, block):
+        balances = dict(self.balances)
+        reason = validate_block(block, self.get_latest_block(), balances, self.block_time_target, self.mining_reward)
+        if reason is not None:
+            return reason
+        self.chain.append(block)
+        self.balances = balances
+        included = {tx.txid() for tx in block.transactions}
+        self.transaction_pool = [tx for tx in self.transaction_pool if tx.txid() not in included]
+        self.prune()
+        return None
+
+    # Switches to a longer branch that forks off our chain. The blocks above the fork point are undone from their own
+    # transactions, so the fork point cannot be below the pruned height.
+    # Returns the reason the branch was refused, or None if the chain now ends with it.
+    def reorganize(self, branch):
+        fork_height = branch[0].index - 1
+        if fork_height >= len(self.chain) or self.chain[fork_height].hash != branch[0].previous_hash:
+            return "branch does not fork off this chain"
+        if branch[-1].index <= self.get_latest_block().index:
+            return "branch is not longer than the current chain"
+        if fork_height < self.pruned_height:
+            return f"fork at height {fork_height} is below the pruned height {self.pruned_height}"
+
+        balances = dict(self.balances)
+        orphaned = self.chain[fork_height + 1:]
+        for block in reversed(orphaned):
+            undo_block_from_balances(block, balances)
+
+        previous_block = self.chain[fork_height]
+        for block in branch:
+            reason = validate_block(block, previous_block, balances, self.block_time_target, self.mining_reward)
+            if reason is not None:
+                return f"block {block.index}: {reason}"
+            previous_block = block
+
+        self.chain = self.chain[:fork_height + 1] + list(branch)
+        self.balances = balances
+        # Transactions from the orphaned blocks that the branch did not include go back to the pool
+        included = {tx.txid() for block in branch for tx in block.transactions}
+        orphaned_transactions = [tx for block in orphaned for tx in block.transactions[:-1] if tx.txid() not in included]
+        self.transaction_pool = orphaned_transactions + [tx for tx in self.transaction_pool if tx.txid() not in included]
+        self.prune()
+        return None
+
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction():
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than sinking the whole block.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    def mine_pending_transactions(self, miner_address):
+        transactions = self.select_transactions()
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Mines a branch of blocks on top of previous_block without adding them to any chain
+def mine_branch(previous_block, transaction_batches, miner_address, block_time_target, mining_reward):
+    branch = []
+    for transactions in transaction_batches:
+        reward_transaction = Transaction(None, miner_address, mining_reward + sum(tx.fee for tx in transactions))
+        block = Block(previous_block.index + 1, transactions + [reward_transaction], previous_block.hash, miner_address, mining_reward)
+        block.difficulty = expected_difficulty(previous_block, block.timestamp, block_time_target)
+        block.mine_block()
+        branch.append(block)
+        previous_block = block
+    return branch
+
+
+# Rough memory footprint of an object graph, from Day-13
+def deep_sizeof(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    if hasattr(type(obj), "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, slot), seen) for slot in type(obj).__slots__ if hasattr(obj, slot))
+    return size
+
+
+# Size of the chain as one JSON line per block, the Day-16 export format
+def disk_size(chain):
+    return sum(len(json.dumps(block.to_dict())) + 1 for block in chain)
+
+
+# Same block as a peer would see it after it crossed the network
+def over_the_wire(block):
+    return Block.from_dict(json.loads(json.dumps(block.to_dict())))
+
+
+def without_zeros(balances):
+    return {key: amount for key, amount in balances.items() if amount}
+
+
+if __name__ == "__main__":
+    wallets = [Wallet() for _ in range(4)]
+    miner_wallet = Wallet()
+    other_miner_wallet = Wallet()
+    full_node = Blockchain(block_time_target=0, genesis_allocations={wallet.public_key: 10_000_000 for wallet in wallets})
+    pruned_node = Blockchain(block_time_target=0, chain=[over_the_wire(full_node.chain[0])], prune_depth=32)
+
+    # The full node mines a long chain and the pruned node validates every block as it arrives
+    blocks, per_block = 300, 50
+    start = time.perf_counter()
+    for height in range(blocks):
+        for i in range(per_block):
+            n = height * per_block + i
+            sender, receiver = wallets[n % 4], wallets[(n + 1) % 4]
+            full_node.add_transaction_to_pool(sender.create_transaction(receiver.public_key, 1 + n, fee=1 + n % 3))
+        block = full_node.mine_pending_transactions(miner_wallet.public_key)
+        reason = pruned_node.receive_block(over_the_wire(block))
+        if reason is not None:
+            print(f"Pruned node refused block {block.index}: {reason}")
+    print(f"Built {blocks} blocks of {per_block} transactions in {time.perf_counter() - start:.1f} s")
+
+    print(f"\n{'':<12} {'blocks':>7} {'bodies':>7} {'memory':>10} {'disk':>10}")
+    for name, node in (("full node", full_node), ("pruned node", pruned_node)):
+        bodies = sum(1 for block in node.chain if not block.is_pruned())
+        print(f"{name:<12} {len(node.chain):>7} {bodies:>7} {deep_sizeof(node.chain) / 1e6:>8.2f} MB {disk_size(node.chain) / 1e6:>7.2f} MB")
+    saved_memory = 1 - deep_sizeof(pruned_node.chain) / deep_sizeof(full_node.chain)
+    saved_disk = 1 - disk_size(pruned_node.chain) / disk_size(full_node.chain)
+    print(f"Pruning saved {saved_memory:.0%} of the memory and {saved_disk:.0%} of the disk space")
+    print("Same tip:", pruned_node.get_latest_block().hash == full_node.get_latest_block().hash)
+    print("Same balances:", without_zeros(pruned_node.balances) == without_zeros(full_node.balances))
+    print("Is pruned chain valid?", pruned_node.is_chain_valid())
+
+    # A competing miner forks 5 blocks below the tip and finds 7 blocks, which is within the retained depth
+    fork_block = full_node.chain[-6]
+    batches = [[wallets[(k + 2) % 4].create_transaction(wallets[k % 4].public_key, 7_000_000 + k, fee=5)] for k in range(7)]
+    branch = mine_branch(fork_block, batches, other_miner_wallet.public_key, 0, full_node.mining_reward)
+    pool_before = len(pruned_node.transaction_pool)
+    start = time.perf_counter()
+    reason = pruned_node.reorganize([over_the_wire(block) for block in branch])
+    print(f"\nReorganization from height {fork_block.index} onto a 7 block branch: {reason or 'done'} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"Orphaned transactions returned to the pool: {len(pruned_node.transaction_pool) - pool_before}")
+    full_node.reorganize(branch)
+    print("Same balances as the full node after both reorganized:", without_zeros(pruned_node.balances) == without_zeros(full_node.balances))
+    print("Other miner's balance:", pruned_node.get_balance(other_miner_wallet.public_key))
+
+    # A fork below the pruned height cannot be undone without the pruned bodies
+    deep_fork = pruned_node.chain[pruned_node.pruned_height - 10]
+    deep_branch = mine_branch(deep_fork, [[] for _ in range(len(pruned_node.chain) - deep_fork.index)], other_miner_wallet.public_key, 0, full_node.mining_reward)
+    print(f"\nReorganization from height {deep_fork.index}: {pruned_node.reorganize(deep_branch)}")
+
+    # A tampered block is still refused
+    next_block = mine_branch(pruned_node.get_latest_block(), [[wallets[0].create_transaction(wallets[1].public_key, 5, fee=1)]], miner_wallet.public_key, 0, full_node.mining_reward)[0]
+    data = next_block.to_dict()
+    data["transactions"][0]["amount"] = 5_000
+    print("Tampered block:", pruned_node.receive_block(Block.from_dict(data)))
+    print("Untouched block:", pruned_node.receive_block(over_the_wire(next_block)) or "accepted")
+
+'''
+Sample Output:
+
+Built 300 blocks of 50 transactions in 18.6 s
+
+              blocks  bodies     memory       disk
+full node        301     301     5.98 MB    8.11 MB
+pruned node      301      32     1.08 MB    1.01 MB
+Pruning saved 82% of the memory and 88% of the disk space
+Same tip: True
+Same balances: True
+Is pruned chain valid? True
+
+Reorganization from height 295 onto a 7 block branch: done in 3.1 ms
+Orphaned transactions returned to the pool: 250
+Same balances as the full node after both reorganized: True
+Other miner's balance: 385
+
+Reorganization from height 260: fork at height 260 is below the pruned height 270
+Tampered block: transactions do not match the Merkle root
+Untouched block: accepted
+'''
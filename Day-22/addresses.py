@@ -0,0 +1,647 @@
+'''
+Day-22:
+Learnt about addresses. Senders, receivers and miners were full RSA public keys, which were turned into long decimal
+strings inside every signing message and txid, and copied into every transaction that crossed the wire.
+Implemented 20 byte addresses made by hashing the public key, and a KeyRegistry that maps addresses to keys and interns the
+address strings. Transactions, blocks and balances now only use addresses. A wallet attaches its full key to its first
+spend only. After that, nodes look the key up in their registry, and the key is checked against the address whenever it
+travels with a transaction. Also measured the hashing input, wire size and memory saved per transaction.
+'''
+
+import hashlib
+import json
+import random
+import sys
+import time
+import timeit
+from collections import ChainMap
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+
+# Address of a public key: the first 20 bytes of the SHA-256 of its DER encoding, as 40 hex characters
+def address_of(public_key):
+    return hashlib.sha256(public_key.save_pkcs1(format="DER")).digest()[:20].hex()
+
+
+# Address -> public key table. Also interns address strings, so every transaction that mentions an
+# address shares one string object with the rest.
+class KeyRegistry:
+    def __init__(self):
+        self.keys = {}  # Address -> public key
+        self.addresses = {}  # Address -> the one shared copy of that string
+
+    def intern(self, address):
+        if address is None:
+            return None
+        return self.addresses.setdefault(address, address)
+
+    def register(self, public_key):
+        address = self.intern(address_of(public_key))
+        self.keys.setdefault(address, public_key)
+        return address
+
+    def get(self, address):
+        return self.keys.get(address)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Transaction class remains the same as Day-19, but with addresses instead of public keys.
+# sender_public_key is only set on a sender's first spend, when nodes do not know the key yet.
+class Transaction:
+    def __init__(self, sender, receiver, amount, fee=0, signature=None, sender_public_key=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender = sender  # None for mining rewards and genesis allocations
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+        self.sender_public_key = sender_public_key
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    # The key is not part of the message, the sender address already commits to it
+    def message(self):
+        return f"{self.sender}{self.receiver}{self.amount}{self.fee}".encode()
+
+    def sign_transaction(self, private_key):
+        self.signature = rsa.sign(self.message(), private_key, 'SHA-256')
+        self.seal()
+
+    # Uses the key that came with the transaction, or the one the registry learnt from an earlier spend
+    def verify_transaction(self, registry):
+        if self.signature is None or self.sender is None:
+            return False
+        public_key = self.sender_public_key
+        if public_key is None:
+            public_key = registry.get(self.sender)
+            if public_key is None:
+                return False
+        elif address_of(public_key) != self.sender:
+            return False
+        try:
+            rsa.verify(self.message(), self.signature, public_key)
+            return True
+        except:
+            return False
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        return hashlib.sha256(self.message() + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        data = {
+            "sender": self.sender,
+            "receiver": self.receiver,
+            "amount": self.amount,
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+        if self.sender_public_key is not None:
+            data["sender_public_key"] = key_to_list(self.sender_public_key)
+        return data
+
+    # Transactions that arrive signed are sealed straight away. With a registry, the addresses are interned.
+    @staticmethod
+    def from_dict(data, registry=None):
+        intern = registry.intern if registry is not None else (lambda address: address)
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(intern(data["sender"]), intern(data["receiver"]), data["amount"], data["fee"], signature,
+                                  key_from_list(data.get("sender_public_key")))
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        return f"{self.sender} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-19, with the miner address being an address
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same, but pays to addresses and sends its key along with its spends until one of them is mined
+class Wallet:
+    def __init__(self):
+        self.public_key, self.private_key = rsa.newkeys(512)
+        self.address = address_of(self.public_key)
+        self.key_published = False  # True once a spend carrying the key is in a block
+
+    def create_transaction(self, receiver, amount, fee=0):
+        sender_public_key = None if self.key_published else self.public_key
+        transaction = Transaction(self.address, receiver, amount, fee, sender_public_key=sender_public_key)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+    # Nodes only learn keys from blocks, so a first spend that is dropped or still waiting does not publish the key
+    def on_block(self, block):
+        if not self.key_published:
+            self.key_published = any(tx.sender == self.address and tx.sender_public_key is not None for tx in block.transactions)
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender is None:
+        return "reward transaction found before the end of the block"
+    if tx.amount <= 0 or tx.fee < 0:
+        return f"transaction {tx.txid().hex()[:16]} has a negative amount or fee"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender, 0)}"
+    balances[tx.sender] -= spent
+    balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+    return None
+
+
+# Apply the transactions of one block to a balances dict, keyed by address.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+        return None
+
+    if not block.transactions or block.transactions[-1].sender is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    balances[reward_transaction.receiver] = balances.get(reward_transaction.receiver, 0) + reward_transaction.amount
+    return None
+
+
+
+
+# Blockchain class remains the same as Day-19, with balances keyed by address and a registry of the keys seen so far
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.registry = KeyRegistry()
+        self.balances = {}  # Address -> coins
+        self.chain = [self.create_genesis_block(genesis_allocations or {})]
+        self.transaction_pool = []
+        apply_block_to_balances(self.chain[0], self.balances, self.mining_reward)
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, self.registry.intern(address), amount) for address, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, address):
+        return self.balances.get(address, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        for tx in new_block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = expected_difficulty(self.get_latest_block(), new_block.timestamp, self.block_time_target)
+
+    # A key that comes with a transaction is only used to check it. The registry learns keys from blocks, so spends
+    # without a key are only accepted once a spend carrying it has been mined, as a new node replaying the chain needs.
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction(self.registry):
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than sinking the whole block.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    def mine_pending_transactions(self, miner_address):
+        transactions = self.select_transactions()
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Checks every signature in a chain, in order, starting from an empty registry, the way a new node would.
+# Returns the registry it built and the number of bad signatures.
+def verify_chain_signatures(chain):
+    registry = KeyRegistry()
+    bad = 0
+    for block in chain[1:]:
+        for tx in block.transactions[:-1]:
+            if tx.verify_transaction(registry):
+                if tx.sender_public_key is not None:
+                    registry.register(tx.sender_public_key)
+            else:
+                bad += 1
+    return registry, bad
+
+
+# Rough memory footprint of an object graph, from Day-13
+def deep_sizeof(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    if hasattr(type(obj), "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, slot), seen) for slot in type(obj).__slots__ if hasattr(obj, slot))
+    return size
+
+
+if __name__ == "__main__":
+    random.seed(22)
+    wallets = [Wallet() for _ in range(100)]
+    keys = {wallet.address: wallet.public_key for wallet in wallets}
+    miner_wallet = Wallet()
+    blockchain = Blockchain(block_time_target=0, genesis_allocations={wallet.address: 1_000_000 for wallet in wallets})
+
+    # 20 blocks of 100 random payments between 100 wallets
+    for height in range(20):
+        for i in range(100):
+            sender, receiver = random.sample(wallets, 2)
+            blockchain.add_transaction_to_pool(sender.create_transaction(receiver.address, random.randint(1, 1000), fee=random.randint(1, 5)))
+        block = blockchain.mine_pending_transactions(miner_wallet.address)
+        for wallet in wallets:
+            wallet.on_block(block)
+
+    transactions = [tx for block in blockchain.chain[1:] for tx in block.transactions[:-1]]
+    with_key = sum(1 for tx in transactions if tx.sender_public_key is not None)
+    print(f"{len(transactions)} transactions, {with_key} of them carry the sender's key (spends before the first one was mined)")
+    print("Example:", transactions[-1])
+    print(f"Miner balance: {blockchain.get_balance(miner_wallet.address)}")
+    print("Is blockchain valid?", blockchain.is_chain_valid())
+
+    # A new node checks every signature, learning keys from first spends as it goes
+    registry, bad = verify_chain_signatures(blockchain.chain)
+    print(f"New node verified the chain: {bad} bad signatures, {len(registry)} keys learnt")
+
+    # The miner's first spend is lost before it reaches a node, so the next one still has to carry the key
+    miner_wallet.create_transaction(wallets[0].address, 5)
+    payment = miner_wallet.create_transaction(wallets[1].address, 5)
+    blockchain.add_transaction_to_pool(payment)
+    miner_wallet.on_block(blockchain.mine_pending_transactions(miner_wallet.address))
+    print(f"Miner's first spend was dropped, the next one carries the key: {payment.sender_public_key is not None}, "
+          f"new node finds {verify_chain_signatures(blockchain.chain)[1]} bad signatures")
+
+    # Per transaction, before (full keys) and after (addresses)
+    def key_message(tx):
+        return f"{keys[tx.sender]}{keys[tx.receiver]}{tx.amount}{tx.fee}".encode()
+
+    def key_dict(tx):
+        return {"sender": key_to_list(keys[tx.sender]), "receiver": key_to_list(keys[tx.receiver]),
+                "amount": tx.amount, "fee": tx.fee, "signature": tx.signature.hex()}
+
+    count = len(transactions)
+    hash_input = (sum(len(key_message(tx)) for tx in transactions) / count, sum(len(tx.message()) for tx in transactions) / count)
+    wire = (sum(len(json.dumps(key_dict(tx))) for tx in transactions) / count, sum(len(json.dumps(tx.to_dict())) for tx in transactions) / count)
+    hash_time = (timeit.timeit(lambda: [hashlib.sha256(key_message(tx)) for tx in transactions], number=5) / 5 / count,
+                 timeit.timeit(lambda: [hashlib.sha256(tx.message()) for tx in transactions], number=5) / 5 / count)
+
+    # Sender and receiver fields after decoding the transactions from the wire
+    decoded_keys = [tuple(key_from_list(key) for key in json.loads(json.dumps([key_to_list(keys[tx.sender]), key_to_list(keys[tx.receiver])])))
+                    for tx in transactions]
+    registry = KeyRegistry()
+    decoded = [Transaction.from_dict(json.loads(json.dumps(tx.to_dict()))) for tx in transactions]
+    interned = [Transaction.from_dict(json.loads(json.dumps(tx.to_dict())), registry) for tx in transactions]
+    memory = (deep_sizeof(decoded_keys) / count,
+              deep_sizeof([(tx.sender, tx.receiver) for tx in decoded]) / count,
+              (deep_sizeof([(tx.sender, tx.receiver) for tx in interned]) + deep_sizeof(registry.addresses)) / count)
+
+    print(f"\n{'per transaction':<28} {'public keys':>12} {'addresses':>12}")
+    print(f"{'hashing input (bytes)':<28} {hash_input[0]:>12.0f} {hash_input[1]:>12.0f}")
+    print(f"{'build message + hash (us)':<28} {hash_time[0] * 1e6:>12.2f} {hash_time[1] * 1e6:>12.2f}")
+    print(f"{'wire size, JSON (bytes)':<28} {wire[0]:>12.0f} {wire[1]:>12.0f}")
+    print(f"{'sender + receiver (bytes)':<28} {memory[0]:>12.0f} {memory[1]:>12.0f}")
+    print(f"{'  with interned addresses':<28} {'':>12} {memory[2]:>12.0f}")
+
+    # A key that does not belong to the sender address, and a spend from an address nobody knows the key of
+    mallory = Wallet()
+    forged = Transaction(wallets[0].address, mallory.address, 500, 1, sender_public_key=mallory.public_key)
+    forged.sign_transaction(mallory.private_key)
+    print("\nTransaction signed by someone else's key:")
+    blockchain.add_transaction_to_pool(forged)
+    mallory.key_published = True
+    print("Spend without a key from an address the node has never seen:")
+    blockchain.add_transaction_to_pool(mallory.create_transaction(wallets[0].address, 1))
+
+'''
+Sample Output:
+
+2000 transactions, 152 of them carry the sender's key (spends before the first one was mined)
+Example: 1092fb77a1663c23dc7c9d0ebb72657f2d0ad9d3 -> 7965e7af5eedb8ef8748775befce20dc9a3b4661: 518 (Fee: 2)
+Miner balance: 6971
+Is blockchain valid? True
+New node verified the chain: 0 bad signatures, 100 keys learnt
+Miner's first spend was dropped, the next one carries the key: True, new node finds 0 bad signatures
+
+per transaction               public keys    addresses
+hashing input (bytes)                 348           84
+build message + hash (us)            2.36         0.48
+wire size, JSON (bytes)               522          294
+sender + receiver (bytes)             208          242
+  with interned addresses                           75
+
+Transaction signed by someone else's key:
+Transaction is invalid and was not added to the pool.
+Spend without a key from an address the node has never seen:
+Transaction is invalid and was not added to the pool.
+'''
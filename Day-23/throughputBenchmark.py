@@ -0,0 +1,762 @@
+'''
+Day-23:
+Learnt about benchmarking a system end to end rather than one function at a time. Until now there was no way to answer
+"how many transactions per second can this chain sustain".
+Implemented a synthetic workload generator and a benchmark. Wallet keys can be cached on disk so runs do not spend their
+time generating RSA keys. Payments follow a skewed popularity between wallets, with log-normal amounts and a spread of
+fees, and every payment goes through add_transaction_to_pool -> mine_pending_transactions -> is_chain_valid. The report
+gives the sustained tx/s, a per-stage latency breakdown and memory growth, and pool size, block size and difficulty can
+all be set from the command line.
+
+Usage:
+    python throughputBenchmark.py
+    python throughputBenchmark.py --key-cache keys.json --transactions 20000 --block-size 1000 --difficulty 4
+'''
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import resource
+import stat
+import sys
+import time
+from collections import ChainMap
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+
+# Address of a public key: the first 20 bytes of the SHA-256 of its DER encoding, as 40 hex characters
+def address_of(public_key):
+    return hashlib.sha256(public_key.save_pkcs1(format="DER")).digest()[:20].hex()
+
+
+# KeyRegistry class remains the same as Day-22
+class KeyRegistry:
+    def __init__(self):
+        self.keys = {}  # Address -> public key
+        self.addresses = {}  # Address -> the one shared copy of that string
+
+    def intern(self, address):
+        if address is None:
+            return None
+        return self.addresses.setdefault(address, address)
+
+    def register(self, public_key):
+        address = self.intern(address_of(public_key))
+        self.keys.setdefault(address, public_key)
+        return address
+
+    def get(self, address):
+        return self.keys.get(address)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Transaction class remains the same as Day-22
+class Transaction:
+    def __init__(self, sender, receiver, amount, fee=0, signature=None, sender_public_key=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender = sender  # None for mining rewards and genesis allocations
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+        self.sender_public_key = sender_public_key
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    # The key is not part of the message, the sender address already commits to it
+    def message(self):
+        return f"{self.sender}{self.receiver}{self.amount}{self.fee}".encode()
+
+    def sign_transaction(self, private_key):
+        self.signature = rsa.sign(self.message(), private_key, 'SHA-256')
+        self.seal()
+
+    # Uses the key that came with the transaction, or the one the registry learnt from an earlier spend
+    def verify_transaction(self, registry):
+        if self.signature is None or self.sender is None:
+            return False
+        public_key = self.sender_public_key
+        if public_key is None:
+            public_key = registry.get(self.sender)
+            if public_key is None:
+                return False
+        elif address_of(public_key) != self.sender:
+            return False
+        try:
+            rsa.verify(self.message(), self.signature, public_key)
+            return True
+        except:
+            return False
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        return hashlib.sha256(self.message() + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        data = {
+            "sender": self.sender,
+            "receiver": self.receiver,
+            "amount": self.amount,
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+        if self.sender_public_key is not None:
+            data["sender_public_key"] = key_to_list(self.sender_public_key)
+        return data
+
+    # Transactions that arrive signed are sealed straight away. With a registry, the addresses are interned.
+    @staticmethod
+    def from_dict(data, registry=None):
+        intern = registry.intern if registry is not None else (lambda address: address)
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(intern(data["sender"]), intern(data["receiver"]), data["amount"], data["fee"], signature,
+                                  key_from_list(data.get("sender_public_key")))
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        return f"{self.sender} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-22
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same as Day-22, but can be built from keys that were generated earlier
+class Wallet:
+    def __init__(self, keys=None):
+        self.public_key, self.private_key = keys or rsa.newkeys(512)
+        self.address = address_of(self.public_key)
+        self.key_published = False  # True once a spend carrying the key is in a block
+
+    def create_transaction(self, receiver, amount, fee=0):
+        sender_public_key = None if self.key_published else self.public_key
+        transaction = Transaction(self.address, receiver, amount, fee, sender_public_key=sender_public_key)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+    # Nodes only learn keys from blocks, so a first spend that is dropped or still waiting does not publish the key
+    def on_block(self, block):
+        if not self.key_published:
+            self.key_published = any(tx.sender == self.address and tx.sender_public_key is not None for tx in block.transactions)
+
+
+# Loads count wallets from a file of PEM private keys, generating and saving any that are missing. The file holds
+# private keys, so only one that no one else can read is trusted, and a new one is created readable by its owner only.
+# Without a file the keys are generated and thrown away.
+def load_wallets(count, cache_path=None):
+    pems = []
+    if cache_path is not None and os.path.lexists(cache_path):
+        info = os.lstat(cache_path)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ValueError(f"{cache_path} must be a regular file that only its owner can read and write")
+        with open(cache_path) as f:
+            pems = json.load(f)
+    while len(pems) < count:
+        _, private_key = rsa.newkeys(512)
+        pems.append(private_key.save_pkcs1().decode())
+    if cache_path is not None:
+        fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(pems, f)
+
+    wallets = []
+    for pem in pems[:count]:
+        private_key = rsa.PrivateKey.load_pkcs1(pem.encode())
+        wallets.append(Wallet((rsa.PublicKey(private_key.n, private_key.e), private_key)))
+    return wallets
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender is None:
+        return "reward transaction found before the end of the block"
+    if tx.amount <= 0 or tx.fee < 0:
+        return f"transaction {tx.txid().hex()[:16]} has a negative amount or fee"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender, 0)}"
+    balances[tx.sender] -= spent
+    balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+    return None
+
+
+# Apply the transactions of one block to a balances dict, keyed by address.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+        return None
+
+    if not block.transactions or block.transactions[-1].sender is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    balances[reward_transaction.receiver] = balances.get(reward_transaction.receiver, 0) + reward_transaction.amount
+    return None
+
+
+# Blockchain class remains the same as Day-22, but can keep a fixed difficulty and mine blocks of limited size
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None, difficulty=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.difficulty = difficulty  # Fixed difficulty, or None to adjust it to block_time_target
+        self.registry = KeyRegistry()
+        self.balances = {}  # Address -> coins
+        self.chain = [self.create_genesis_block(genesis_allocations or {})]
+        self.transaction_pool = []
+        apply_block_to_balances(self.chain[0], self.balances, self.mining_reward)
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, self.registry.intern(address), amount) for address, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, address):
+        return self.balances.get(address, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        for tx in new_block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        return None
+
+    def adjust_difficulty(self, new_block):
+        if self.difficulty is not None:
+            new_block.difficulty = self.difficulty
+        else:
+            new_block.difficulty = expected_difficulty(self.get_latest_block(), new_block.timestamp, self.block_time_target)
+
+    # A key that comes with a transaction is only used to check it. The registry learns keys from blocks, so spends
+    # without a key are only accepted once a spend carrying it has been mined, as a new node replaying the chain needs.
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction(self.registry):
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than sinking the whole block.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    # Mines the oldest max_transactions transactions in the pool, or all of them
+    def mine_pending_transactions(self, miner_address, max_transactions=None):
+        transactions = self.select_transactions(max_transactions)
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Checks every signature in a chain, in order, starting from an empty registry, the way a new node would.
+# Returns the registry it built and the number of bad signatures.
+def verify_chain_signatures(chain):
+    registry = KeyRegistry()
+    bad = 0
+    for block in chain[1:]:
+        for tx in block.transactions[:-1]:
+            if tx.verify_transaction(registry):
+                if tx.sender_public_key is not None:
+                    registry.register(tx.sender_public_key)
+            else:
+                bad += 1
+    return registry, bad
+
+
+# Stream of payments that look a little like real ones: a few wallets are far busier than the rest, most amounts are
+# small with a long tail, and most fees are low with a few senders paying much more.
+class PaymentWorkload:
+    FEE_LEVELS = [1, 2, 3, 5, 10, 25]
+    FEE_WEIGHTS = [40, 25, 15, 10, 7, 3]
+
+    def __init__(self, wallets, balances, seed=0, popularity_skew=1.1, median_amount=50):
+        self.random = random.Random(seed)
+        self.wallets = wallets
+        self.balances = dict(balances)  # The generator's own view, so it never overspends
+        # Zipf-like popularity, in a shuffled order so the busy wallets are not always the first ones
+        weights = [1 / (rank + 1) ** popularity_skew for rank in range(len(wallets))]
+        self.random.shuffle(weights)
+        self.weights = weights
+        self.amount_mu = math.log(median_amount)
+
+    def next_transaction(self):
+        while True:
+            sender, receiver = self.random.choices(self.wallets, self.weights, k=2)
+            if sender is receiver:
+                continue
+            amount = max(1, int(self.random.lognormvariate(self.amount_mu, 1.2)))
+            fee = self.random.choices(self.FEE_LEVELS, self.FEE_WEIGHTS)[0]
+            if self.balances.get(sender.address, 0) >= amount + fee:
+                break
+        self.balances[sender.address] -= amount + fee
+        self.balances[receiver.address] = self.balances.get(receiver.address, 0) + amount
+        return sender.create_transaction(receiver.address, amount, fee)
+
+
+# Summary of a list of durations in seconds
+class StageTimes:
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+    def total(self):
+        return sum(self.samples)
+
+    def row(self, total_time):
+        count = len(self.samples)
+        mean = self.total() / count if count else 0.0
+        return (f"{self.name:<26} {count:>7} {mean * 1000:>9.3f} {self.percentile(0.5) * 1000:>9.3f} "
+                f"{self.percentile(0.99) * 1000:>9.3f} {self.total():>8.2f} {self.total() / total_time:>6.0%}")
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # Bytes on macOS, KB on Linux
+
+
+def run_benchmark(config):
+    print("Config:", ", ".join(f"{name}={value}" for name, value in vars(config).items()))
+    start = time.perf_counter()
+    wallets = load_wallets(config.wallets, config.key_cache)
+    miner_wallet = wallets[0]
+    print(f"Loaded {len(wallets)} wallets in {time.perf_counter() - start:.2f} s")
+
+    allocations = {wallet.address: 1_000_000 for wallet in wallets}
+    blockchain = Blockchain(genesis_allocations=allocations, difficulty=config.difficulty)
+    workload = PaymentWorkload(wallets, allocations, seed=config.seed)
+
+    signing = StageTimes("sign (client side)")
+    admission = StageTimes("add_transaction_to_pool")
+    mining = StageTimes("mine_pending_transactions")
+    validation = StageTimes("is_chain_valid")
+    waiting = StageTimes("pool wait (admit -> mined)")
+    admitted_at = {}
+    memory = [(0, 0, peak_rss_mb())]
+
+    submitted = 0
+    node_start = time.perf_counter()
+    while submitted < config.transactions or blockchain.transaction_pool:
+        # Fill the pool up to pool_size, then mine one block
+        while submitted < config.transactions and len(blockchain.transaction_pool) < config.pool_size:
+            t0 = time.perf_counter()
+            tx = workload.next_transaction()
+            t1 = time.perf_counter()
+            blockchain.add_transaction_to_pool(tx)
+            t2 = time.perf_counter()
+            signing.add(t1 - t0)
+            admission.add(t2 - t1)
+            admitted_at[id(tx)] = t2
+            submitted += 1
+
+        t0 = time.perf_counter()
+        block = blockchain.mine_pending_transactions(miner_wallet.address, config.block_size)
+        t1 = time.perf_counter()
+        valid = blockchain.is_chain_valid()
+        t2 = time.perf_counter()
+        mining.add(t1 - t0)
+        validation.add(t2 - t1)
+        if not valid:
+            print("Chain became invalid!")
+            return
+        for tx in block.transactions[:-1]:
+            waiting.add(t1 - admitted_at.pop(id(tx)))
+        for wallet in wallets:
+            wallet.on_block(block)
+
+        if len(blockchain.chain) % config.memory_every == 1:
+            memory.append((len(blockchain.chain) - 1, submitted - len(blockchain.transaction_pool), peak_rss_mb()))
+    total_time = time.perf_counter() - node_start
+    node_time = total_time - signing.total()
+    if memory[-1][0] != len(blockchain.chain) - 1:
+        memory.append((len(blockchain.chain) - 1, submitted, peak_rss_mb()))
+
+    mined = sum(len(block.transactions) - 1 for block in blockchain.chain[1:])
+    print(f"\nMined {mined} transactions in {len(blockchain.chain) - 1} blocks")
+    print(f"Sustained throughput: {mined / node_time:.0f} tx/s for the node ({node_time:.2f} s), "
+          f"{mined / total_time:.0f} tx/s including client signing ({total_time:.2f} s)")
+
+    print(f"\n{'stage':<26} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'total s':>8} {'share':>6}")
+    for stage in (signing, admission, mining, validation):
+        print(stage.row(total_time))
+    print(waiting.row(total_time).rsplit(" ", 2)[0])
+
+    print(f"\n{'blocks':>7} {'transactions':>13} {'peak RSS MB':>12}")
+    for blocks, transactions, rss in memory:
+        print(f"{blocks:>7} {transactions:>13} {rss:>12.1f}")
+    first, last = memory[0], memory[-1]
+    print(f"Memory growth: {(last[2] - first[2]) * 1e6 / max(1, last[1] - first[1]):.0f} bytes per mined transaction")
+
+    # What a new node would pay to check every signature in this chain
+    start = time.perf_counter()
+    _, bad = verify_chain_signatures(blockchain.chain)
+    print(f"\nRe-verifying every signature: {time.perf_counter() - start:.2f} s ({bad} bad)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end transaction throughput benchmark.")
+    parser.add_argument("--wallets", type=int, default=200, help="number of wallets (default 200)")
+    parser.add_argument("--transactions", type=int, default=10000, help="payments to push through (default 10000)")
+    parser.add_argument("--pool-size", type=int, default=2000, help="pool is filled up to this size before each block (default 2000)")
+    parser.add_argument("--block-size", type=int, default=500, help="most transactions per block (default 500)")
+    parser.add_argument("--difficulty", type=int, default=3, help="fixed proof-of-work difficulty (default 3)")
+    parser.add_argument("--memory-every", type=int, default=5, help="record memory every this many blocks (default 5)")
+    parser.add_argument("--seed", type=int, default=23)
+    parser.add_argument("--key-cache", help="file only you can read to cache the wallet keys in (default: none)")
+    run_benchmark(parser.parse_args())
+
+'''
+Sample Output (python throughputBenchmark.py --key-cache keys.json, then --transactions 20000 --block-size 2000 --pool-size 4000 --difficulty 4;
+the wallet keys were already cached):
+
+Config: wallets=200, transactions=10000, pool_size=2000, block_size=500, difficulty=3, memory_every=5, seed=23, key_cache=keys.json
+Loaded 200 wallets in 0.13 s
+
+Mined 10000 transactions in 20 blocks
+Sustained throughput: 13460 tx/s for the node (0.74 s), 801 tx/s including client signing (12.49 s)
+
+stage                        count   mean ms    p50 ms    p99 ms  total s  share
+sign (client side)           10000     1.174     1.153     1.706    11.74    94%
+add_transaction_to_pool      10000     0.054     0.047     0.278     0.54     4%
+mine_pending_transactions       20     8.104     7.398    28.272     0.16     1%
+is_chain_valid                  20     0.621     0.670     0.730     0.01     0%
+pool wait (admit -> mined)   10000  1993.570  2125.462  2658.820
+
+ blocks  transactions  peak RSS MB
+      0             0         21.2
+      5          2500         23.4
+     10          5000         24.7
+     15          7500         25.8
+     20         10000         26.5
+Memory growth: 525 bytes per mined transaction
+
+Re-verifying every signature: 0.40 s (0 bad)
+
+Config: wallets=200, transactions=20000, pool_size=4000, block_size=2000, difficulty=4, memory_every=5, seed=23, key_cache=keys.json
+Loaded 200 wallets in 0.10 s
+
+Mined 20000 transactions in 10 blocks
+Sustained throughput: 7901 tx/s for the node (2.53 s), 765 tx/s including client signing (26.16 s)
+
+stage                        count   mean ms    p50 ms    p99 ms  total s  share
+sign (client side)           20000     1.181     1.163     1.823    23.63    90%
+add_transaction_to_pool      20000     0.052     0.049     0.216     1.05     4%
+mine_pending_transactions       10   138.596    57.851   564.321     1.39     5%
+is_chain_valid                  10     2.805     2.740     3.681     0.03     0%
+pool wait (admit -> mined)   20000  3727.222  3835.689  5494.151
+
+ blocks  transactions  peak RSS MB
+      0             0         21.2
+      5         10000         27.5
+     10         20000         31.4
+Memory growth: 507 bytes per mined transaction
+
+Re-verifying every signature: 0.82 s (0 bad)
+'''
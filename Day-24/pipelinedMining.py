@@ -0,0 +1,899 @@
+'''
+Day-24:
+Learnt about pipelining. mine_pending_transactions did everything one step after another: the pool was verified, then
+the block was assembled, then it was mined. While signatures were being checked the mining cores sat idle, and while
+mining, the verification cores did.
+Implemented a producer/consumer mining pipeline. A verify stage checks incoming transactions in batches on a process pool.
+An assemble stage builds the next block from the verified transactions while the current one is being mined, and a
+mining stage finds the nonce in its own process. Bounded queues connect the stages, so a slow stage pushes back on the one
+before it instead of letting work pile up. Also reported how busy, idle and blocked each stage was, next to the plain
+sequential loop.
+
+Usage:
+    python pipelinedMining.py
+    python pipelinedMining.py --transactions 20000 --block-size 1000 --difficulty 5 --verify-workers 4
+'''
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import queue
+import random
+import stat
+import threading
+import time
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+
+# Address of a public key: the first 20 bytes of the SHA-256 of its DER encoding, as 40 hex characters
+def address_of(public_key):
+    return hashlib.sha256(public_key.save_pkcs1(format="DER")).digest()[:20].hex()
+
+
+# KeyRegistry class remains the same as Day-23
+class KeyRegistry:
+    def __init__(self):
+        self.keys = {}  # Address -> public key
+        self.addresses = {}  # Address -> the one shared copy of that string
+
+    def intern(self, address):
+        if address is None:
+            return None
+        return self.addresses.setdefault(address, address)
+
+    def register(self, public_key):
+        address = self.intern(address_of(public_key))
+        self.keys.setdefault(address, public_key)
+        return address
+
+    def get(self, address):
+        return self.keys.get(address)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Transaction class remains the same as Day-23
+class Transaction:
+    def __init__(self, sender, receiver, amount, fee=0, signature=None, sender_public_key=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender = sender  # None for mining rewards and genesis allocations
+        self.receiver = receiver
+        self.amount = amount
+        self.fee = fee  # Fee for miners
+        self.signature = signature
+        self.sender_public_key = sender_public_key
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    # The key is not part of the message, the sender address already commits to it
+    def message(self):
+        return f"{self.sender}{self.receiver}{self.amount}{self.fee}".encode()
+
+    def sign_transaction(self, private_key):
+        self.signature = rsa.sign(self.message(), private_key, 'SHA-256')
+        self.seal()
+
+    # Uses the key that came with the transaction, or the one the registry learnt from an earlier spend
+    def verify_transaction(self, registry):
+        if self.signature is None or self.sender is None:
+            return False
+        public_key = self.sender_public_key
+        if public_key is None:
+            public_key = registry.get(self.sender)
+            if public_key is None:
+                return False
+        elif address_of(public_key) != self.sender:
+            return False
+        try:
+            rsa.verify(self.message(), self.signature, public_key)
+            return True
+        except:
+            return False
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        return hashlib.sha256(self.message() + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        data = {
+            "sender": self.sender,
+            "receiver": self.receiver,
+            "amount": self.amount,
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+        if self.sender_public_key is not None:
+            data["sender_public_key"] = key_to_list(self.sender_public_key)
+        return data
+
+    # Transactions that arrive signed are sealed straight away. With a registry, the addresses are interned.
+    @staticmethod
+    def from_dict(data, registry=None):
+        intern = registry.intern if registry is not None else (lambda address: address)
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(intern(data["sender"]), intern(data["receiver"]), data["amount"], data["fee"], signature,
+                                  key_from_list(data.get("sender_public_key")))
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        return f"{self.sender} -> {self.receiver}: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-23
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same as Day-23
+class Wallet:
+    def __init__(self, keys=None):
+        self.public_key, self.private_key = keys or rsa.newkeys(512)
+        self.address = address_of(self.public_key)
+        self.key_published = False  # True once a spend carrying the key is in a block
+
+    def create_transaction(self, receiver, amount, fee=0):
+        sender_public_key = None if self.key_published else self.public_key
+        transaction = Transaction(self.address, receiver, amount, fee, sender_public_key=sender_public_key)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+    # Nodes only learn keys from blocks, so a first spend that is dropped or still waiting does not publish the key
+    def on_block(self, block):
+        if not self.key_published:
+            self.key_published = any(tx.sender == self.address and tx.sender_public_key is not None for tx in block.transactions)
+
+
+# Loads count wallets from a file of PEM private keys, generating and saving any that are missing. The file holds
+# private keys, so only one that no one else can read is trusted, and a new one is created readable by its owner only.
+# Without a file the keys are generated and thrown away.
+def load_wallets(count, cache_path=None):
+    pems = []
+    if cache_path is not None and os.path.lexists(cache_path):
+        info = os.lstat(cache_path)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ValueError(f"{cache_path} must be a regular file that only its owner can read and write")
+        with open(cache_path) as f:
+            pems = json.load(f)
+    while len(pems) < count:
+        _, private_key = rsa.newkeys(512)
+        pems.append(private_key.save_pkcs1().decode())
+    if cache_path is not None:
+        fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(pems, f)
+
+    wallets = []
+    for pem in pems[:count]:
+        private_key = rsa.PrivateKey.load_pkcs1(pem.encode())
+        wallets.append(Wallet((rsa.PublicKey(private_key.n, private_key.e), private_key)))
+    return wallets
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender is None:
+        return "reward transaction found before the end of the block"
+    if tx.amount <= 0 or tx.fee < 0:
+        return f"transaction {tx.txid().hex()[:16]} has a negative amount or fee"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender, 0)}"
+    balances[tx.sender] -= spent
+    balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+    return None
+
+
+# Apply the transactions of one block to a balances dict, keyed by address.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            balances[tx.receiver] = balances.get(tx.receiver, 0) + tx.amount
+        return None
+
+    if not block.transactions or block.transactions[-1].sender is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    balances[reward_transaction.receiver] = balances.get(reward_transaction.receiver, 0) + reward_transaction.amount
+    return None
+
+
+# Blockchain class remains the same as Day-23, but can also take blocks that were mined somewhere else
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None, difficulty=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.difficulty = difficulty  # Fixed difficulty, or None to adjust it to block_time_target
+        self.registry = KeyRegistry()
+        self.balances = {}  # Address -> coins
+        self.chain = [self.create_genesis_block(genesis_allocations or {})]
+        self.transaction_pool = []
+        apply_block_to_balances(self.chain[0], self.balances, self.mining_reward)
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, self.registry.intern(address), amount) for address, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, address):
+        return self.balances.get(address, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        for tx in new_block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        return None
+
+    # For blocks that were mined outside add_block, e.g. in another process.
+    # Returns the reason the block was refused, or None if it was added.
+    def append_mined_block(self, block):
+        changes = ChainMap({}, self.balances)
+        if not block.header.hash_matches_fields():
+            reason = "block hash does not match its header"
+        else:
+            reason = apply_block_to_balances(block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {block.index} was refused: {reason}")
+            return reason
+        self.chain.append(block)
+        self.balances.update(changes.maps[0])
+        for tx in block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        return None
+
+    def adjust_difficulty(self, new_block):
+        if self.difficulty is not None:
+            new_block.difficulty = self.difficulty
+        else:
+            new_block.difficulty = expected_difficulty(self.get_latest_block(), new_block.timestamp, self.block_time_target)
+
+    # A key that comes with a transaction is only used to check it. The registry learns keys from blocks, so spends
+    # without a key are only accepted once a spend carrying it has been mined, as a new node replaying the chain needs.
+    def add_transaction_to_pool(self, transaction):
+        if transaction.verify_transaction(self.registry):
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than sinking the whole block.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    # Mines the oldest max_transactions transactions in the pool, or all of them
+    def mine_pending_transactions(self, miner_address, max_transactions=None):
+        transactions = self.select_transactions(max_transactions)
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, miner_address, self.mining_reward + total_fees)
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# PaymentWorkload class remains the same as Day-23
+class PaymentWorkload:
+    FEE_LEVELS = [1, 2, 3, 5, 10, 25]
+    FEE_WEIGHTS = [40, 25, 15, 10, 7, 3]
+
+    def __init__(self, wallets, balances, seed=0, popularity_skew=1.1, median_amount=50):
+        self.random = random.Random(seed)
+        self.wallets = wallets
+        self.balances = dict(balances)  # The generator's own view, so it never overspends
+        # Zipf-like popularity, in a shuffled order so the busy wallets are not always the first ones
+        weights = [1 / (rank + 1) ** popularity_skew for rank in range(len(wallets))]
+        self.random.shuffle(weights)
+        self.weights = weights
+        self.amount_mu = math.log(median_amount)
+
+    def next_transaction(self):
+        while True:
+            sender, receiver = self.random.choices(self.wallets, self.weights, k=2)
+            if sender is receiver:
+                continue
+            amount = max(1, int(self.random.lognormvariate(self.amount_mu, 1.2)))
+            fee = self.random.choices(self.FEE_LEVELS, self.FEE_WEIGHTS)[0]
+            if self.balances.get(sender.address, 0) >= amount + fee:
+                break
+        self.balances[sender.address] -= amount + fee
+        self.balances[receiver.address] = self.balances.get(receiver.address, 0) + amount
+        return sender.create_transaction(receiver.address, amount, fee)
+
+
+# ---- Work done in other processes ----
+
+# Takes [(message, signature, public_key)] and returns one True/False per item
+def check_signatures(items):
+    results = []
+    for message, signature, public_key in items:
+        try:
+            rsa.verify(message, signature, public_key)
+            results.append(True)
+        except rsa.VerificationError:
+            results.append(False)
+    return results
+
+
+# Same search as Block.mine_block, from the header prefix
+def find_nonce(prefix, difficulty):
+    prefix_hasher = hashlib.sha256(prefix.encode())
+    target = '0' * difficulty
+    nonce = 0
+    while True:
+        hasher = prefix_hasher.copy()
+        hasher.update(str(nonce).encode())
+        block_hash = hasher.hexdigest()
+        if block_hash[:difficulty] == target:
+            return nonce, block_hash
+        nonce += 1
+
+
+# ---- Pipeline ----
+
+# Where one stage's time went: doing work, waiting for input, or waiting for room in the next queue
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.idle = 0.0
+        self.blocked = 0.0
+        self.items = 0
+
+    def row(self, wall_time):
+        return (f"{self.name:<10} {self.items:>7} {self.busy / wall_time:>7.0%} {self.idle / wall_time:>7.0%} "
+                f"{self.blocked / wall_time:>8.0%}")
+
+
+# End of input marker passed down the queues
+_DONE = object()
+
+
+# verify -> assemble -> mine, each in its own thread, joined by bounded queues.
+# The verify and mine stages hand their CPU work to process pools, so the threads spend their time waiting, not holding the GIL.
+class MiningPipeline:
+    def __init__(self, blockchain, miner_address, block_size=500, verify_batch=128, verify_workers=None,
+                 intake_size=4096, verified_size=2048):
+        self.blockchain = blockchain
+        self.miner_address = miner_address
+        self.block_size = block_size
+        self.verify_batch = verify_batch
+        self.verify_workers = verify_workers or os.cpu_count()
+        self.intake = queue.Queue(intake_size)  # Transactions waiting to be verified
+        self.verified = queue.Queue(verified_size)  # Verified transactions waiting to go into a block
+        self.templates = queue.Queue(1)  # The next block, assembled and waiting for the miner
+        self.miner_waiting = threading.Event()
+        self.stats = {name: StageStats(name) for name in ("submit", "verify", "assemble", "mine")}
+        self.rejected = 0
+        self.refused = 0  # Blocks the chain refused, their transactions went back to its pool
+
+    def start(self):
+        self.verify_pool = ProcessPoolExecutor(self.verify_workers)
+        self.mining_pool = ProcessPoolExecutor(1)
+        self.threads = [threading.Thread(target=target) for target in (self.run_verifier, self.run_assembler, self.run_miner)]
+        self.start_time = time.perf_counter()
+        for thread in self.threads:
+            thread.start()
+
+    # Blocks while the intake queue is full, which is how backpressure reaches the caller
+    def submit(self, transaction):
+        stats = self.stats["submit"]
+        start = time.perf_counter()
+        self.intake.put(transaction)
+        stats.blocked += time.perf_counter() - start
+        stats.items += 1
+
+    # Waits until everything submitted has been mined, or put back in the blockchain's pool if its block was refused.
+    # Returns the wall time of the run.
+    def finish(self):
+        self.intake.put(_DONE)
+        for thread in self.threads:
+            thread.join()
+        wall_time = time.perf_counter() - self.start_time
+        self.verify_pool.shutdown()
+        self.mining_pool.shutdown()
+        return wall_time
+
+    def _get(self, source, stats, timeout=None):
+        start = time.perf_counter()
+        try:
+            return source.get(timeout=timeout)
+        finally:
+            stats.idle += time.perf_counter() - start
+
+    def _put(self, target, item, stats):
+        start = time.perf_counter()
+        target.put(item)
+        stats.blocked += time.perf_counter() - start
+
+    # Checks signatures a batch at a time. A spend without a key needs one the registry learnt from a mined block, a key
+    # that only came with another spend in the pipeline is not enough.
+    def run_verifier(self):
+        stats = self.stats["verify"]
+        registry = self.blockchain.registry
+        done = False
+        while not done:
+            batch = [self._get(self.intake, stats)]
+            while len(batch) < self.verify_batch:
+                try:
+                    batch.append(self.intake.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _DONE:
+                batch.pop()
+                done = True
+
+            start = time.perf_counter()
+            items, checked = [], []
+            for tx in batch:
+                public_key = tx.sender_public_key or registry.get(tx.sender)
+                if public_key is None or tx.signature is None or (tx.sender_public_key is not None and address_of(public_key) != tx.sender):
+                    self.rejected += 1
+                    continue
+                items.append((tx.message(), tx.signature, public_key))
+                checked.append(tx)
+
+            size = max(1, math.ceil(len(items) / self.verify_workers))
+            chunks = [items[i:i + size] for i in range(0, len(items), size)]
+            results = [ok for chunk_results in self.verify_pool.map(check_signatures, chunks) for ok in chunk_results]
+            accepted = []
+            for tx, ok in zip(checked, results):
+                if ok:
+                    accepted.append(tx)
+                else:
+                    self.rejected += 1
+            stats.busy += time.perf_counter() - start
+            stats.items += len(accepted)
+
+            for tx in accepted:
+                self._put(self.verified, tx, stats)
+        self._put(self.verified, _DONE, stats)
+
+    # Collects verified transactions into the next block. A block is handed over when it is full, or early when the
+    # miner is waiting for work, so the miner is not left idle while a block fills up.
+    def run_assembler(self):
+        stats = self.stats["assemble"]
+        pending = []
+        done = False
+        while not done or pending:
+            if not done and len(pending) < self.block_size:
+                wait = None if not pending else 0.005
+                try:
+                    item = self._get(self.verified, stats, timeout=wait)
+                    if item is _DONE:
+                        done = True
+                    else:
+                        pending.append(item)
+                    while len(pending) < self.block_size and not done:
+                        item = self.verified.get_nowait()
+                        if item is _DONE:
+                            done = True
+                        else:
+                            pending.append(item)
+                except queue.Empty:
+                    pass
+                if len(pending) < self.block_size and not done and not self.miner_waiting.is_set():
+                    continue
+
+            start = time.perf_counter()
+            transactions = pending[:self.block_size]
+            pending = pending[self.block_size:]
+            reward_transaction = Transaction(None, self.miner_address, self.blockchain.mining_reward + sum(tx.fee for tx in transactions))
+            # The height and previous_hash are not known until the block before it has been mined, so the miner fills them in
+            block = Block(None, transactions + [reward_transaction], None, self.miner_address, self.blockchain.mining_reward)
+            stats.busy += time.perf_counter() - start
+            stats.items += len(transactions)
+            self._put(self.templates, block, stats)
+        self._put(self.templates, _DONE, stats)
+
+    def run_miner(self):
+        stats = self.stats["mine"]
+        while True:
+            self.miner_waiting.set()
+            block = self._get(self.templates, stats)
+            self.miner_waiting.clear()
+            if block is _DONE:
+                break
+
+            start = time.perf_counter()
+            block.header.index = len(self.blockchain.chain)
+            self.blockchain.adjust_difficulty(block)
+            block.previous_hash = self.blockchain.get_latest_block().hash
+            nonce, block_hash = self.mining_pool.submit(find_nonce, block.header.prefix(), block.difficulty).result()
+            block.header.set_mined(nonce, block_hash)
+            block.seal()
+            # A refused block is not counted, and its transactions wait in the pool instead of being lost
+            if self.blockchain.append_mined_block(block) is not None:
+                self.refused += 1
+                self.blockchain.transaction_pool.extend(block.transactions[:-1])
+            else:
+                stats.items += len(block.transactions) - 1
+            stats.busy += time.perf_counter() - start
+
+
+# The Day-23 loop: admit everything, mine when a block's worth is waiting
+def run_sequential(blockchain, transactions, miner_address, block_size):
+    verifying = mining = 0.0
+    start = time.perf_counter()
+    for tx in transactions:
+        t0 = time.perf_counter()
+        blockchain.add_transaction_to_pool(tx)
+        verifying += time.perf_counter() - t0
+        if len(blockchain.transaction_pool) >= block_size:
+            t0 = time.perf_counter()
+            blockchain.mine_pending_transactions(miner_address, block_size)
+            mining += time.perf_counter() - t0
+    while blockchain.transaction_pool:
+        t0 = time.perf_counter()
+        blockchain.mine_pending_transactions(miner_address, block_size)
+        mining += time.perf_counter() - t0
+    return time.perf_counter() - start, verifying, mining
+
+
+def mined_count(blockchain):
+    return sum(len(block.transactions) - 1 for block in blockchain.chain[1:])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sequential against pipelined mining.")
+    parser.add_argument("--wallets", type=int, default=200)
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--block-size", type=int, default=500)
+    parser.add_argument("--difficulty", type=int, default=4)
+    parser.add_argument("--verify-workers", type=int, default=None, help="signature checking processes (default: number of CPUs)")
+    parser.add_argument("--seed", type=int, default=24)
+    parser.add_argument("--key-cache")
+    config = parser.parse_args()
+    print(f"{os.cpu_count()} CPU(s), {config.transactions} transactions, blocks of {config.block_size}, difficulty {config.difficulty}")
+
+    wallets = load_wallets(config.wallets, config.key_cache)
+    allocations = {wallet.address: 1_000_000 for wallet in wallets}
+    workload = PaymentWorkload(wallets, allocations, seed=config.seed)
+    start = time.perf_counter()
+    transactions = [workload.next_transaction() for _ in range(config.transactions)]
+    print(f"Signed the workload in {time.perf_counter() - start:.1f} s (not part of either run)")
+
+    # Sequential
+    sequential = blockchain = Blockchain(genesis_allocations=allocations, difficulty=config.difficulty)
+    wall_time, verifying, mining = run_sequential(blockchain, transactions, wallets[0].address, config.block_size)
+    print(f"\nSequential: {mined_count(blockchain)} transactions in {len(blockchain.chain) - 1} blocks, "
+          f"{wall_time:.2f} s, {mined_count(blockchain) / wall_time:.0f} tx/s")
+    print(f"  verifying {verifying / wall_time:.0%} of the time, mining {mining / wall_time:.0%}, "
+          f"so the miner sat idle for {1 - mining / wall_time:.0%}")
+    print("  Is blockchain valid?", blockchain.is_chain_valid())
+
+    # Pipelined
+    blockchain = Blockchain(genesis_allocations=allocations, difficulty=config.difficulty)
+    pipeline = MiningPipeline(blockchain, wallets[0].address, config.block_size, verify_workers=config.verify_workers)
+    pipeline.start()
+    for tx in transactions:
+        pipeline.submit(tx)
+    wall_time = pipeline.finish()
+    print(f"\nPipelined: {mined_count(blockchain)} transactions in {len(blockchain.chain) - 1} blocks, "
+          f"{wall_time:.2f} s, {mined_count(blockchain) / wall_time:.0f} tx/s ({pipeline.rejected} rejected, {pipeline.refused} blocks refused)")
+    print(f"  {'stage':<10} {'items':>7} {'busy':>7} {'idle':>7} {'blocked':>8}")
+    for stats in pipeline.stats.values():
+        print("  " + stats.row(wall_time))
+    print("  Is blockchain valid?", blockchain.is_chain_valid())
+    # Blocks are cut differently, so only the miner's balance can differ between the two runs
+    miner = wallets[0].address
+    print("  Same balances as the sequential run, apart from the miner:",
+          {a: v for a, v in blockchain.balances.items() if a != miner} == {a: v for a, v in sequential.balances.items() if a != miner})
+
+'''
+Sample Output (on a single CPU every stage shares one core, so the pipeline keeps the miner busy but cannot finish sooner;
+with more cores the verify workers run beside the miner and the verify share of the sequential run is saved):
+
+1 CPU(s), 10000 transactions, blocks of 500, difficulty 4
+Signed the workload in 7.7 s (not part of either run)
+
+Sequential: 10000 transactions in 20 blocks, 2.10 s, 4769 tx/s
+  verifying 27% of the time, mining 73%, so the miner sat idle for 27%
+  Is blockchain valid? True
+
+Pipelined: 10000 transactions in 22 blocks, 2.01 s, 4983 tx/s (0 rejected, 0 blocks refused)
+  stage        items    busy    idle  blocked
+  submit       10000      0%      0%      36%
+  verify       10000     48%      0%      16%
+  assemble     10000      0%      8%      83%
+  mine         10000     99%      1%       0%
+  Is blockchain valid? True
+  Same balances as the sequential run, apart from the miner: True
+'''
@@ -0,0 +1,753 @@
+'''
+Day-27:
+Learnt about batching payments. A transaction had one receiver and one amount, so paying 1,000 people took 1,000 RSA
+signatures, 1,000 verifications, and 1,000 copies of the sender address, fee and signature in the block.
+Implemented transactions with any number of outputs, all covered by one signature. The wallet, pool intake, fee
+accounting, balances and block hashing all work with outputs now; rewards and genesis allocations are simply transactions
+with one output. Also measured the signature work and bytes saved per recipient.
+'''
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import stat
+import time
+from collections import ChainMap
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+
+# Address of a public key: the first 20 bytes of the SHA-256 of its DER encoding, as 40 hex characters
+def address_of(public_key):
+    return hashlib.sha256(public_key.save_pkcs1(format="DER")).digest()[:20].hex()
+
+
+# Whether value is written the way address_of writes addresses: 40 lowercase hex characters
+def is_address(value):
+    return isinstance(value, str) and len(value) == 40 and all(c in "0123456789abcdef" for c in value)
+
+
+# KeyRegistry class remains the same as Day-25
+class KeyRegistry:
+    def __init__(self):
+        self.keys = {}  # Address -> public key
+        self.addresses = {}  # Address -> the one shared copy of that string
+
+    def intern(self, address):
+        if address is None:
+            return None
+        return self.addresses.setdefault(address, address)
+
+    def register(self, public_key):
+        address = self.intern(address_of(public_key))
+        self.keys.setdefault(address, public_key)
+        return address
+
+    def get(self, address):
+        return self.keys.get(address)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Transaction class from Day-25, but paying any number of outputs under one signature.
+# outputs is a tuple of (receiver address, amount) pairs.
+class Transaction:
+    def __init__(self, sender, outputs, fee=0, signature=None, sender_public_key=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender = sender  # None for mining rewards and genesis allocations
+        self.outputs = tuple((receiver, amount) for receiver, amount in outputs)
+        self.fee = fee  # Fee for miners, once per transaction however many outputs it has
+        self.signature = signature
+        self.sender_public_key = sender_public_key
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    # Total paid out, not counting the fee
+    @property
+    def amount(self):
+        return sum(amount for _, amount in self.outputs)
+
+    # The key is not part of the message, the sender address already commits to it.
+    # Written as compact JSON, so every receiver and amount is delimited and the outputs cannot be read two ways.
+    def message(self):
+        return json.dumps([self.sender, self.outputs, self.fee], separators=(",", ":")).encode()
+
+    def sign_transaction(self, private_key):
+        self.signature = rsa.sign(self.message(), private_key, 'SHA-256')
+        self.seal()
+
+    # Uses the key that came with the transaction, or the one the registry learnt from an earlier spend
+    def verify_transaction(self, registry):
+        if self.signature is None or self.sender is None:
+            return False
+        public_key = self.sender_public_key
+        if public_key is None:
+            public_key = registry.get(self.sender)
+            if public_key is None:
+                return False
+        elif address_of(public_key) != self.sender:
+            return False
+        try:
+            rsa.verify(self.message(), self.signature, public_key)
+            return True
+        except:
+            return False
+
+    # Reason the outputs are not acceptable, or None
+    def check_outputs(self):
+        if not self.outputs:
+            return "transaction has no outputs"
+        if any(amount <= 0 for _, amount in self.outputs) or self.fee < 0:
+            return "transaction has a negative amount or fee"
+        if not all(is_address(receiver) for receiver, _ in self.outputs):
+            return "transaction pays to something that is not an address"
+        return None
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        return hashlib.sha256(self.message() + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        data = {
+            "sender": self.sender,
+            "outputs": [[receiver, amount] for receiver, amount in self.outputs],
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+        if self.sender_public_key is not None:
+            data["sender_public_key"] = key_to_list(self.sender_public_key)
+        return data
+
+    # Transactions that arrive signed are sealed straight away. With a registry, the addresses are interned.
+    @staticmethod
+    def from_dict(data, registry=None):
+        intern = registry.intern if registry is not None else (lambda address: address)
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(intern(data["sender"]), [(intern(receiver), amount) for receiver, amount in data["outputs"]],
+                                  data["fee"], signature, key_from_list(data.get("sender_public_key")))
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        if len(self.outputs) == 1:
+            return f"{self.sender} -> {self.outputs[0][0]}: {self.amount} (Fee: {self.fee})"
+        return f"{self.sender} -> {len(self.outputs)} outputs: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-25
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "miner_address": self.miner_address,
+            "reward": self.reward,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    # Rebuilds a block received from a peer. The hash is worked out again from the header fields rather than trusted.
+    @staticmethod
+    def from_dict(data, registry=None):
+        transactions = [Transaction.from_dict(tx, registry) for tx in data["transactions"]]
+        block = Block(data["index"], transactions, data["previous_hash"], data["miner_address"], data["reward"], data["difficulty"])
+        block.header.timestamp = data["timestamp"]
+        block.header.merkle_root = data["merkle_root"]
+        block.header.nonce = data["nonce"]
+        block.seal()
+        return block
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same as Day-25, and can pay many receivers in one transaction
+class Wallet:
+    def __init__(self, keys=None):
+        self.public_key, self.private_key = keys or rsa.newkeys(512)
+        self.address = address_of(self.public_key)
+        self.key_published = False  # True once a spend carrying the key is in a block
+
+    def create_transaction(self, receiver, amount, fee=0):
+        return self.create_payout([(receiver, amount)], fee)
+
+    # outputs is a list of (receiver address, amount) pairs, all covered by one signature
+    def create_payout(self, outputs, fee=0):
+        sender_public_key = None if self.key_published else self.public_key
+        transaction = Transaction(self.address, outputs, fee, sender_public_key=sender_public_key)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+    # Nodes only learn keys from blocks, so a first spend that is dropped or still waiting does not publish the key
+    def on_block(self, block):
+        if not self.key_published:
+            self.key_published = any(tx.sender == self.address and tx.sender_public_key is not None for tx in block.transactions)
+
+
+# Loads count wallets from a file of PEM private keys, generating and saving any that are missing. The file holds
+# private keys, so only one that no one else can read is trusted, and a new one is created readable by its owner only.
+# Without a file the keys are generated and thrown away.
+def load_wallets(count, cache_path=None):
+    pems = []
+    if cache_path is not None and os.path.lexists(cache_path):
+        info = os.lstat(cache_path)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ValueError(f"{cache_path} must be a regular file that only its owner can read and write")
+        with open(cache_path) as f:
+            pems = json.load(f)
+    while len(pems) < count:
+        _, private_key = rsa.newkeys(512)
+        pems.append(private_key.save_pkcs1().decode())
+    if cache_path is not None:
+        fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(pems, f)
+
+    wallets = []
+    for pem in pems[:count]:
+        private_key = rsa.PrivateKey.load_pkcs1(pem.encode())
+        wallets.append(Wallet((rsa.PublicKey(private_key.n, private_key.e), private_key)))
+    return wallets
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender is None:
+        return "reward transaction found before the end of the block"
+    reason = tx.check_outputs()
+    if reason is not None:
+        return f"transaction {tx.txid().hex()[:16]}: {reason}"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender, 0)}"
+    balances[tx.sender] -= spent
+    credit_outputs(tx, balances)
+    return None
+
+
+# Apply the transactions of one block to a balances dict, keyed by address.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            credit_outputs(tx, balances)
+        return None
+
+    if not block.transactions or block.transactions[-1].sender is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    credit_outputs(reward_transaction, balances)
+    return None
+
+
+def credit_outputs(transaction, balances):
+    for receiver, amount in transaction.outputs:
+        balances[receiver] = balances.get(receiver, 0) + amount
+
+
+# Blockchain class remains the same as Day-25, with single-output rewards and allocations and a check of the outputs at pool intake
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None, difficulty=None, genesis_block=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.difficulty = difficulty  # Fixed difficulty, or None to adjust it to block_time_target
+        self.registry = KeyRegistry()
+        self.balances = {}  # Address -> coins
+        self.chain = [genesis_block or self.create_genesis_block(genesis_allocations or {})]
+        self.transaction_pool = []
+        apply_block_to_balances(self.chain[0], self.balances, self.mining_reward)
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, [(self.registry.intern(address), amount)]) for address, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, address):
+        return self.balances.get(address, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        for tx in new_block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        return None
+
+    # For blocks that were mined outside add_block, e.g. in another process.
+    # Returns the reason the block was refused, or None if it was added.
+    def append_mined_block(self, block):
+        changes = ChainMap({}, self.balances)
+        if not block.header.hash_matches_fields():
+            reason = "block hash does not match its header"
+        else:
+            reason = apply_block_to_balances(block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {block.index} was refused: {reason}")
+            return reason
+        self.chain.append(block)
+        self.balances.update(changes.maps[0])
+        for tx in block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = self.required_difficulty(self.get_latest_block(), new_block)
+
+    def required_difficulty(self, previous_block, block):
+        if self.difficulty is not None:
+            return self.difficulty
+        return expected_difficulty(previous_block, block.timestamp, self.block_time_target)
+
+    # A key that comes with a transaction is only used to check it. The registry learns keys from blocks, so spends
+    # without a key are only accepted once a spend carrying it has been mined, as a new node replaying the chain needs.
+    def add_transaction_to_pool(self, transaction):
+        if transaction.check_outputs() is None and transaction.verify_transaction(self.registry):
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than sinking the whole block.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    # Mines the oldest max_transactions transactions in the pool, or all of them
+    def mine_pending_transactions(self, miner_address, max_transactions=None):
+        transactions = self.select_transactions(max_transactions)
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, [(miner_address, self.mining_reward + total_fees)])
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# PaymentWorkload class remains the same as Day-25
+class PaymentWorkload:
+    FEE_LEVELS = [1, 2, 3, 5, 10, 25]
+    FEE_WEIGHTS = [40, 25, 15, 10, 7, 3]
+
+    def __init__(self, wallets, balances, seed=0, popularity_skew=1.1, median_amount=50):
+        self.random = random.Random(seed)
+        self.wallets = wallets
+        self.balances = dict(balances)  # The generator's own view, so it never overspends
+        # Zipf-like popularity, in a shuffled order so the busy wallets are not always the first ones
+        weights = [1 / (rank + 1) ** popularity_skew for rank in range(len(wallets))]
+        self.random.shuffle(weights)
+        self.weights = weights
+        self.amount_mu = math.log(median_amount)
+
+    def next_transaction(self):
+        while True:
+            sender, receiver = self.random.choices(self.wallets, self.weights, k=2)
+            if sender is receiver:
+                continue
+            amount = max(1, int(self.random.lognormvariate(self.amount_mu, 1.2)))
+            fee = self.random.choices(self.FEE_LEVELS, self.FEE_WEIGHTS)[0]
+            if self.balances.get(sender.address, 0) >= amount + fee:
+                break
+        self.balances[sender.address] -= amount + fee
+        self.balances[receiver.address] = self.balances.get(receiver.address, 0) + amount
+        return sender.create_transaction(receiver.address, amount, fee)
+
+
+def wire_size(transactions):
+    return sum(len(json.dumps(tx.to_dict())) for tx in transactions)
+
+
+# Pays every recipient through node, either with one transaction each or one transaction with all the outputs.
+# Returns the numbers for the report.
+def pay_out(node, payer, miner_address, recipients, batched):
+    t0 = time.perf_counter()
+    if batched:
+        transactions = [payer.create_payout([(address, 10 + i) for i, address in enumerate(recipients)], fee=len(recipients))]
+    else:
+        transactions = [payer.create_transaction(address, 10 + i, fee=1) for i, address in enumerate(recipients)]
+    t1 = time.perf_counter()
+    for tx in transactions:
+        node.add_transaction_to_pool(tx)
+    t2 = time.perf_counter()
+    block = node.mine_pending_transactions(miner_address)
+    t3 = time.perf_counter()
+    payer.on_block(block)
+    return {
+        "transactions": len(transactions),
+        "signing": t1 - t0,
+        "verifying": t2 - t1,
+        "mining": t3 - t2,
+        "bytes": wire_size(transactions),
+        "leaves": len(block.transactions),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One signature for many outputs against one signature per payment.")
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--key-cache")
+    config = parser.parse_args()
+
+    wallets = load_wallets(3, config.key_cache)
+    payer, miner, friend = wallets
+    # Receiving needs no key, so the recipients are just addresses
+    recipients = [hashlib.sha256(f"employee-{i}".encode()).digest()[:20].hex() for i in range(config.recipients)]
+    allocations = {payer.address: 100_000_000, friend.address: 1_000}
+
+    results = {}
+    for batched in (False, True):
+        # A new node has not seen the payer's key yet
+        node = Blockchain(genesis_allocations=allocations, difficulty=2)
+        payer.key_published = False
+        results[batched] = pay_out(node, payer, miner.address, recipients, batched)
+        balances = {address: node.get_balance(address) for address in recipients}
+        results[batched]["balances"] = balances
+        results[batched]["payer"] = node.get_balance(payer.address)
+        results[batched]["miner"] = node.get_balance(miner.address)
+        print(f"{'One payout transaction' if batched else 'One transaction per recipient'}: "
+              f"is blockchain valid? {node.is_chain_valid()}")
+
+    single, multi = results[False], results[True]
+    n = config.recipients
+    print(f"\nPaying {n} recipients")
+    print(f"{'':<26} {'per recipient tx':>17} {'one payout tx':>14} {'saved':>7}")
+    for label, key, scale, unit in (("signatures", "transactions", 1, ""),
+                                    ("signing per recipient", "signing", 1e6 / n, " us"),
+                                    ("verifying per recipient", "verifying", 1e6 / n, " us"),
+                                    ("mining the block", "mining", 1e3, " ms"),
+                                    ("bytes per recipient", "bytes", 1 / n, ""),
+                                    ("Merkle leaves", "leaves", 1, "")):
+        before, after = single[key] * scale, multi[key] * scale
+        print(f"{label:<26} {before:>14.1f}{unit:<3} {after:>11.1f}{unit:<3} {1 - after / before:>6.0%}")
+    print("Same amounts received:", single["balances"] == multi["balances"])
+    print(f"Payer ends with {single['payer']} and {multi['payer']}, miner with {single['miner']} and {multi['miner']} (same total fee both ways)")
+
+    # Changing any output breaks the one signature
+    node = Blockchain(genesis_allocations=allocations, difficulty=2)
+    payer.key_published = False
+    payout = payer.create_payout([(friend.address, 5), (recipients[0], 7)], fee=2)
+    data = payout.to_dict()
+    data["outputs"][1][0] = miner.address
+    print("\nPayout with a redirected output:")
+    node.add_transaction_to_pool(Transaction.from_dict(data))
+    signed = Transaction(payer.address, [(friend.address, 12)], 2, sender_public_key=payer.public_key)
+    signed.sign_transaction(payer.private_key)
+    rewritten = Transaction(payer.address, [(friend.address + "1", 2)], 2, signed.signature, payer.public_key)
+    print(f"Payout rewritten from 12 to {friend.address[:8]}... into 2 to {friend.address[:8]}...1: "
+          f"signature valid? {rewritten.verify_transaction(node.registry)}, outputs: {rewritten.check_outputs()}")
+    print("Payout with an empty output list:")
+    node.add_transaction_to_pool(payer.create_payout([], fee=1))
+    node.add_transaction_to_pool(payout)
+    node.add_transaction_to_pool(friend.create_transaction(payer.address, 100, fee=1))
+    node.mine_pending_transactions(miner.address)
+    print("Block with a payout and a plain payment:", node.get_latest_block().transactions)
+    print(f"Balances: friend {node.get_balance(friend.address)}, {recipients[0][:8]}... {node.get_balance(recipients[0])}, "
+          f"miner {node.get_balance(miner.address)}")
+
+'''
+Sample Output:
+
+One transaction per recipient: is blockchain valid? True
+One payout transaction: is blockchain valid? True
+
+Paying 1000 recipients
+                            per recipient tx  one payout tx   saved
+signatures                         1000.0            1.0      100%
+signing per recipient               960.3 us         2.8 us   100%
+verifying per recipient             113.1 us         3.8 us    97%
+mining the block                     73.3 ms         8.6 ms    88%
+bytes per recipient                 458.9           51.3       89%
+Merkle leaves                      1001.0            2.0      100%
+Same amounts received: True
+Payer ends with 99489500 and 99489500, miner with 1050 and 1050 (same total fee both ways)
+
+Payout with a redirected output:
+Transaction is invalid and was not added to the pool.
+Payout rewritten from 12 to e719bee3... into 2 to e719bee3...1: signature valid? False, outputs: transaction pays to something that is not an address
+Payout with an empty output list:
+Transaction is invalid and was not added to the pool.
+Block with a payout and a plain payment: (835ca664e0710853bf53dea83ac3736dd4109d6d -> 2 outputs: 12 (Fee: 2), e719bee31d81ab807b43be3f9a559f0b69061a2e -> 835ca664e0710853bf53dea83ac3736dd4109d6d: 100 (Fee: 1), None -> 1f7bb9774f417bef739e4e99cd5eb101df14e4b5: 53 (Fee: 0))
+Balances: friend 904, 8fe08882... 7, miner 53
+'''
@@ -0,0 +1,928 @@
+'''
+Day-28:
+Learnt about fee estimation. Wallets had to guess the fee they passed to create_transaction, so they either overpaid or
+sent transactions that sat in the pool for many blocks.
+Implemented a streaming fee estimator. Fee rates (fee per 1000 bytes) go into fixed buckets that are 1.2 times apart.
+For the last 100 blocks it keeps, per bucket, how many blocks each mined transaction waited, and for the pool how many
+transactions of each bucket are waiting and since when. Admitting a transaction and adding a block update those counts
+directly and the oldest block drops out of the window, so nothing is ever rescanned. After each block, a small table of
+"lowest fee rate that got in within N blocks" is rebuilt from the buckets; a query reads that table and the pool
+buckets, which takes the same time however long the chain or the pool is. Miners now fill blocks by fee rate.
+'''
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import stat
+import time
+from collections import ChainMap, Counter, deque
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+# Bytes in a signature made with a 512 bit RSA key
+SIGNATURE_SIZE = 64
+
+
+# Address of a public key: the first 20 bytes of the SHA-256 of its DER encoding, as 40 hex characters
+def address_of(public_key):
+    return hashlib.sha256(public_key.save_pkcs1(format="DER")).digest()[:20].hex()
+
+
+# Whether value is written the way address_of writes addresses: 40 lowercase hex characters
+def is_address(value):
+    return isinstance(value, str) and len(value) == 40 and all(c in "0123456789abcdef" for c in value)
+
+
+# KeyRegistry class remains the same as Day-27
+class KeyRegistry:
+    def __init__(self):
+        self.keys = {}  # Address -> public key
+        self.addresses = {}  # Address -> the one shared copy of that string
+
+    def intern(self, address):
+        if address is None:
+            return None
+        return self.addresses.setdefault(address, address)
+
+    def register(self, public_key):
+        address = self.intern(address_of(public_key))
+        self.keys.setdefault(address, public_key)
+        return address
+
+    def get(self, address):
+        return self.keys.get(address)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Transaction class remains the same as Day-27, and knows its size and fee rate
+class Transaction:
+    def __init__(self, sender, outputs, fee=0, signature=None, sender_public_key=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender = sender  # None for mining rewards and genesis allocations
+        self.outputs = tuple((receiver, amount) for receiver, amount in outputs)
+        self.fee = fee  # Fee for miners, once per transaction however many outputs it has
+        self.signature = signature
+        self.sender_public_key = sender_public_key
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    # Total paid out, not counting the fee
+    @property
+    def amount(self):
+        return sum(amount for _, amount in self.outputs)
+
+    # The key is not part of the message, the sender address already commits to it.
+    # Written as compact JSON, so every receiver and amount is delimited and the outputs cannot be read two ways.
+    def message(self):
+        return json.dumps([self.sender, self.outputs, self.fee], separators=(",", ":")).encode()
+
+    def sign_transaction(self, private_key):
+        self.signature = rsa.sign(self.message(), private_key, 'SHA-256')
+        self.seal()
+
+    # Uses the key that came with the transaction, or the one the registry learnt from an earlier spend
+    def verify_transaction(self, registry):
+        if self.signature is None or self.sender is None:
+            return False
+        public_key = self.sender_public_key
+        if public_key is None:
+            public_key = registry.get(self.sender)
+            if public_key is None:
+                return False
+        elif address_of(public_key) != self.sender:
+            return False
+        try:
+            rsa.verify(self.message(), self.signature, public_key)
+            return True
+        except:
+            return False
+
+    # Bytes the transaction takes up: the signed message, the signature and, on a first spend, the key
+    def size(self):
+        key_size = len(self.sender_public_key.save_pkcs1(format="DER")) if self.sender_public_key is not None else 0
+        return len(self.message()) + SIGNATURE_SIZE + key_size
+
+    # Fee per 1000 bytes
+    def fee_rate(self):
+        return self.fee * 1000 / self.size()
+
+    # Reason the outputs are not acceptable, or None
+    def check_outputs(self):
+        if not self.outputs:
+            return "transaction has no outputs"
+        if any(amount <= 0 for _, amount in self.outputs) or self.fee < 0:
+            return "transaction has a negative amount or fee"
+        if not all(is_address(receiver) for receiver, _ in self.outputs):
+            return "transaction pays to something that is not an address"
+        return None
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        return hashlib.sha256(self.message() + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        data = {
+            "sender": self.sender,
+            "outputs": [[receiver, amount] for receiver, amount in self.outputs],
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+        if self.sender_public_key is not None:
+            data["sender_public_key"] = key_to_list(self.sender_public_key)
+        return data
+
+    # Transactions that arrive signed are sealed straight away. With a registry, the addresses are interned.
+    @staticmethod
+    def from_dict(data, registry=None):
+        intern = registry.intern if registry is not None else (lambda address: address)
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(intern(data["sender"]), [(intern(receiver), amount) for receiver, amount in data["outputs"]],
+                                  data["fee"], signature, key_from_list(data.get("sender_public_key")))
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        if len(self.outputs) == 1:
+            return f"{self.sender} -> {self.outputs[0][0]}: {self.amount} (Fee: {self.fee})"
+        return f"{self.sender} -> {len(self.outputs)} outputs: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "difficulty", "nonce", "_hash", "_sealed", "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-27
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "miner_address": self.miner_address,
+            "reward": self.reward,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    # Rebuilds a block received from a peer. The hash is worked out again from the header fields rather than trusted.
+    @staticmethod
+    def from_dict(data, registry=None):
+        transactions = [Transaction.from_dict(tx, registry) for tx in data["transactions"]]
+        block = Block(data["index"], transactions, data["previous_hash"], data["miner_address"], data["reward"], data["difficulty"])
+        block.header.timestamp = data["timestamp"]
+        block.header.merkle_root = data["merkle_root"]
+        block.header.nonce = data["nonce"]
+        block.seal()
+        return block
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same as Day-27
+class Wallet:
+    def __init__(self, keys=None):
+        self.public_key, self.private_key = keys or rsa.newkeys(512)
+        self.address = address_of(self.public_key)
+        self.key_published = False  # True once a spend carrying the key is in a block
+
+    def create_transaction(self, receiver, amount, fee=0):
+        return self.create_payout([(receiver, amount)], fee)
+
+    # outputs is a list of (receiver address, amount) pairs, all covered by one signature
+    def create_payout(self, outputs, fee=0):
+        sender_public_key = None if self.key_published else self.public_key
+        transaction = Transaction(self.address, outputs, fee, sender_public_key=sender_public_key)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+    # Nodes only learn keys from blocks, so a first spend that is dropped or still waiting does not publish the key
+    def on_block(self, block):
+        if not self.key_published:
+            self.key_published = any(tx.sender == self.address and tx.sender_public_key is not None for tx in block.transactions)
+
+
+# Loads count wallets from a file of PEM private keys, generating and saving any that are missing. The file holds
+# private keys, so only one that no one else can read is trusted, and a new one is created readable by its owner only.
+# Without a file the keys are generated and thrown away.
+def load_wallets(count, cache_path=None):
+    pems = []
+    if cache_path is not None and os.path.lexists(cache_path):
+        info = os.lstat(cache_path)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ValueError(f"{cache_path} must be a regular file that only its owner can read and write")
+        with open(cache_path) as f:
+            pems = json.load(f)
+    while len(pems) < count:
+        _, private_key = rsa.newkeys(512)
+        pems.append(private_key.save_pkcs1().decode())
+    if cache_path is not None:
+        fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(pems, f)
+
+    wallets = []
+    for pem in pems[:count]:
+        private_key = rsa.PrivateKey.load_pkcs1(pem.encode())
+        wallets.append(Wallet((rsa.PublicKey(private_key.n, private_key.e), private_key)))
+    return wallets
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender is None:
+        return "reward transaction found before the end of the block"
+    reason = tx.check_outputs()
+    if reason is not None:
+        return f"transaction {tx.txid().hex()[:16]}: {reason}"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender, 0)}"
+    balances[tx.sender] -= spent
+    credit_outputs(tx, balances)
+    return None
+
+
+# Apply the transactions of one block to a balances dict, keyed by address.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins and are not checked
+    if block.index == 0:
+        for tx in block.transactions:
+            credit_outputs(tx, balances)
+        return None
+
+    if not block.transactions or block.transactions[-1].sender is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    credit_outputs(reward_transaction, balances)
+    return None
+
+
+def credit_outputs(transaction, balances):
+    for receiver, amount in transaction.outputs:
+        balances[receiver] = balances.get(receiver, 0) + amount
+
+
+# Streaming fee estimator over the last window blocks and the transaction pool.
+# Fee rates go into buckets spacing times apart from min_rate up, so finding a bucket is one logarithm, and every
+# count below is kept per bucket: updating them takes a fixed amount of work per transaction and per block.
+class FeeEstimator:
+    def __init__(self, block_size, window=100, max_target=12, min_rate=1, max_rate=10_000, spacing=1.2,
+                 success_rate=0.85, min_samples=10):
+        self.block_size = block_size  # Transactions a block holds
+        self.window = window  # Blocks of history kept
+        self.max_target = max_target  # Largest "within N blocks" answered
+        self.min_rate = min_rate
+        self.spacing = spacing
+        self.success_rate = success_rate  # Share of a bucket's transactions that must make it in time
+        self.min_samples = min_samples  # Fewer transactions than this are grouped with the next bucket down
+        # Bucket 0 holds everything below min_rate, the last bucket everything above max_rate
+        self.num_buckets = int(math.log(max_rate / min_rate, spacing)) + 2
+        self.bucket_rates = [0] + [min_rate * spacing ** i for i in range(self.num_buckets - 1)]  # Lowest rate in each bucket
+
+        self.pool = {}  # txid -> (bucket, height the transaction arrived at)
+        self.pool_counts = [0] * self.num_buckets
+        # (bucket, arrival height) -> pool transactions. Arrivals more than max_target blocks ago share height -1.
+        self.pool_arrivals = Counter()
+        self.folded_height = -1  # Arrival heights up to this one are counted under -1
+
+        # Per block in the window, a Counter of (bucket, blocks waited) for the transactions it confirmed.
+        # Waits above max_target are all counted as max_target + 1.
+        self.history = deque()
+        self.confirmed = [[0] * (max_target + 2) for _ in range(self.num_buckets)]  # Sum of history, per bucket and wait
+
+        self.table = [math.inf] * (max_target + 1)  # Rate estimated from history, per target
+        self.tip_height = 0
+
+    def bucket_of(self, fee_rate):
+        if fee_rate < self.min_rate:
+            return 0
+        return min(self.num_buckets - 1, 1 + int(math.log(fee_rate / self.min_rate, self.spacing)))
+
+    def _arrival_key(self, bucket, height):
+        return (bucket, height if height > self.folded_height else -1)
+
+    # A transaction was accepted into the pool while the tip was at height
+    def on_admit(self, transaction, height):
+        txid = transaction.txid()
+        if txid in self.pool:
+            return
+        bucket = self.bucket_of(transaction.fee_rate())
+        self.pool[txid] = (bucket, height)
+        self.pool_counts[bucket] += 1
+        self.pool_arrivals[self._arrival_key(bucket, height)] += 1
+
+    # A transaction left the pool without being mined, e.g. because it can no longer be paid for
+    def on_evict(self, transaction):
+        self._remove(transaction.txid())
+
+    # Takes a transaction out of the pool counts. Returns its (bucket, arrival height), or None if it was not there.
+    def _remove(self, txid):
+        entry = self.pool.pop(txid, None)
+        if entry is not None:
+            bucket, height = entry
+            self.pool_counts[bucket] -= 1
+            key = self._arrival_key(bucket, height)
+            self.pool_arrivals[key] -= 1
+            if self.pool_arrivals[key] == 0:
+                del self.pool_arrivals[key]
+        return entry
+
+    # Moves the block's transactions from the pool into the history, drops the oldest block, then rebuilds the table
+    def on_block(self, block):
+        confirmed = Counter()
+        for tx in block.transactions:
+            entry = self._remove(tx.txid())
+            if entry is None:
+                continue  # Reward transaction, or a transaction this node never had in its pool
+            bucket, height = entry
+            waited = min(block.index - height, self.max_target + 1)
+            confirmed[(bucket, waited)] += 1
+            self.confirmed[bucket][waited] += 1
+
+        self.history.append(confirmed)
+        if len(self.history) > self.window:
+            for (bucket, waited), count in self.history.popleft().items():
+                self.confirmed[bucket][waited] -= count
+
+        # Anything that has already waited max_target blocks is late for every target, so its exact height no longer matters
+        self.tip_height = block.index
+        while self.folded_height < self.tip_height - self.max_target:
+            self.folded_height += 1
+            for bucket in range(self.num_buckets):
+                count = self.pool_arrivals.pop((bucket, self.folded_height), 0)
+                if count:
+                    self.pool_arrivals[(bucket, -1)] += count
+        self.refresh()
+
+    # For each target, walks the buckets from the highest rate down, in groups of at least min_samples transactions.
+    # A group passes if success_rate of it was mined within the target; still waiting in the pool past the target counts
+    # as a failure. The estimate is the lowest rate of the last group that passed before one failed.
+    def refresh(self):
+        # late[bucket][n]: pool transactions that have waited at least n blocks
+        late = [[0] * (self.max_target + 2) for _ in range(self.num_buckets)]
+        for (bucket, height), count in self.pool_arrivals.items():
+            waited = self.max_target + 1 if height == -1 else min(self.tip_height - height, self.max_target + 1)
+            late[bucket][waited] += count
+        for counts in late:
+            for waited in range(self.max_target, -1, -1):
+                counts[waited] += counts[waited + 1]
+
+        totals = [sum(counts) for counts in self.confirmed]
+        for target in range(1, self.max_target + 1):
+            estimate = math.inf
+            in_time = seen = 0
+            for bucket in range(self.num_buckets - 1, -1, -1):
+                confirmed = self.confirmed[bucket]
+                in_time += sum(confirmed[1:target + 1])
+                seen += totals[bucket] + late[bucket][target]
+                if seen < self.min_samples:
+                    continue
+                if in_time / seen < self.success_rate:
+                    break
+                estimate = self.bucket_rates[bucket]
+                in_time = seen = 0
+            self.table[target] = estimate
+
+    # Fee rate that would have been enough to be mined within target_blocks blocks, and that also outbids
+    # target_blocks blocks' worth of what is in the pool right now. Reads the table and the pool buckets only.
+    def estimate_fee_rate(self, target_blocks):
+        target_blocks = max(1, min(target_blocks, self.max_target))
+        ahead = 0
+        pool_rate = 0
+        for bucket in range(self.num_buckets - 1, -1, -1):
+            ahead += self.pool_counts[bucket]
+            if ahead >= target_blocks * self.block_size:
+                pool_rate = self.bucket_rates[min(bucket + 1, self.num_buckets - 1)]
+                break
+        history_rate = self.table[target_blocks]
+        if history_rate == math.inf:
+            history_rate = self.bucket_rates[-1]  # Nothing got in reliably yet, so bid the top bucket
+        return max(history_rate, pool_rate)
+
+
+# Blockchain class remains the same as Day-27, but fills blocks by fee rate and keeps a fee estimator up to date
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None, difficulty=None, genesis_block=None,
+                 block_size=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.difficulty = difficulty  # Fixed difficulty, or None to adjust it to block_time_target
+        self.block_size = block_size  # Most transactions in a mined block, or None for no limit
+        self.fee_estimator = FeeEstimator(block_size or 1000)
+        self.registry = KeyRegistry()
+        self.balances = {}  # Address -> coins
+        self.chain = [genesis_block or self.create_genesis_block(genesis_allocations or {})]
+        self.transaction_pool = []
+        apply_block_to_balances(self.chain[0], self.balances, self.mining_reward)
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, [(self.registry.intern(address), amount)]) for address, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, address):
+        return self.balances.get(address, 0)
+
+    # The balance changes go to an overlay first, so a block that does not apply is refused and leaves them as they were.
+    # Setting previous_hash and difficulty after that only marks the header dirty, nothing is hashed until mining.
+    # Returns the reason, or None if the block was added.
+    def add_block(self, new_block):
+        changes = ChainMap({}, self.balances)
+        reason = apply_block_to_balances(new_block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes.maps[0])
+        for tx in new_block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        self.fee_estimator.on_block(new_block)
+        return None
+
+    # For blocks that were mined outside add_block, e.g. in another process.
+    # Returns the reason the block was refused, or None if it was added.
+    def append_mined_block(self, block):
+        changes = ChainMap({}, self.balances)
+        if not block.header.hash_matches_fields():
+            reason = "block hash does not match its header"
+        else:
+            reason = apply_block_to_balances(block, changes, self.mining_reward)
+        if reason is not None:
+            print(f"Block {block.index} was refused: {reason}")
+            return reason
+        self.chain.append(block)
+        self.balances.update(changes.maps[0])
+        for tx in block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        self.fee_estimator.on_block(block)
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = self.required_difficulty(self.get_latest_block(), new_block)
+
+    def required_difficulty(self, previous_block, block):
+        if self.difficulty is not None:
+            return self.difficulty
+        return expected_difficulty(previous_block, block.timestamp, self.block_time_target)
+
+    # A key that comes with a transaction is only used to check it. The registry learns keys from blocks, so spends
+    # without a key are only accepted once a spend carrying it has been mined, as a new node replaying the chain needs.
+    def add_transaction_to_pool(self, transaction):
+        if transaction.check_outputs() is None and transaction.verify_transaction(self.registry):
+            self.transaction_pool.append(transaction)
+            self.fee_estimator.on_admit(transaction, self.get_latest_block().index)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Reorders the pool by fee rate, highest first, in passes: a transaction that spends coins the balances only get from
+    # another pool transaction waits for the pass after that one, so a high-fee child never goes ahead of its parent.
+    # A transaction that cannot be paid even after every other one is dropped from the pool and from the fee estimator.
+    # Returns the first max_transactions transactions of the new order.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        ordered, waiting = [], sorted(self.transaction_pool, key=lambda tx: tx.fee_rate(), reverse=True)
+        while waiting:
+            skipped = []
+            for tx in waiting:
+                if apply_transaction_to_balances(tx, pending) is None:
+                    ordered.append(tx)
+                else:
+                    skipped.append(tx)
+            if len(skipped) == len(waiting):
+                break
+            waiting = skipped
+        for tx in waiting:
+            print(f"Transaction dropped from the pool: {apply_transaction_to_balances(tx, pending)}")
+            self.fee_estimator.on_evict(tx)
+        self.transaction_pool = ordered
+        return ordered[:max_transactions]
+
+    # Mines the max_transactions transactions paying the highest fee rates, or the whole pool.
+    # Equal rates keep their pool order, so older transactions go first, and parents always go before their children.
+    def mine_pending_transactions(self, miner_address, max_transactions=None):
+        max_transactions = max_transactions or self.block_size
+        transactions = self.select_transactions(max_transactions)
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, [(miner_address, self.mining_reward + total_fees)])
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    # Fee a transaction of size bytes should pay to be mined within target_blocks blocks
+    def estimate_fee(self, target_blocks, size):
+        return max(1, math.ceil(self.fee_estimator.estimate_fee_rate(target_blocks) * size / 1000))
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Payments whose fee rates follow a lognormal around median_rate, arriving a little faster than blocks can take them
+# in busy periods and slower in quiet ones. Every amount is different, so no two transactions share a txid.
+class FeeWorkload:
+    def __init__(self, wallets, block_size, seed=0, median_rate=100, period=40):
+        self.random = random.Random(seed)
+        self.wallets = wallets
+        self.block_size = block_size
+        self.rate_mu = math.log(median_rate)
+        self.period = period
+        self.sequence = 0
+
+    def arrivals(self, height):
+        demand = 1 + 0.5 * math.sin(2 * math.pi * height / self.period)
+        return int(self.block_size * demand * self.random.uniform(0.85, 1.15))
+
+    def next_payment(self):
+        sender, receiver = self.random.sample(self.wallets, 2)
+        self.sequence += 1
+        amount = 1000 + self.sequence
+        size = Transaction(sender.address, [(receiver.address, amount)], 100).size()
+        fee = max(1, round(self.random.lognormvariate(self.rate_mu, 0.8) * size / 1000))
+        return sender, receiver, amount, fee
+
+
+# Fee for a payment to be mined within target blocks. The fee is part of the signed message, so size it twice.
+def estimated_payment(node, sender, receiver, amount, target):
+    fee = node.estimate_fee(target, Transaction(sender.address, [(receiver.address, amount)], 0).size())
+    fee = node.estimate_fee(target, Transaction(sender.address, [(receiver.address, amount)], fee).size())
+    return sender.create_transaction(receiver.address, amount, fee)
+
+
+# What an estimator has to do without running counts: sort every fee rate in the last window blocks
+def naive_fee_rate(node, window=100, quantile=0.5):
+    rates = sorted(tx.fee_rate() for block in node.chain[-window:] for tx in block.transactions if tx.sender is not None)
+    return rates[int(quantile * (len(rates) - 1))] if rates else 0
+
+
+def query_micros(function, repeat=2000):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def run_block(node, workload, miner_address):
+    for _ in range(workload.arrivals(len(node.chain))):
+        sender, receiver, amount, fee = workload.next_payment()
+        node.add_transaction_to_pool(sender.create_transaction(receiver.address, amount, fee))
+    block = node.mine_pending_transactions(miner_address)
+    for wallet in workload.wallets:
+        wallet.on_block(block)
+    return block
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate the fee for a transaction to be mined within N blocks.")
+    parser.add_argument("--block-size", type=int, default=50)
+    parser.add_argument("--warm-up", type=int, default=150, help="blocks mined before the estimates are used")
+    parser.add_argument("--blocks", type=int, default=120, help="blocks during which estimated fees are tried")
+    parser.add_argument("--wallets", type=int, default=20)
+    parser.add_argument("--key-cache")
+    config = parser.parse_args()
+
+    wallets = load_wallets(config.wallets + 1, config.key_cache)
+    miner, users = wallets[0], wallets[1:]
+    node = Blockchain(genesis_allocations={wallet.address: 10 ** 12 for wallet in users}, difficulty=2,
+                      block_size=config.block_size)
+    workload = FeeWorkload(users, config.block_size)
+    estimator = node.fee_estimator
+
+    targets = [1, 2, 3, 6, 12]
+    timings = []
+    t0 = time.perf_counter()
+    for height in range(1, config.warm_up + 1):
+        run_block(node, workload, miner.address)
+        if height in (10, config.warm_up):
+            timings.append((len(node.chain), len(node.transaction_pool),
+                            query_micros(lambda: estimator.estimate_fee_rate(6)), query_micros(lambda: naive_fee_rate(node), 20)))
+    print(f"Warm-up: {config.warm_up} blocks of at most {config.block_size} transactions in {time.perf_counter() - t0:.1f}s, "
+          f"{len(node.transaction_pool)} transactions waiting")
+
+    typical_size = Transaction(users[0].address, [(users[1].address, 12345)], 99).size()
+    print(f"\nEstimates for a {typical_size} byte payment:")
+    for target in targets:
+        print(f"  within {target:>2} blocks: {estimator.estimate_fee_rate(target):>7.1f} per kB, fee {node.estimate_fee(target, typical_size)}")
+
+    # One tracked payment per target each block, paying the estimated fee, plus one paying a fixed fee of 1
+    tracked = []  # (txid, target, height sent, fee)
+    mined_at = {}
+    for _ in range(config.blocks + max(targets)):
+        height = node.get_latest_block().index
+        if height <= config.warm_up + config.blocks:
+            for target in targets + [None]:
+                sender, receiver, amount, _ = workload.next_payment()
+                if target is None:
+                    tx = sender.create_transaction(receiver.address, amount, 1)
+                else:
+                    tx = estimated_payment(node, sender, receiver, amount, target)
+                node.add_transaction_to_pool(tx)
+                tracked.append((tx.txid(), target, height, tx.fee))
+        block = run_block(node, workload, miner.address)
+        for tx in block.transactions:
+            mined_at[tx.txid()] = block.index
+    timings.append((len(node.chain), len(node.transaction_pool),
+                    query_micros(lambda: estimator.estimate_fee_rate(6)), query_micros(lambda: naive_fee_rate(node), 20)))
+
+    print(f"\nPayments sent at the estimated fee over {config.blocks} blocks (the fixed fee is judged against 6 blocks):")
+    print(f"{'target':>12} {'mined in time':>14} {'median wait':>12} {'average fee':>12}")
+    for target in targets + [None]:
+        rows = [(txid, sent, fee) for txid, t, sent, fee in tracked if t == target]
+        waits = sorted(mined_at[txid] - sent if txid in mined_at else math.inf for txid, sent, _ in rows)
+        within = target or 6
+        label = f"{target} blocks" if target else "fixed fee 1"
+        in_time = sum(wait <= within for wait in waits) / len(waits)
+        print(f"{label:>12} {in_time:>14.0%} {waits[len(waits) // 2]:>12} "
+              f"{sum(fee for _, _, fee in rows) / len(rows):>12.1f}")
+
+    print("\nQuery time as the chain and pool grow:")
+    print(f"{'blocks':>8} {'pool':>6} {'estimator':>12} {'sort last 100 blocks':>22}")
+    for blocks, pool, fast, naive in timings:
+        print(f"{blocks:>8} {pool:>6} {fast:>9.1f} us {naive:>19.1f} us")
+    print("Is blockchain valid?", node.is_chain_valid())
+
+'''
+Sample Output:
+
+Warm-up: 150 blocks of at most 50 transactions in 9.5s, 107 transactions waiting
+
+Estimates for a 164 byte payment:
+  within  1 blocks:    79.5 per kB, fee 14
+  within  2 blocks:    79.5 per kB, fee 14
+  within  3 blocks:    66.2 per kB, fee 11
+  within  6 blocks:    66.2 per kB, fee 11
+  within 12 blocks:    66.2 per kB, fee 11
+
+Payments sent at the estimated fee over 120 blocks (the fixed fee is judged against 6 blocks):
+      target  mined in time  median wait  average fee
+    1 blocks            95%            1         13.8
+    2 blocks            96%            1         13.3
+    3 blocks            88%            1         12.5
+    6 blocks            82%            1         11.5
+   12 blocks            83%            1         10.8
+ fixed fee 1             0%          inf          1.0
+
+Query time as the chain and pool grow:
+  blocks   pool    estimator   sort last 100 blocks
+      11    206       3.2 us              2923.3 us
+     151    107       5.6 us             32940.2 us
+     283    544       4.8 us             34481.4 us
+Is blockchain valid? True
+'''
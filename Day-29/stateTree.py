@@ -0,0 +1,942 @@
+'''
+Day-29:
+Learnt about state commitments. Headers committed to the transactions through the Merkle root but not to the balances
+they lead to, so checking a balance meant replaying the chain, and a node could not prove one to anybody.
+Implemented a compact sparse Merkle tree of balances keyed by address, with its root in every block header. Each
+account sits where its path stops being shared with any other, so the tree is about log2(accounts) deep. A block only
+rebuilds the nodes on the paths of the accounts it changes and shares everything else with the previous tree. Also
+implemented balance proofs (and proofs that an account does not exist) that a light client checks against a header,
+and a benchmark of the update cost as the tree grows to millions of accounts.
+'''
+
+import argparse
+import bisect
+import gc
+import hashlib
+import json
+import os
+import random
+import resource
+import stat
+import time
+from collections import ChainMap
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+
+# Address of a public key: the first 20 bytes of the SHA-256 of its DER encoding, as 40 hex characters
+def address_of(public_key):
+    return hashlib.sha256(public_key.save_pkcs1(format="DER")).digest()[:20].hex()
+
+
+# Whether value is written the way address_of writes addresses: 40 lowercase hex characters
+def is_address(value):
+    return isinstance(value, str) and len(value) == 40 and all(c in "0123456789abcdef" for c in value)
+
+
+# KeyRegistry class remains the same as Day-27
+class KeyRegistry:
+    def __init__(self):
+        self.keys = {}  # Address -> public key
+        self.addresses = {}  # Address -> the one shared copy of that string
+
+    def intern(self, address):
+        if address is None:
+            return None
+        return self.addresses.setdefault(address, address)
+
+    def register(self, public_key):
+        address = self.intern(address_of(public_key))
+        self.keys.setdefault(address, public_key)
+        return address
+
+    def get(self, address):
+        return self.keys.get(address)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Transaction class remains the same as Day-27
+class Transaction:
+    def __init__(self, sender, outputs, fee=0, signature=None, sender_public_key=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender = sender  # None for mining rewards and genesis allocations
+        self.outputs = tuple((receiver, amount) for receiver, amount in outputs)
+        self.fee = fee  # Fee for miners, once per transaction however many outputs it has
+        self.signature = signature
+        self.sender_public_key = sender_public_key
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    # Total paid out, not counting the fee
+    @property
+    def amount(self):
+        return sum(amount for _, amount in self.outputs)
+
+    # The key is not part of the message, the sender address already commits to it.
+    # Written as compact JSON, so every receiver and amount is delimited and the outputs cannot be read two ways.
+    def message(self):
+        return json.dumps([self.sender, self.outputs, self.fee], separators=(",", ":")).encode()
+
+    def sign_transaction(self, private_key):
+        self.signature = rsa.sign(self.message(), private_key, 'SHA-256')
+        self.seal()
+
+    # Uses the key that came with the transaction, or the one the registry learnt from an earlier spend
+    def verify_transaction(self, registry):
+        if self.signature is None or self.sender is None:
+            return False
+        public_key = self.sender_public_key
+        if public_key is None:
+            public_key = registry.get(self.sender)
+            if public_key is None:
+                return False
+        elif address_of(public_key) != self.sender:
+            return False
+        try:
+            rsa.verify(self.message(), self.signature, public_key)
+            return True
+        except:
+            return False
+
+    # Reason the outputs are not acceptable, or None
+    def check_outputs(self):
+        if not self.outputs:
+            return "transaction has no outputs"
+        if any(amount <= 0 for _, amount in self.outputs) or self.fee < 0:
+            return "transaction has a negative amount or fee"
+        if not all(is_address(receiver) for receiver, _ in self.outputs):
+            return "transaction pays to something that is not an address"
+        return None
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        return hashlib.sha256(self.message() + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        data = {
+            "sender": self.sender,
+            "outputs": [[receiver, amount] for receiver, amount in self.outputs],
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+        if self.sender_public_key is not None:
+            data["sender_public_key"] = key_to_list(self.sender_public_key)
+        return data
+
+    # Transactions that arrive signed are sealed straight away. With a registry, the addresses are interned.
+    @staticmethod
+    def from_dict(data, registry=None):
+        intern = registry.intern if registry is not None else (lambda address: address)
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(intern(data["sender"]), [(intern(receiver), amount) for receiver, amount in data["outputs"]],
+                                  data["fee"], signature, key_from_list(data.get("sender_public_key")))
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        if len(self.outputs) == 1:
+            return f"{self.sender} -> {self.outputs[0][0]}: {self.amount} (Fee: {self.fee})"
+        return f"{self.sender} -> {len(self.outputs)} outputs: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, state_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{state_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# Block header with a lazily computed, cached hash, now committing to the balances after the block as well.
+# Changing a field to a new value drops the cached hash, and once sealed no field can change at all.
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "state_root", "difficulty", "nonce", "_hash", "_sealed",
+                 "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0, state_root=""):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.state_root = state_root  # Root of the state tree once the block's transactions are applied
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.state_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.state_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.state_root, self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-27, with the state root in its header
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def state_root(self):
+        return self.header.state_root
+
+    @state_root.setter
+    def state_root(self, value):
+        self.header.state_root = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "state_root": self.state_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "miner_address": self.miner_address,
+            "reward": self.reward,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    # Rebuilds a block received from a peer. The hash is worked out again from the header fields rather than trusted.
+    @staticmethod
+    def from_dict(data, registry=None):
+        transactions = [Transaction.from_dict(tx, registry) for tx in data["transactions"]]
+        block = Block(data["index"], transactions, data["previous_hash"], data["miner_address"], data["reward"], data["difficulty"])
+        block.header.timestamp = data["timestamp"]
+        block.header.merkle_root = data["merkle_root"]
+        block.header.state_root = data["state_root"]
+        block.header.nonce = data["nonce"]
+        block.seal()
+        return block
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"State Root: {self.state_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same as Day-27
+class Wallet:
+    def __init__(self, keys=None):
+        self.public_key, self.private_key = keys or rsa.newkeys(512)
+        self.address = address_of(self.public_key)
+        self.key_published = False  # True once a spend carrying the key is in a block
+
+    def create_transaction(self, receiver, amount, fee=0):
+        return self.create_payout([(receiver, amount)], fee)
+
+    # outputs is a list of (receiver address, amount) pairs, all covered by one signature
+    def create_payout(self, outputs, fee=0):
+        sender_public_key = None if self.key_published else self.public_key
+        transaction = Transaction(self.address, outputs, fee, sender_public_key=sender_public_key)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+    # Nodes only learn keys from blocks, so a first spend that is dropped or still waiting does not publish the key
+    def on_block(self, block):
+        if not self.key_published:
+            self.key_published = any(tx.sender == self.address and tx.sender_public_key is not None for tx in block.transactions)
+
+
+# Loads count wallets from a file of PEM private keys, generating and saving any that are missing. The file holds
+# private keys, so only one that no one else can read is trusted, and a new one is created readable by its owner only.
+# Without a file the keys are generated and thrown away.
+def load_wallets(count, cache_path=None):
+    pems = []
+    if cache_path is not None and os.path.lexists(cache_path):
+        info = os.lstat(cache_path)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ValueError(f"{cache_path} must be a regular file that only its owner can read and write")
+        with open(cache_path) as f:
+            pems = json.load(f)
+    while len(pems) < count:
+        _, private_key = rsa.newkeys(512)
+        pems.append(private_key.save_pkcs1().decode())
+    if cache_path is not None:
+        fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(pems, f)
+
+    wallets = []
+    for pem in pems[:count]:
+        private_key = rsa.PrivateKey.load_pkcs1(pem.encode())
+        wallets.append(Wallet((rsa.PublicKey(private_key.n, private_key.e), private_key)))
+    return wallets
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict, keyed by address.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender is None:
+        return "reward transaction found before the end of the block"
+    reason = tx.check_outputs()
+    if reason is not None:
+        return f"transaction {tx.txid().hex()[:16]}: {reason}"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender, 0)}"
+    balances[tx.sender] -= spent
+    credit_outputs(tx, balances)
+    return None
+
+
+# Apply the transactions of one block to a balances dict, keyed by address.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins, only their receivers are checked
+    if block.index == 0:
+        for tx in block.transactions:
+            reason = tx.check_outputs()
+            if reason is not None:
+                return f"genesis allocation: {reason}"
+            credit_outputs(tx, balances)
+        return None
+
+    if not block.transactions or block.transactions[-1].sender is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    reason = reward_transaction.check_outputs()
+    if reason is not None:
+        return f"reward transaction: {reason}"
+    credit_outputs(reward_transaction, balances)
+    return None
+
+
+def credit_outputs(transaction, balances):
+    for receiver, amount in transaction.outputs:
+        balances[receiver] = balances.get(receiver, 0) + amount
+
+
+# Bits in an address, which is also the depth of a full binary tree over all addresses
+KEY_BITS = 160
+
+# Hash standing in for a subtree with no accounts in it
+EMPTY_HASH = bytes(32)
+
+
+# Leaves and branches are hashed with different first bytes, so one can never pass for the other
+def leaf_hash(key, balance):
+    return hashlib.sha256(b"\x00" + key.to_bytes(20, "big") + balance.to_bytes(16, "big")).digest()
+
+
+def branch_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+# Bit of key that picks the child at depth: 0 for left, 1 for right
+def key_bit(key, depth):
+    return (key >> (KEY_BITS - 1 - depth)) & 1
+
+
+class StateLeaf:
+    __slots__ = ("key", "balance", "hash")
+
+    def __init__(self, key, balance):
+        StateTree.hash_computations += 1
+        self.key = key
+        self.balance = balance
+        self.hash = leaf_hash(key, balance)
+
+
+class StateBranch:
+    __slots__ = ("left", "right", "hash")
+
+    def __init__(self, left, right):
+        StateTree.hash_computations += 1
+        self.left = left
+        self.right = right
+        self.hash = branch_hash(left.hash if left else EMPTY_HASH, right.hash if right else EMPTY_HASH)
+
+
+# Applies items, a sorted list of (key, balance), to the subtree node at depth and returns the new subtree.
+# Untouched children are shared with the old subtree. added[0] counts the accounts that were not there before.
+def _update_subtree(node, depth, items, added):
+    if not items:
+        return node
+    if isinstance(node, StateLeaf):
+        index = bisect.bisect_left(items, node.key, key=lambda item: item[0])
+        if index < len(items) and items[index][0] == node.key:
+            if len(items) == 1:
+                return StateLeaf(node.key, items[0][1])
+        else:
+            items = items[:index] + [(node.key, node.balance)] + items[index:]
+        added[0] -= 1  # The leaf is built again below and would otherwise be counted as new
+        node = None
+    if node is None:
+        if len(items) == 1:
+            added[0] += 1
+            return StateLeaf(*items[0])
+        left, right = None, None
+    else:
+        left, right = node.left, node.right
+    # Within a subtree the keys share their first depth bits, so sorted keys have all the 0 bits before the 1 bits
+    split = bisect.bisect_left(items, 1, key=lambda item: key_bit(item[0], depth))
+    return StateBranch(_update_subtree(left, depth + 1, items[:split], added),
+                       _update_subtree(right, depth + 1, items[split:], added))
+
+
+# Compact sparse Merkle tree of balances keyed by address.
+# An account sits at the first depth where no other account shares its path, so a tree of n random addresses is about
+# log2(n) deep rather than 160. Updating never changes a node: it builds new nodes along the changed paths and shares
+# everything else, so the tree of an earlier block stays valid and the root hash comes from the new nodes only.
+class StateTree:
+    # How many leaf and branch hashes were computed, by all trees
+    hash_computations = 0
+
+    def __init__(self, root=None, size=0):
+        self.root = root
+        self.size = size  # Accounts in the tree
+
+    def root_hash(self):
+        return (self.root.hash if self.root else EMPTY_HASH).hex()
+
+    # The tree with changes, a dict of address -> balance, applied. All the changes share one pass down the tree.
+    def updated(self, changes):
+        items = sorted((int(address, 16), balance) for address, balance in changes.items())
+        added = [0]
+        root = _update_subtree(self.root, 0, items, added)
+        return StateTree(root, self.size + added[0])
+
+    def get(self, address):
+        key = int(address, 16)
+        node, depth = self.root, 0
+        while isinstance(node, StateBranch):
+            node = node.right if key_bit(key, depth) else node.left
+            depth += 1
+        return node.balance if node is not None and node.key == key else None
+
+    # Sibling hashes from the root down to where address is, or would be. The path ends at the account's own leaf,
+    # at an empty subtree, or at another account's leaf, which shows that address is not in the tree.
+    def prove(self, address):
+        key = int(address, 16)
+        node, siblings, depth = self.root, [], 0
+        while isinstance(node, StateBranch):
+            if key_bit(key, depth):
+                sibling, node = node.left, node.right
+            else:
+                sibling, node = node.right, node.left
+            siblings.append(sibling.hash.hex() if sibling else None)
+            depth += 1
+        leaf = [format(node.key, "040x"), node.balance] if node is not None else None
+        return {"siblings": siblings, "leaf": leaf}
+
+
+# Checks that address has balance (None for "no account") in the state committed to by state_root,
+# using only the proof. This is all a light client needs next to a block header.
+def verify_balance_proof(state_root, address, balance, proof):
+    key = int(address, 16)
+    siblings, leaf = proof["siblings"], proof["leaf"]
+    if len(siblings) > KEY_BITS:
+        return False
+    if balance is not None:
+        if leaf is None or int(leaf[0], 16) != key or leaf[1] != balance:
+            return False
+    elif leaf is not None:
+        other = int(leaf[0], 16)
+        # Another account only proves absence if it sits on address's own path
+        if other == key or (other ^ key) >> (KEY_BITS - len(siblings)) != 0:
+            return False
+
+    node_hash = leaf_hash(int(leaf[0], 16), leaf[1]) if leaf is not None else EMPTY_HASH
+    for depth in range(len(siblings) - 1, -1, -1):
+        sibling = bytes.fromhex(siblings[depth]) if siblings[depth] else EMPTY_HASH
+        node_hash = branch_hash(sibling, node_hash) if key_bit(key, depth) else branch_hash(node_hash, sibling)
+    return node_hash.hex() == state_root
+
+
+# Bytes of a proof when empty siblings are sent as a bitmap rather than as hashes
+def proof_size(proof):
+    hashes = sum(1 for sibling in proof["siblings"] if sibling is not None)
+    return 1 + (len(proof["siblings"]) + 7) // 8 + 32 * hashes + (36 if proof["leaf"] is not None else 0)
+
+
+# Balance changes a block would make, without touching balances: the writes land in a dict of their own.
+# Returns (reason the block is invalid or None, changes).
+def block_balance_changes(block, balances, mining_reward):
+    changes = {}
+    reason = apply_block_to_balances(block, ChainMap(changes, balances), mining_reward)
+    return reason, changes
+
+
+# Blockchain class remains the same as Day-27, but keeps the balances in a state tree whose root goes into every header
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None, difficulty=None, genesis_block=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.difficulty = difficulty  # Fixed difficulty, or None to adjust it to block_time_target
+        self.registry = KeyRegistry()
+        self.balances = {}  # Address -> coins
+        self.state = StateTree()  # The same balances, as a Merkle tree
+        self.transaction_pool = []
+        self.chain = []
+        self.append_mined_block(genesis_block or self.create_genesis_block(genesis_allocations or {}))
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, [(self.registry.intern(address), amount)]) for address, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        reason, changes = block_balance_changes(genesis_block, self.balances, self.mining_reward)
+        if reason is not None:
+            raise ValueError(reason)
+        genesis_block.state_root = self.state.updated(changes).root_hash()
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.chain[-1]
+
+    def get_balance(self, address):
+        return self.balances.get(address, 0)
+
+    # Setting previous_hash, difficulty and state_root only marks the header dirty, nothing is hashed until mining.
+    # Only the accounts the block changes are written to the state tree.
+    # Returns the reason the block was refused, or None if it was added.
+    def add_block(self, new_block):
+        reason, changes = block_balance_changes(new_block, self.balances, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        self.adjust_difficulty(new_block)
+        new_block.previous_hash = self.get_latest_block().hash
+        state = self.state.updated(changes)
+        new_block.state_root = state.root_hash()
+        new_block.mine_block()
+        self.chain.append(new_block)
+        self.balances.update(changes)
+        for tx in new_block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        self.state = state
+        return None
+
+    # For blocks that were mined outside add_block, e.g. in another process.
+    # Returns the reason the block was refused, or None if it was added.
+    def append_mined_block(self, block):
+        if not block.header.hash_matches_fields():
+            return f"block {block.index} hash does not match its header"
+        reason, changes = block_balance_changes(block, self.balances, self.mining_reward)
+        if reason is not None:
+            return reason
+        state = self.state.updated(changes)
+        if state.root_hash() != block.state_root:
+            return f"block {block.index} commits to state root {block.state_root[:16]} but its transactions give {state.root_hash()[:16]}"
+        self.chain.append(block)
+        self.balances.update(changes)
+        for tx in block.transactions:
+            if tx.sender_public_key is not None:
+                self.registry.register(tx.sender_public_key)
+        self.state = state
+        return None
+
+    def adjust_difficulty(self, new_block):
+        new_block.difficulty = self.required_difficulty(self.get_latest_block(), new_block)
+
+    def required_difficulty(self, previous_block, block):
+        if self.difficulty is not None:
+            return self.difficulty
+        return expected_difficulty(previous_block, block.timestamp, self.block_time_target)
+
+    # A key that comes with a transaction is only used to check it. The registry learns keys from blocks, so spends
+    # without a key are only accepted once a spend carrying it has been mined, as a new node replaying the chain needs.
+    def add_transaction_to_pool(self, transaction):
+        if transaction.check_outputs() is None and transaction.verify_transaction(self.registry):
+            self.transaction_pool.append(transaction)
+        else:
+            print("Transaction is invalid and was not added to the pool.")
+
+    # Up to max_transactions transactions from the front of the pool, in order, that the balances can pay for.
+    # A transaction that cannot be paid is dropped from the pool rather than holding up every block after it.
+    def select_transactions(self, max_transactions=None):
+        pending = ChainMap({}, self.balances)
+        selected, dropped = [], set()
+        for tx in self.transaction_pool:
+            if max_transactions is not None and len(selected) == max_transactions:
+                break
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                dropped.add(id(tx))
+        if dropped:
+            self.transaction_pool = [tx for tx in self.transaction_pool if id(tx) not in dropped]
+        return selected
+
+    # Mines the oldest max_transactions transactions in the pool that can be paid for, or all of them
+    def mine_pending_transactions(self, miner_address, max_transactions=None):
+        transactions = self.select_transactions(max_transactions)
+        if len(transactions) > 0:
+            total_fees = sum(tx.fee for tx in transactions)
+            reward_transaction = Transaction(None, [(miner_address, self.mining_reward + total_fees)])
+
+            new_block = Block(len(self.chain), transactions + [reward_transaction], self.get_latest_block().hash, miner_address, self.mining_reward)
+
+            # A refused block leaves the pool as it was
+            if self.add_block(new_block) is not None:
+                return None
+            self.transaction_pool = self.transaction_pool[len(transactions):]
+            return new_block
+        else:
+            print("No transactions to mine!")
+
+    # Proof of an address's current balance against the state root in the latest header
+    def prove_balance(self, address):
+        return self.state.prove(address)
+
+    def is_chain_valid(self):
+        for i in range(1, len(self.chain)):
+            current_block = self.chain[i]
+            previous_block = self.chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Random addresses with random balances, the same ones for the same seed
+def random_accounts(count, rng):
+    return {format(rng.getrandbits(KEY_BITS), "040x"): rng.randint(1, 10 ** 9) for _ in range(count)}
+
+
+# Builds a tree of account_count accounts, then times blocks that each change touched accounts, a few of them new
+def benchmark_state_tree(account_count, touched=400, blocks=20, seed=0):
+    rng = random.Random(seed)
+    accounts = random_accounts(account_count, rng)
+    addresses = list(accounts)
+
+    # Tree nodes never form reference cycles, so the cycle collector would only keep walking millions of them.
+    # Freezing moves the built tree out of its sight for the rest of the run.
+    gc.disable()
+    t0 = time.perf_counter()
+    tree = StateTree().updated(accounts)
+    build_time = time.perf_counter() - t0
+    gc.freeze()
+    gc.enable()
+    del accounts
+
+    update_time = 0
+    hashes = StateTree.hash_computations
+    for _ in range(blocks):
+        changes = {address: rng.randint(1, 10 ** 9) for address in rng.sample(addresses, touched - touched // 40)}
+        changes.update(random_accounts(touched // 40, rng))
+        t0 = time.perf_counter()
+        tree = tree.updated(changes)
+        update_time += time.perf_counter() - t0
+    hashes = StateTree.hash_computations - hashes
+
+    state_root = tree.root_hash()
+    samples = rng.sample(addresses, 200)
+    proofs = [(address, tree.get(address), tree.prove(address)) for address in samples]
+    t0 = time.perf_counter()
+    verified = all(verify_balance_proof(state_root, address, balance, proof) for address, balance, proof in proofs)
+    verify_time = (time.perf_counter() - t0) / len(proofs)
+    gc.unfreeze()
+    return {
+        "accounts": tree.size,
+        "build": build_time,
+        "update": update_time / blocks,
+        "hashes": hashes / blocks,
+        "path": sum(len(proof["siblings"]) for _, _, proof in proofs) / len(proofs),
+        "proof_bytes": sum(proof_size(proof) for _, _, proof in proofs) / len(proofs),
+        "verify": verify_time,
+        "verified": verified,
+        "rss": peak_rss_mb(),
+    }
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Balances in a Merkle tree committed to by every block header.")
+    parser.add_argument("--sizes", default="10000,100000,1000000,3000000", help="comma separated account counts to benchmark")
+    parser.add_argument("--touched", type=int, default=400, help="accounts changed by each benchmark block")
+    parser.add_argument("--key-cache")
+    config = parser.parse_args()
+
+    alice, bob, carol, miner = load_wallets(4, config.key_cache)
+    node = Blockchain(genesis_allocations={alice.address: 1000, bob.address: 500}, difficulty=2)
+    node.add_transaction_to_pool(alice.create_payout([(bob.address, 100), (carol.address, 50)], fee=2))
+    alice.on_block(node.mine_pending_transactions(miner.address))
+    node.add_transaction_to_pool(bob.create_transaction(carol.address, 30, fee=1))
+    bob.on_block(node.mine_pending_transactions(miner.address))
+    for block in node.chain:
+        print(f"Block {block.index}: state root {block.state_root[:16]}..., {len(block.transactions)} transactions")
+    print("Is blockchain valid?", node.is_chain_valid())
+
+    # A light client only has the headers, and asks a full node for a balance and its proof
+    header_root = node.get_latest_block().state_root
+    proof = node.prove_balance(carol.address)
+    print(f"\nCarol's balance is {node.get_balance(carol.address)}, proof of {len(proof['siblings'])} siblings, {proof_size(proof)} bytes")
+    print("Proof checks out against the latest header:", verify_balance_proof(header_root, carol.address, 80, proof))
+    print("Same proof claiming a balance of 800:", verify_balance_proof(header_root, carol.address, 800, proof))
+    print("Same proof against block 1's header:", verify_balance_proof(node.chain[1].state_root, carol.address, 80, proof))
+    stranger = hashlib.sha256(b"stranger").digest()[:20].hex()
+    print("Stranger has no account:", verify_balance_proof(header_root, stranger, None, node.prove_balance(stranger)))
+    print("Carol has no account:", verify_balance_proof(header_root, carol.address, None, proof))
+
+    # A peer replays the blocks and refuses one whose header claims a different state
+    peer = Blockchain(genesis_block=node.chain[0], difficulty=2)
+    print("\nPeer adds block 1:", peer.append_mined_block(Block.from_dict(node.chain[1].to_dict())) or "ok")
+    data = node.chain[2].to_dict()
+    data["state_root"] = node.chain[1].state_root
+    print("Peer adds block 2 with a stale state root:", peer.append_mined_block(Block.from_dict(data)))
+
+    # The state tree is keyed by address, so anything else is kept out of the pool and out of blocks
+    print("\nPayment to something that is not an address:")
+    node.add_transaction_to_pool(alice.create_transaction("not-an-address", 10, fee=1))
+    node.add_transaction_to_pool(alice.create_transaction(bob.address, 10, fee=1))
+    print("Block paying its reward to 41 hex characters:", node.mine_pending_transactions("0" * 41))
+    print(f"Transactions still in the pool: {len(node.transaction_pool)}, is blockchain valid? {node.is_chain_valid()}")
+
+    # Two spends that each fit the balance but not together: the second one is dropped instead of stalling the pool
+    spend = node.get_balance(carol.address) * 9 // 10
+    print(f"\nCarol spends {spend} twice from a balance of {node.get_balance(carol.address)}:")
+    node.add_transaction_to_pool(carol.create_transaction(bob.address, spend - 1, fee=1))
+    node.add_transaction_to_pool(carol.create_transaction(alice.address, spend - 1, fee=1))
+    block = node.mine_pending_transactions(miner.address)
+    print(f"Block {block.index} mined with {len(block.transactions) - 1} transactions, {len(node.transaction_pool)} left in the pool")
+
+    print(f"\nUpdating the state tree, {config.touched} accounts changed per block:")
+    print(f"{'accounts':>10} {'full build':>11} {'per block':>10} {'hashes/block':>13} {'path':>5} "
+          f"{'proof':>8} {'verify':>8} {'peak RSS':>9}")
+    for size in (int(size) for size in config.sizes.split(",")):
+        result = benchmark_state_tree(size, config.touched)
+        print(f"{result['accounts']:>10,} {result['build']:>9.2f} s {result['update'] * 1e3:>7.1f} ms "
+              f"{result['hashes']:>13,.0f} {result['path']:>5.1f} {result['proof_bytes']:>6.0f} B "
+              f"{result['verify'] * 1e6:>5.0f} us {result['rss']:>6.0f} MB" + ("" if result["verified"] else " PROOFS FAILED"))
+
+'''
+Sample Output:
+
+Block 0: state root 3bd3dff8df9e4339..., 2 transactions
+Block 1: state root c21dc1b77eeae12b..., 2 transactions
+Block 2: state root f1fccc2b3d7d6753..., 2 transactions
+Is blockchain valid? True
+
+Carol's balance is 80, proof of 2 siblings, 102 bytes
+Proof checks out against the latest header: True
+Same proof claiming a balance of 800: False
+Same proof against block 1's header: False
+Stranger has no account: True
+Carol has no account: False
+
+Peer adds block 1: ok
+Peer adds block 2 with a stale state root: block 2 commits to state root c21dc1b77eeae12b but its transactions give f1fccc2b3d7d6753
+
+Payment to something that is not an address:
+Transaction is invalid and was not added to the pool.
+Block 3 was refused: reward transaction: transaction pays to something that is not an address
+Block paying its reward to 41 hex characters: None
+Transactions still in the pool: 1, is blockchain valid? True
+
+Carol spends 72 twice from a balance of 80:
+Transaction dropped from the pool: transaction 8aff9bc008564e8f spends 72 but the sender only has 8
+Block 3 mined with 2 transactions, 0 left in the pool
+
+Updating the state tree, 400 accounts changed per block:
+  accounts  full build  per block  hashes/block  path    proof   verify  peak RSS
+    10,200      0.05 s     7.5 ms         2,857  14.5    475 B    14 us     28 MB
+   100,200      0.56 s    10.8 ms         4,182  17.6    577 B    17 us     84 MB
+ 1,000,200      6.51 s    16.0 ms         5,511  21.1    689 B    20 us    640 MB
+ 3,000,200     19.09 s    19.7 ms         6,148  22.8    739 B    22 us   1908 MB
+'''
@@ -0,0 +1,995 @@
+'''
+Day-30:
+Learnt about sharing a blockchain between threads. Blockchain changed chain and transaction_pool with no locks at all,
+and mine_pending_transactions replaced the pool with a slice of itself after mining, which silently dropped every
+transaction that arrived while the block was being mined.
+Implemented a thread-safe core. The latest block and the balances after it (the state tree, which never changes once
+built) form an immutable tip snapshot that readers use without any lock. The pool is a dict behind its own short lock:
+miners copy a template out and later remove exactly the transactions their block included. Blocks are prepared and
+mined against a snapshot with no lock held, and only swapping in the new tip takes a lock, refusing blocks whose tip
+has moved on. Also wrote a stress test that checks nothing is lost or mined twice under heavy contention.
+'''
+
+import argparse
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import stat
+import sys
+import threading
+import time
+from collections import ChainMap, Counter, deque
+import rsa
+
+# Sentinel for "attribute not set yet"
+_MISSING = object()
+
+
+# Address of a public key: the first 20 bytes of the SHA-256 of its DER encoding, as 40 hex characters
+def address_of(public_key):
+    return hashlib.sha256(public_key.save_pkcs1(format="DER")).digest()[:20].hex()
+
+
+# Whether value is written the way address_of writes addresses: 40 lowercase hex characters
+def is_address(value):
+    return isinstance(value, str) and len(value) == 40 and all(c in "0123456789abcdef" for c in value)
+
+
+# KeyRegistry class remains the same as Day-29. It only calls setdefault on dicts, which threads can share.
+class KeyRegistry:
+    def __init__(self):
+        self.keys = {}  # Address -> public key
+        self.addresses = {}  # Address -> the one shared copy of that string
+
+    def intern(self, address):
+        if address is None:
+            return None
+        return self.addresses.setdefault(address, address)
+
+    def register(self, public_key):
+        address = self.intern(address_of(public_key))
+        self.keys.setdefault(address, public_key)
+        return address
+
+    def get(self, address):
+        return self.keys.get(address)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Transaction class remains the same as Day-29
+class Transaction:
+    def __init__(self, sender, outputs, fee=0, signature=None, sender_public_key=None):
+        object.__setattr__(self, "_sealed", False)
+        self.sender = sender  # None for mining rewards and genesis allocations
+        self.outputs = tuple((receiver, amount) for receiver, amount in outputs)
+        self.fee = fee  # Fee for miners, once per transaction however many outputs it has
+        self.signature = signature
+        self.sender_public_key = sender_public_key
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Transaction {self.txid().hex()[:16]} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    # Total paid out, not counting the fee
+    @property
+    def amount(self):
+        return sum(amount for _, amount in self.outputs)
+
+    # The key is not part of the message, the sender address already commits to it.
+    # Written as compact JSON, so every receiver and amount is delimited and the outputs cannot be read two ways.
+    def message(self):
+        return json.dumps([self.sender, self.outputs, self.fee], separators=(",", ":")).encode()
+
+    def sign_transaction(self, private_key):
+        self.signature = rsa.sign(self.message(), private_key, 'SHA-256')
+        self.seal()
+
+    # Uses the key that came with the transaction, or the one the registry learnt from an earlier spend
+    def verify_transaction(self, registry):
+        if self.signature is None or self.sender is None:
+            return False
+        public_key = self.sender_public_key
+        if public_key is None:
+            public_key = registry.get(self.sender)
+            if public_key is None:
+                return False
+        elif address_of(public_key) != self.sender:
+            return False
+        try:
+            rsa.verify(self.message(), self.signature, public_key)
+            return True
+        except:
+            return False
+
+    # Reason the outputs are not acceptable, or None
+    def check_outputs(self):
+        if not self.outputs:
+            return "transaction has no outputs"
+        if any(amount <= 0 for _, amount in self.outputs) or self.fee < 0:
+            return "transaction has a negative amount or fee"
+        if not all(is_address(receiver) for receiver, _ in self.outputs):
+            return "transaction pays to something that is not an address"
+        return None
+
+    def seal(self):
+        if not self._sealed:
+            self._txid = self._calculate_txid()
+            self._sealed = True
+
+    def txid(self):
+        return self._txid if self._sealed else self._calculate_txid()
+
+    def _calculate_txid(self):
+        return hashlib.sha256(self.message() + (self.signature or b"")).digest()
+
+    def to_dict(self):
+        data = {
+            "sender": self.sender,
+            "outputs": [[receiver, amount] for receiver, amount in self.outputs],
+            "fee": self.fee,
+            "signature": self.signature.hex() if self.signature else None,
+        }
+        if self.sender_public_key is not None:
+            data["sender_public_key"] = key_to_list(self.sender_public_key)
+        return data
+
+    # Transactions that arrive signed are sealed straight away. With a registry, the addresses are interned.
+    @staticmethod
+    def from_dict(data, registry=None):
+        intern = registry.intern if registry is not None else (lambda address: address)
+        signature = bytes.fromhex(data["signature"]) if data["signature"] else None
+        transaction = Transaction(intern(data["sender"]), [(intern(receiver), amount) for receiver, amount in data["outputs"]],
+                                  data["fee"], signature, key_from_list(data.get("sender_public_key")))
+        if signature is not None:
+            transaction.seal()
+        return transaction
+
+    def __repr__(self):
+        if len(self.outputs) == 1:
+            return f"{self.sender} -> {self.outputs[0][0]}: {self.amount} (Fee: {self.fee})"
+        return f"{self.sender} -> {len(self.outputs)} outputs: {self.amount} (Fee: {self.fee})"
+
+
+def key_to_list(public_key):
+    if public_key is None:
+        return None
+    return [public_key.n, public_key.e]
+
+
+def key_from_list(data):
+    if data is None:
+        return None
+    return rsa.PublicKey(data[0], data[1])
+
+
+# Hash two child nodes into their parent node
+def hash_pair(left, right):
+    return hashlib.sha256(left + right).digest()
+
+
+# Merkle root of a list of transaction ids. An odd node out is paired with itself.
+def merkle_root(txids):
+    if not txids:
+        return hashlib.sha256(b"").hexdigest()
+    level = list(txids)
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def calculate_header_hash(index, timestamp, previous_hash, merkle_root, state_root, difficulty, nonce):
+    hash_data = f"{index}{timestamp}{previous_hash}{merkle_root}{state_root}{difficulty}{nonce}"
+    return hashlib.sha256(hash_data.encode()).hexdigest()
+
+
+# BlockHeader class remains the same as Day-29
+class BlockHeader:
+    __slots__ = ("index", "timestamp", "previous_hash", "merkle_root", "state_root", "difficulty", "nonce", "_hash", "_sealed",
+                 "_checked")
+
+    # How many times a header hash was really computed (mining not included)
+    hash_computations = 0
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, difficulty, nonce=0, state_root=""):
+        object.__setattr__(self, "_sealed", False)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_checked", False)
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self.state_root = state_root  # Root of the state tree once the block's transactions are applied
+        self.difficulty = difficulty
+        self.nonce = nonce
+
+    def __setattr__(self, name, value):
+        if self._sealed:
+            raise AttributeError(f"Block {self.index} is sealed, its header cannot be changed")
+        if getattr(self, name, _MISSING) != value:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, "_hash", None)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            BlockHeader.hash_computations += 1
+            object.__setattr__(self, "_hash", calculate_header_hash(self.index, self.timestamp, self.previous_hash,
+                                                                    self.merkle_root, self.state_root, self.difficulty, self.nonce))
+        return self._hash
+
+    # Everything the miner hashes before the nonce
+    def prefix(self):
+        return f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.state_root}{self.difficulty}"
+
+    # The miner already hashed the winning nonce, so keep that hash instead of computing it again
+    def set_mined(self, nonce, block_hash):
+        self.nonce = nonce
+        object.__setattr__(self, "_hash", block_hash)
+
+    # Hashes the fields again, whatever hash is cached: set_mined takes the miner's word for it.
+    # A sealed header cannot change, so once it has passed it is not hashed again.
+    def hash_matches_fields(self):
+        if self._checked:
+            return True
+        BlockHeader.hash_computations += 1
+        matches = self.hash == calculate_header_hash(self.index, self.timestamp, self.previous_hash, self.merkle_root,
+                                                     self.state_root, self.difficulty, self.nonce)
+        object.__setattr__(self, "_checked", matches and self._sealed)
+        return matches
+
+    def seal(self):
+        object.__setattr__(self, "_sealed", True)
+
+    def is_sealed(self):
+        return self._sealed
+
+    # Unpickling restores the slots through __setattr__, which a sealed header refuses, so restore them directly
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+# Block class remains the same as Day-29
+class Block:
+    def __init__(self, index, transactions, previous_hash, miner_address, reward, difficulty=2):
+        self.transactions = transactions  # List of transactions, a tuple once sealed
+        self.miner_address = miner_address  # Address of the miner
+        self.reward = reward  # Mining reward
+        # No hash here, the header hashes itself the first time someone asks for it
+        self.header = BlockHeader(index, time.time(), previous_hash, merkle_root([tx.txid() for tx in transactions]), difficulty)
+        self.body_checked = False
+
+    # Once the header is sealed the block refuses changes as well, so its transactions cannot be swapped out
+    def __setattr__(self, name, value):
+        if "header" in self.__dict__ and self.header.is_sealed():
+            raise AttributeError(f"Block {self.index} is sealed and cannot be changed")
+        object.__setattr__(self, name, value)
+
+    index = property(lambda self: self.header.index)
+    timestamp = property(lambda self: self.header.timestamp)
+    merkle_root = property(lambda self: self.header.merkle_root)
+    nonce = property(lambda self: self.header.nonce)
+    hash = property(lambda self: self.header.hash)
+
+    @property
+    def previous_hash(self):
+        return self.header.previous_hash
+
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self.header.previous_hash = value
+
+    @property
+    def state_root(self):
+        return self.header.state_root
+
+    @state_root.setter
+    def state_root(self, value):
+        self.header.state_root = value
+
+    @property
+    def difficulty(self):
+        return self.header.difficulty
+
+    @difficulty.setter
+    def difficulty(self, value):
+        self.header.difficulty = value
+
+    # Cached for sealed headers, computed at most once per change otherwise
+    def calculate_hash(self):
+        return self.header.hash
+
+    def mine_block(self):
+        prefix_hasher = hashlib.sha256(self.header.prefix().encode())
+        target = '0' * self.difficulty
+        nonce = 0
+        while True:
+            hasher = prefix_hasher.copy()
+            hasher.update(str(nonce).encode())
+            block_hash = hasher.hexdigest()
+            if block_hash[:self.difficulty] == target:
+                break
+            nonce += 1
+        self.header.set_mined(nonce, block_hash)
+        self.seal()
+
+    def seal(self):
+        self.transactions = tuple(self.transactions)
+        for tx in self.transactions:
+            tx.seal()
+        self.header.seal()
+
+    def is_sealed(self):
+        return self.header.is_sealed()
+
+    # Do the transactions match the Merkle root? Sealed blocks only need to be checked once.
+    def body_matches_header(self):
+        if self.body_checked:
+            return True
+        matches = self.merkle_root == merkle_root([tx.txid() for tx in self.transactions])
+        object.__setattr__(self, "body_checked", matches and self.is_sealed())
+        return matches
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "state_root": self.state_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "miner_address": self.miner_address,
+            "reward": self.reward,
+            "transactions": [tx.to_dict() for tx in self.transactions],
+        }
+
+    # Rebuilds a block received from a peer. The hash is worked out again from the header fields rather than trusted.
+    @staticmethod
+    def from_dict(data, registry=None):
+        transactions = [Transaction.from_dict(tx, registry) for tx in data["transactions"]]
+        block = Block(data["index"], transactions, data["previous_hash"], data["miner_address"], data["reward"], data["difficulty"])
+        block.header.timestamp = data["timestamp"]
+        block.header.merkle_root = data["merkle_root"]
+        block.header.state_root = data["state_root"]
+        block.header.nonce = data["nonce"]
+        block.seal()
+        return block
+
+    def print_block(self):
+        print(f"Block #{self.index}")
+        print(f"Transactions: {list(self.transactions)}")
+        print(f"Timestamp: {time.ctime(self.timestamp)}")
+        print(f"Previous Hash: {self.previous_hash}")
+        print(f"Merkle Root: {self.merkle_root}")
+        print(f"State Root: {self.state_root}")
+        print(f"Miner Address: {self.miner_address}")
+        print(f"Reward: {self.reward}")
+        print(f"Hash: {self.hash}")
+        print(f"Nonce: {self.nonce}")
+        print("-" * 30)
+
+
+# Wallet class remains the same as Day-29
+class Wallet:
+    def __init__(self, keys=None):
+        self.public_key, self.private_key = keys or rsa.newkeys(512)
+        self.address = address_of(self.public_key)
+        self.key_published = False  # True once a spend carrying the key is in a block
+
+    def create_transaction(self, receiver, amount, fee=0):
+        return self.create_payout([(receiver, amount)], fee)
+
+    # outputs is a list of (receiver address, amount) pairs, all covered by one signature
+    def create_payout(self, outputs, fee=0):
+        sender_public_key = None if self.key_published else self.public_key
+        transaction = Transaction(self.address, outputs, fee, sender_public_key=sender_public_key)
+        transaction.sign_transaction(self.private_key)
+        return transaction
+
+    # Nodes only learn keys from blocks, so a first spend that is dropped or still waiting does not publish the key
+    def on_block(self, block):
+        if not self.key_published:
+            self.key_published = any(tx.sender == self.address and tx.sender_public_key is not None for tx in block.transactions)
+
+
+# Loads count wallets from a file of PEM private keys, generating and saving any that are missing. The file holds
+# private keys, so only one that no one else can read is trusted, and a new one is created readable by its owner only.
+# Without a file the keys are generated and thrown away.
+def load_wallets(count, cache_path=None):
+    pems = []
+    if cache_path is not None and os.path.lexists(cache_path):
+        info = os.lstat(cache_path)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ValueError(f"{cache_path} must be a regular file that only its owner can read and write")
+        with open(cache_path) as f:
+            pems = json.load(f)
+    while len(pems) < count:
+        _, private_key = rsa.newkeys(512)
+        pems.append(private_key.save_pkcs1().decode())
+    if cache_path is not None:
+        fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(pems, f)
+
+    wallets = []
+    for pem in pems[:count]:
+        private_key = rsa.PrivateKey.load_pkcs1(pem.encode())
+        wallets.append(Wallet((rsa.PublicKey(private_key.n, private_key.e), private_key)))
+    return wallets
+
+
+# Difficulty a block must have, given the block before it
+def expected_difficulty(previous_block, timestamp, block_time_target):
+    time_difference = timestamp - previous_block.timestamp
+
+    if time_difference < block_time_target:
+        return previous_block.difficulty + 1
+    elif time_difference > block_time_target:
+        return max(1, previous_block.difficulty - 1)
+    else:
+        return previous_block.difficulty
+
+
+# Apply one transaction that is not a reward to a balances dict, keyed by address.
+# Returns the reason it cannot be applied, or None if it was.
+def apply_transaction_to_balances(tx, balances):
+    if tx.sender is None:
+        return "reward transaction found before the end of the block"
+    reason = tx.check_outputs()
+    if reason is not None:
+        return f"transaction {tx.txid().hex()[:16]}: {reason}"
+    spent = tx.amount + tx.fee
+    if balances.get(tx.sender, 0) < spent:
+        return f"transaction {tx.txid().hex()[:16]} spends {spent} but the sender only has {balances.get(tx.sender, 0)}"
+    balances[tx.sender] -= spent
+    credit_outputs(tx, balances)
+    return None
+
+
+# Apply the transactions of one block to a balances dict, keyed by address.
+# Returns the reason the block is invalid, or None if it is fine.
+def apply_block_to_balances(block, balances, mining_reward):
+    # Genesis allocations create coins, only their receivers are checked
+    if block.index == 0:
+        for tx in block.transactions:
+            reason = tx.check_outputs()
+            if reason is not None:
+                return f"genesis allocation: {reason}"
+            credit_outputs(tx, balances)
+        return None
+
+    if not block.transactions or block.transactions[-1].sender is not None:
+        return "block has no reward transaction at the end"
+
+    total_fees = 0
+    for tx in block.transactions[:-1]:
+        reason = apply_transaction_to_balances(tx, balances)
+        if reason is not None:
+            return reason
+        total_fees += tx.fee
+
+    reward_transaction = block.transactions[-1]
+    if reward_transaction.amount != mining_reward + total_fees:
+        return f"reward transaction pays {reward_transaction.amount} but mining reward + fees is {mining_reward + total_fees}"
+    reason = reward_transaction.check_outputs()
+    if reason is not None:
+        return f"reward transaction: {reason}"
+    credit_outputs(reward_transaction, balances)
+    return None
+
+
+def credit_outputs(transaction, balances):
+    for receiver, amount in transaction.outputs:
+        balances[receiver] = balances.get(receiver, 0) + amount
+
+
+# Bits in an address, which is also the depth of a full binary tree over all addresses
+KEY_BITS = 160
+
+# Hash standing in for a subtree with no accounts in it
+EMPTY_HASH = bytes(32)
+
+
+# Leaves and branches are hashed with different first bytes, so one can never pass for the other
+def leaf_hash(key, balance):
+    return hashlib.sha256(b"\x00" + key.to_bytes(20, "big") + balance.to_bytes(16, "big")).digest()
+
+
+def branch_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+# Bit of key that picks the child at depth: 0 for left, 1 for right
+def key_bit(key, depth):
+    return (key >> (KEY_BITS - 1 - depth)) & 1
+
+
+class StateLeaf:
+    __slots__ = ("key", "balance", "hash")
+
+    def __init__(self, key, balance):
+        StateTree.hash_computations += 1
+        self.key = key
+        self.balance = balance
+        self.hash = leaf_hash(key, balance)
+
+
+class StateBranch:
+    __slots__ = ("left", "right", "hash")
+
+    def __init__(self, left, right):
+        StateTree.hash_computations += 1
+        self.left = left
+        self.right = right
+        self.hash = branch_hash(left.hash if left else EMPTY_HASH, right.hash if right else EMPTY_HASH)
+
+
+# Applies items, a sorted list of (key, balance), to the subtree node at depth and returns the new subtree.
+# Untouched children are shared with the old subtree. added[0] counts the accounts that were not there before.
+def _update_subtree(node, depth, items, added):
+    if not items:
+        return node
+    if isinstance(node, StateLeaf):
+        index = bisect.bisect_left(items, node.key, key=lambda item: item[0])
+        if index < len(items) and items[index][0] == node.key:
+            if len(items) == 1:
+                return StateLeaf(node.key, items[0][1])
+        else:
+            items = items[:index] + [(node.key, node.balance)] + items[index:]
+        added[0] -= 1  # The leaf is built again below and would otherwise be counted as new
+        node = None
+    if node is None:
+        if len(items) == 1:
+            added[0] += 1
+            return StateLeaf(*items[0])
+        left, right = None, None
+    else:
+        left, right = node.left, node.right
+    # Within a subtree the keys share their first depth bits, so sorted keys have all the 0 bits before the 1 bits
+    split = bisect.bisect_left(items, 1, key=lambda item: key_bit(item[0], depth))
+    return StateBranch(_update_subtree(left, depth + 1, items[:split], added),
+                       _update_subtree(right, depth + 1, items[split:], added))
+
+
+# StateTree class remains the same as Day-29, and can be read like a balances dict
+class StateTree:
+    # How many leaf and branch hashes were computed, by all trees
+    hash_computations = 0
+
+    def __init__(self, root=None, size=0):
+        self.root = root
+        self.size = size  # Accounts in the tree
+
+    def root_hash(self):
+        return (self.root.hash if self.root else EMPTY_HASH).hex()
+
+    # The tree with changes, a dict of address -> balance, applied. All the changes share one pass down the tree.
+    def updated(self, changes):
+        items = sorted((int(address, 16), balance) for address, balance in changes.items())
+        added = [0]
+        root = _update_subtree(self.root, 0, items, added)
+        return StateTree(root, self.size + added[0])
+
+    def get(self, address, default=None):
+        key = int(address, 16)
+        node, depth = self.root, 0
+        while isinstance(node, StateBranch):
+            node = node.right if key_bit(key, depth) else node.left
+            depth += 1
+        return node.balance if node is not None and node.key == key else default
+
+    def __getitem__(self, address):
+        balance = self.get(address)
+        if balance is None:
+            raise KeyError(address)
+        return balance
+
+    def __contains__(self, address):
+        return self.get(address) is not None
+
+    # Sibling hashes from the root down to where address is, or would be. The path ends at the account's own leaf,
+    # at an empty subtree, or at another account's leaf, which shows that address is not in the tree.
+    def prove(self, address):
+        key = int(address, 16)
+        node, siblings, depth = self.root, [], 0
+        while isinstance(node, StateBranch):
+            if key_bit(key, depth):
+                sibling, node = node.left, node.right
+            else:
+                sibling, node = node.right, node.left
+            siblings.append(sibling.hash.hex() if sibling else None)
+            depth += 1
+        leaf = [format(node.key, "040x"), node.balance] if node is not None else None
+        return {"siblings": siblings, "leaf": leaf}
+
+
+# Checks that address has balance (None for "no account") in the state committed to by state_root,
+# using only the proof. This is all a light client needs next to a block header.
+def verify_balance_proof(state_root, address, balance, proof):
+    key = int(address, 16)
+    siblings, leaf = proof["siblings"], proof["leaf"]
+    if len(siblings) > KEY_BITS:
+        return False
+    if balance is not None:
+        if leaf is None or int(leaf[0], 16) != key or leaf[1] != balance:
+            return False
+    elif leaf is not None:
+        other = int(leaf[0], 16)
+        # Another account only proves absence if it sits on address's own path
+        if other == key or (other ^ key) >> (KEY_BITS - len(siblings)) != 0:
+            return False
+
+    node_hash = leaf_hash(int(leaf[0], 16), leaf[1]) if leaf is not None else EMPTY_HASH
+    for depth in range(len(siblings) - 1, -1, -1):
+        sibling = bytes.fromhex(siblings[depth]) if siblings[depth] else EMPTY_HASH
+        node_hash = branch_hash(sibling, node_hash) if key_bit(key, depth) else branch_hash(node_hash, sibling)
+    return node_hash.hex() == state_root
+
+
+# Bytes of a proof when empty siblings are sent as a bitmap rather than as hashes
+def proof_size(proof):
+    hashes = sum(1 for sibling in proof["siblings"] if sibling is not None)
+    return 1 + (len(proof["siblings"]) + 7) // 8 + 32 * hashes + (36 if proof["leaf"] is not None else 0)
+
+
+# Balance changes a block would make, without touching balances: the writes land in a dict of their own.
+# Returns (reason the block is invalid or None, changes).
+def block_balance_changes(block, balances, mining_reward):
+    changes = {}
+    reason = apply_block_to_balances(block, ChainMap(changes, balances), mining_reward)
+    return reason, changes
+
+
+# The latest block together with the balances after it. A snapshot is never changed once made, and the chain swaps
+# in a new one with a single assignment, so a reader holding one always sees a block and the state that goes with it.
+class ChainTip:
+    __slots__ = ("block", "state")
+
+    def __init__(self, block, state):
+        self.block = block
+        self.state = state  # StateTree
+
+    height = property(lambda self: self.block.index)
+
+
+# Transaction pool that threads can share. A short lock guards a dict of txid -> transaction, which keeps arrival order.
+# Miners copy a template out and leave it in the pool; once their block is on the chain exactly the transactions it
+# included are removed, so the ones that arrived while it was being mined stay behind. The txids of the last
+# confirmed_window blocks are remembered, so a late copy of a transaction that was just mined cannot come back in.
+class ConcurrentTransactionPool:
+    def __init__(self, confirmed_window=1000):
+        self.lock = threading.Lock()
+        self.transactions = {}  # txid -> transaction
+        self.confirmed_window = confirmed_window
+        self.confirmed_blocks = deque()  # txids of each of the last confirmed_window blocks, oldest first
+        self.confirmed = set()  # All of those txids
+
+    # False if the transaction is already in the pool or in one of the last confirmed_window blocks
+    def add(self, transaction):
+        txid = transaction.txid()
+        with self.lock:
+            if txid in self.transactions or txid in self.confirmed:
+                return False
+            self.transactions[txid] = transaction
+            return True
+
+    # The oldest max_transactions transactions, or all of them. They stay in the pool until remove_included.
+    def take_template(self, max_transactions=None):
+        with self.lock:
+            return list(itertools.islice(self.transactions.values(), max_transactions))
+
+    # Takes transactions that can no longer be paid for out of the pool. Unlike mined ones they are not remembered.
+    def evict(self, transactions):
+        with self.lock:
+            for tx in transactions:
+                self.transactions.pop(tx.txid(), None)
+
+    # Takes the transactions of a block that made it onto the chain out of the pool, for good
+    def remove_included(self, transactions):
+        txids = [tx.txid() for tx in transactions]
+        with self.lock:
+            for txid in txids:
+                self.transactions.pop(txid, None)
+            self.confirmed.update(txids)
+            self.confirmed_blocks.append(txids)
+            if len(self.confirmed_blocks) > self.confirmed_window:
+                self.confirmed.difference_update(self.confirmed_blocks.popleft())
+
+    def __len__(self):
+        return len(self.transactions)
+
+
+# Blockchain class remains the same as Day-29, but safe to share between threads.
+# Readers never take a lock: they read the tip snapshot. Blocks are prepared and mined against a snapshot without a
+# lock too, and only swapping in the new tip takes chain_lock, failing if another block got there first.
+class Blockchain:
+    def __init__(self, block_time_target=5, mining_reward=50, genesis_allocations=None, difficulty=None, genesis_block=None):
+        self.block_time_target = block_time_target  # Target time to mine each block (in seconds)
+        self.mining_reward = mining_reward  # Reward for mining a block
+        self.difficulty = difficulty  # Fixed difficulty, or None to adjust it to block_time_target
+        self.registry = KeyRegistry()
+        self.transaction_pool = ConcurrentTransactionPool()
+        self.chain_lock = threading.Lock()  # Held only while a new tip is swapped in
+        self.chain = []
+        self.tip = None  # ChainTip
+        self.stale_blocks = 0  # Blocks refused because the tip moved on while they were mined
+        self.append_mined_block(genesis_block or self.create_genesis_block(genesis_allocations or {}))
+
+    # The genesis block hands out the first coins. It is not mined, so it is sealed straight away.
+    def create_genesis_block(self, genesis_allocations):
+        allocations = [Transaction(None, [(self.registry.intern(address), amount)]) for address, amount in genesis_allocations.items()]
+        genesis_block = Block(0, allocations, "0", miner_address=None, reward=0, difficulty=2)
+        reason, changes = block_balance_changes(genesis_block, StateTree(), self.mining_reward)
+        if reason is not None:
+            raise ValueError(reason)
+        genesis_block.state_root = StateTree().updated(changes).root_hash()
+        genesis_block.seal()
+        return genesis_block
+
+    def get_latest_block(self):
+        return self.tip.block
+
+    def get_balance(self, address):
+        return self.tip.state.get(address, 0)
+
+    # Works out the difficulty and state root against tip (by default the current one) and mines, all without a lock.
+    # Returns the reason the block was refused, because its transactions do not apply or another block became the tip in
+    # the meantime, or None if it was added. A refused or stale block changes nothing.
+    def add_block(self, new_block, tip=None):
+        tip = tip or self.tip
+        reason, changes = block_balance_changes(new_block, tip.state, self.mining_reward)
+        if reason is not None:
+            print(f"Block {new_block.index} was refused: {reason}")
+            return reason
+        new_block.difficulty = self.required_difficulty(tip.block, new_block)
+        new_block.previous_hash = tip.block.hash
+        state = tip.state.updated(changes)
+        new_block.state_root = state.root_hash()
+        new_block.mine_block()
+        if not self._publish(new_block, state, tip):
+            return f"block {new_block.index} is stale, the tip moved on while it was mined"
+        return None
+
+    # For blocks that were mined outside add_block, e.g. in another process.
+    # Returns the reason the block was refused, or None if it was added.
+    def append_mined_block(self, block):
+        tip = self.tip
+        if tip is not None and block.previous_hash != tip.block.hash:
+            return f"block {block.index} does not build on the tip"
+        if not block.header.hash_matches_fields():
+            return f"block {block.index} hash does not match its header"
+        reason, changes = block_balance_changes(block, tip.state if tip else StateTree(), self.mining_reward)
+        if reason is not None:
+            return reason
+        state = (tip.state if tip else StateTree()).updated(changes)
+        if state.root_hash() != block.state_root:
+            return f"block {block.index} commits to state root {block.state_root[:16]} but its transactions give {state.root_hash()[:16]}"
+        if not self._publish(block, state, tip):
+            return f"block {block.index} is stale, the tip moved on while it was checked"
+        return None
+
+    # Makes block the tip, if the tip is still expected_tip.
+    # The pool drops the block's transactions before the new tip is visible, so a miner that sees the new tip can no
+    # longer find them in a template, and a miner that took them with the old tip will be stale.
+    def _publish(self, block, state, expected_tip):
+        with self.chain_lock:
+            if self.tip is not expected_tip:
+                self.stale_blocks += 1
+                return False
+            self.transaction_pool.remove_included(block.transactions)
+            for tx in block.transactions:
+                if tx.sender_public_key is not None:
+                    self.registry.register(tx.sender_public_key)
+            self.chain.append(block)
+            self.tip = ChainTip(block, state)
+            return True
+
+    def required_difficulty(self, previous_block, block):
+        if self.difficulty is not None:
+            return self.difficulty
+        return expected_difficulty(previous_block, block.timestamp, self.block_time_target)
+
+    # A key that comes with a transaction is only used to check it. The registry learns keys from blocks, so spends
+    # without a key are only accepted once a spend carrying it has been mined, as a new node replaying the chain needs.
+    # Returns True if the transaction went into the pool, False if it is invalid or already known.
+    def add_transaction_to_pool(self, transaction):
+        if transaction.check_outputs() is None and transaction.verify_transaction(self.registry):
+            return self.transaction_pool.add(transaction)
+        print("Transaction is invalid and was not added to the pool.")
+        return False
+
+    # Up to max_transactions of the oldest pool transactions that tip's balances can pay for, in order.
+    # The ones that cannot be paid are evicted from the pool, but only while tip is still the tip: a block that came in
+    # since then may have paid for them.
+    def select_transactions(self, tip, max_transactions=None):
+        pending = ChainMap({}, tip.state)
+        selected, unpayable = [], []
+        for tx in self.transaction_pool.take_template(max_transactions):
+            reason = apply_transaction_to_balances(tx, pending)
+            if reason is None:
+                selected.append(tx)
+            else:
+                print(f"Transaction dropped from the pool: {reason}")
+                unpayable.append(tx)
+        if unpayable:
+            with self.chain_lock:
+                if self.tip is tip:
+                    self.transaction_pool.evict(unpayable)
+        return selected
+
+    # Mines the oldest max_transactions transactions in the pool that can be paid for, or all of them.
+    # Returns the block, or None if there was nothing to mine or the block was refused or went stale.
+    def mine_pending_transactions(self, miner_address, max_transactions=None):
+        tip = self.tip  # Before the template, see _publish
+        transactions = self.select_transactions(tip, max_transactions)
+        if not transactions:
+            print("No transactions to mine!")
+            return None
+        total_fees = sum(tx.fee for tx in transactions)
+        reward_transaction = Transaction(None, [(miner_address, self.mining_reward + total_fees)])
+        new_block = Block(tip.height + 1, transactions + [reward_transaction], tip.block.hash, miner_address, self.mining_reward)
+        if self.add_block(new_block, tip) is not None:
+            return None
+        return new_block
+
+    # Proof of an address's current balance against the state root in the latest header
+    def prove_balance(self, address):
+        return self.tip.state.prove(address)
+
+    def is_chain_valid(self):
+        chain = self.chain[:self.tip.height + 1]
+        for i in range(1, len(chain)):
+            current_block = chain[i]
+            previous_block = chain[i - 1]
+
+            if not current_block.body_matches_header():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if not current_block.header.hash_matches_fields():
+                print(f"Block {current_block.index} has been tampered!")
+                return False
+
+            if current_block.previous_hash != previous_block.hash:
+                print(f"Block {current_block.index} is not properly linked to the previous block!")
+                return False
+
+        return True
+
+
+# Stress test: submitter threads push pre-signed transactions, each also resubmitting some of its neighbour's, while
+# miner threads race each other for blocks and reader threads check that every tip snapshot is self-consistent.
+def stress_test(node, batches, miners, block_size, readers):
+    submitted = Counter()  # Accepted submissions per txid
+    submitted_lock = threading.Lock()
+    submitting_done = threading.Event()
+    mined = Counter()  # Blocks per miner
+    reads = [0, 0]  # Snapshots read, inconsistent snapshots
+
+    def submit(own, neighbour):
+        resubmitted = neighbour[::4]
+        for i, tx in enumerate(own):
+            accepted = [tx] if node.add_transaction_to_pool(tx) else []
+            if i < len(resubmitted) and node.add_transaction_to_pool(resubmitted[i]):
+                accepted.append(resubmitted[i])
+            with submitted_lock:
+                submitted.update(tx.txid() for tx in accepted)
+
+    def mine(miner_address):
+        while not (submitting_done.is_set() and len(node.transaction_pool) == 0):
+            if len(node.transaction_pool) == 0:
+                time.sleep(0.001)
+            elif node.mine_pending_transactions(miner_address, block_size) is not None:
+                mined[miner_address] += 1
+
+    def read(addresses):
+        while not submitting_done.is_set() or len(node.transaction_pool):
+            tip = node.tip
+            if tip.state.root_hash() != tip.block.state_root or node.chain[tip.height] is not tip.block:
+                reads[1] += 1
+            for address in addresses:
+                tip.state.get(address, 0)
+            reads[0] += 1
+
+    threads = [threading.Thread(target=submit, args=(batches[i], batches[(i + 1) % len(batches)]))
+               for i in range(len(batches))]
+    workers = [threading.Thread(target=mine, args=(miner.address,)) for miner in miners]
+    workers += [threading.Thread(target=read, args=([tx.sender for tx in batch[:5]],)) for batch in batches[:readers]]
+    t0 = time.perf_counter()
+    for thread in workers + threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    submit_time = time.perf_counter() - t0
+    submitting_done.set()
+    for thread in workers:
+        thread.join()
+    return {"submitted": submitted, "mined": mined, "reads": reads, "submit_time": submit_time,
+            "total_time": time.perf_counter() - t0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Many threads submitting transactions while miners mine.")
+    parser.add_argument("--submitters", type=int, default=8)
+    parser.add_argument("--transactions", type=int, default=1000, help="transactions signed per submitter")
+    parser.add_argument("--miners", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--block-size", type=int, default=100)
+    parser.add_argument("--switch-interval", type=float, default=1e-5,
+                        help="seconds between forced thread switches, far below the default to provoke races")
+    parser.add_argument("--key-cache")
+    config = parser.parse_args()
+
+    wallets = load_wallets(config.submitters + config.miners, config.key_cache)
+    senders, miners = wallets[:config.submitters], wallets[config.submitters:]
+    allocations = {wallet.address: 10 ** 9 for wallet in senders}
+    node = Blockchain(genesis_allocations=allocations, difficulty=2)
+
+    # The first spend of each sender carries its key, so it goes into a block before the threads start
+    for sender in senders:
+        node.add_transaction_to_pool(sender.create_transaction(miners[0].address, 1, fee=1))
+    block = node.mine_pending_transactions(miners[0].address)
+    for sender in senders:
+        sender.on_block(block)
+
+    # Every amount is different, so every transaction has its own txid
+    t0 = time.perf_counter()
+    batches = [[sender.create_transaction(senders[(s + 1 + i) % len(senders)].address, 1000 + s * config.transactions + i, fee=1)
+                for i in range(config.transactions)] for s, sender in enumerate(senders)]
+    print(f"Signed {config.submitters} x {config.transactions} transactions in {time.perf_counter() - t0:.1f}s")
+
+    sys.setswitchinterval(config.switch_interval)
+    result = stress_test(node, batches, miners, config.block_size, config.readers)
+    sys.setswitchinterval(0.005)
+
+    unique = {tx.txid() for batch in batches for tx in batch}
+    included = Counter(tx.txid() for block in node.chain[2:] for tx in block.transactions if tx.sender is not None)
+    submitted = result["submitted"]
+    print(f"\n{config.submitters} submitters, {config.miners} miners and {config.readers} readers, "
+          f"thread switch every {config.switch_interval * 1e6:.0f} us")
+    print(f"Submissions: {sum(len(batch) + len(batch[::4]) for batch in batches)} "
+          f"({len(unique)} distinct) in {result['submit_time']:.2f}s, "
+          f"{len(unique) / result['submit_time']:,.0f} tx/s accepted")
+    print(f"Accepted into the pool: {sum(submitted.values())}, accepted twice: {sum(1 for count in submitted.values() if count > 1)}")
+    print(f"Blocks mined by each miner: {', '.join(str(count) for count in result['mined'].values())}, "
+          f"{node.stale_blocks} went stale and were dropped")
+    print(f"Transactions on the chain: {sum(included.values())}, lost: {len(unique - set(included))}, "
+          f"mined twice: {sum(1 for count in included.values() if count > 1)}, left in the pool: {len(node.transaction_pool)}")
+    print(f"Tip snapshots read: {result['reads'][0]:,}, inconsistent: {result['reads'][1]}")
+
+    total = sum(node.get_balance(wallet.address) for wallet in wallets)
+    expected = sum(allocations.values()) + node.mining_reward * node.get_latest_block().index
+    print(f"Coins: {total:,}, expected {expected:,}")
+    replay = Blockchain(genesis_block=node.chain[0], difficulty=2)
+    refused = [reason for reason in map(replay.append_mined_block, node.chain[1:]) if reason is not None]
+    print(f"Replayed from genesis: {len(refused)} blocks refused, same state root: "
+          f"{replay.get_latest_block().state_root == node.get_latest_block().state_root}")
+    print("Is blockchain valid?", node.is_chain_valid())
+
+'''
+Sample Output:
+
+Signed 8 x 1000 transactions in 7.8s
+
+8 submitters, 2 miners and 2 readers, thread switch every 10 us
+Submissions: 10000 (8000 distinct) in 1.11s, 7,225 tx/s accepted
+Accepted into the pool: 8000, accepted twice: 0
+Blocks mined by each miner: 75, 66, 22 went stale and were dropped
+Transactions on the chain: 8000, lost: 0, mined twice: 0, left in the pool: 0
+Tip snapshots read: 37,340, inconsistent: 0
+Coins: 8,000,007,100, expected 8,000,007,100
+Replayed from genesis: 0 blocks refused, same state root: True
+Is blockchain valid? True
+'''